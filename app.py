@@ -1,19 +1,29 @@
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, url_for
 # We'll use the standard Flask session instead of Flask-Session
 # from flask_session import Session
-import matplotlib
-matplotlib.use('Agg')  # Use Agg backend for matplotlib (non-interactive)
-import matplotlib.pyplot as plt
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from diagnosis_engine import DiagnosisEngine
-from localization import get_translation, available_languages
+from diagnosis_engine import (DiagnosisEngine, DiagnosisSession, DEFAULT_MIN_CONFIDENCE,
+                              SCORING_MODES, check_min_confidence)
+from knowledge_base import load_profiles
+from result_cache import DiagnosisCache
+from sharded_engine import ShardedDiagnosisEngine
+from rule_engine import RuleEngine, EXPERTA_AVAILABLE
+from symptom_vocabulary import mask_from_ids
+from localization import get_translation, available_languages, translations_version
+from symptom_search import SearchIndexes
+from page_context import PageContexts
+from chart_cache import ChartCache, chart_key, chart_token, parse_chart_token
+from pdf_report import render_report, DATE_FORMAT as REPORT_DATE_FORMAT
+from chart_renderer import ChartRenderPool, ChartPoolBusy, ChartRenderTimeout, chart_spec
 import json
+import math
 import os
-import tempfile
+import re
 from datetime import datetime
 import io
 import base64
+import threading
+import uuid
+from collections import OrderedDict
 
 app = Flask(__name__)
 app.secret_key = 'diagnosis_ai_secret_key'
@@ -21,8 +31,57 @@ app.secret_key = 'diagnosis_ai_secret_key'
 # app.config['SESSION_TYPE'] = 'filesystem'
 # Session(app)
 
-# Initialize the diagnosis engine
-engine = DiagnosisEngine()
+# Initialize the diagnosis engine, optionally from a profiles file or a
+# compiled snapshot (see knowledge_base.py) instead of the built-in profiles.
+# The pure-Python backend is the faster one for single diagnoses, so numpy
+# is opt-in through DIAGNOSIS_BACKEND (see benchmark_engine.py).
+KNOWLEDGE_BASE = os.environ.get('DIAGNOSIS_KNOWLEDGE_BASE')
+engine = DiagnosisEngine(backend=os.environ.get('DIAGNOSIS_BACKEND', 'python'),
+                         disease_profiles=load_profiles(KNOWLEDGE_BASE) if KNOWLEDGE_BASE else None)
+
+# Most conditions /diagnose returns unless the client asks for fewer
+MAX_RESULTS = 10
+# String forms of boolean request flags, for form-encoded or loosely typed clients
+FLAG_VALUES = {'true': True, '1': True, 'yes': True, 'on': True,
+               'false': False, '0': False, 'no': False, 'off': False}
+
+# With DIAGNOSIS_ENGINE_SHARDS above 1, /diagnose scores large catalogs on that
+# many worker processes; live sessions keep using the in-process engine
+ENGINE_SHARDS = int(os.environ.get('DIAGNOSIS_ENGINE_SHARDS', '1'))
+scoring_engine = (ShardedDiagnosisEngine(ENGINE_SHARDS, backend=engine.backend,
+                                         disease_profiles=engine.disease_profiles,
+                                         vocabulary=engine.vocabulary)
+                  if ENGINE_SHARDS > 1 else engine)
+
+# Results for recent symptom combinations; emptied when the profiles change
+diagnosis_cache = DiagnosisCache(scoring_engine, maxsize=4096)
+
+# Escalation rules checked on every diagnosis, compiled once at startup
+rule_engine = RuleEngine(backend="experta" if EXPERTA_AVAILABLE else "python")
+
+# Rendered charts by content hash; CHART_CACHE_DIR adds a disk tier shared
+# by worker processes and kept across restarts, trimmed to CHART_CACHE_DISK_BYTES
+chart_cache = ChartCache(maxbytes=32 << 20, directory=os.environ.get('CHART_CACHE_DIR'),
+                         max_disk_bytes=int(os.environ.get('CHART_CACHE_DISK_BYTES', str(256 << 20))))
+
+# Exported PDF reports by content hash, in memory only
+report_cache = ChartCache(maxbytes=16 << 20)
+
+# Charts render in CHART_RENDER_WORKERS processes (0 renders on the request
+# thread); past CHART_MAX_PENDING queued charts the chart routes answer 503
+chart_pool = ChartRenderPool(workers=int(os.environ.get('CHART_RENDER_WORKERS', '2')),
+                             max_pending=int(os.environ.get('CHART_MAX_PENDING', '8')),
+                             timeout=float(os.environ.get('CHART_RENDER_TIMEOUT', '10')))
+# Seconds a client is told to wait before asking for a chart again
+CHART_RETRY_AFTER = 2
+# Content types of the /charts/<token>.<format> URLs; the token encodes
+# everything the chart is drawn from, so their content never changes and
+# any worker can render them, whatever its caches hold
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'json': 'application/json'}
+CHART_MAX_AGE = 365 * 24 * 3600
+CHART_TOKEN = re.compile(r'[A-Za-z0-9_-]{1,4096}')
+# Most bars a chart may have, whether asked for directly or by URL
+CHART_MAX_BARS = 50
 
 # Get symptoms data organized by category
 symptoms_data = {
@@ -35,24 +94,48 @@ symptoms_data = {
     "Musculoskeletal": ["joint pain", "joint stiffness", "swelling", "reduced range of motion"]
 }
 
+# Language dropdown, frontend strings and translated symptom tree per language
+page_contexts = PageContexts(symptoms_data)
+
+# Dense IDs for the page's symptoms; selections are scored as bitmasks over
+# them. IDs follow interning order and can change between deploys, so the
+# session keeps names and masks are rebuilt per request.
+symptom_ids = {symptom: engine.vocabulary.intern(symptom)
+               for symptoms in symptoms_data.values() for symptom in symptoms}
+
+def symptom_mask(symptoms):
+    """Bitmask for a list of symptom names; unknown ones are ignored"""
+    return mask_from_ids(symptom_ids[s] for s in symptoms if s in symptom_ids)
+
+def symptom_names(mask):
+    """Names of the symptoms selected in a bitmask, in page order"""
+    return [symptom for symptom, symptom_id in symptom_ids.items() if mask >> symptom_id & 1]
+
+# Symptom autocomplete over the page's symptoms and every symptom in the
+# profiles, indexed per language on first use
+SEARCH_RESULTS = 10
+symptom_search = SearchIndexes(list(symptom_ids) + list(engine.symptom_vocab))
+
+# Incrementally scored selections behind the diagnosis page's live results,
+# by session['scorer_id']; the least recently used are dropped first
+MAX_LIVE_SESSIONS = 1000
+live_sessions = OrderedDict()
+live_sessions_lock = threading.Lock()
+
 @app.route('/')
 def index():
     # Set default language if not set
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     return render_template('pages/home.html',
-                          languages=langs,
+                          languages=context.languages,
                           current_lang=session['language'],
-                          translations=get_translations_for_frontend(session['language']))
+                          translations=context.translations,
+                          translations_json=context.translations_json)
 
 @app.route('/diagnosis_page')
 def diagnosis_page():
@@ -60,31 +143,15 @@ def diagnosis_page():
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get all symptoms for the form
-    all_symptoms = {}
-    for category, symptoms in symptoms_data.items():
-        translated_category = get_translation(session['language'], category)
-        all_symptoms[translated_category] = []
-        for symptom in symptoms:
-            translated_symptom = get_translation(session['language'], symptom)
-            all_symptoms[translated_category].append({
-                'id': symptom,
-                'name': translated_symptom
-            })
-    
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     return render_template('pages/diagnosis.html', 
-                          symptoms=all_symptoms,
-                          languages=langs,
+                          symptoms=context.symptoms,
+                          languages=context.languages,
                           current_lang=session['language'],
-                          translations=get_translations_for_frontend(session['language']))
+                          translations=context.translations,
+                          translations_json=context.translations_json)
 
 @app.route('/set-language', methods=['POST'])
 def set_language():
@@ -95,46 +162,156 @@ def set_language():
         session['language'] = lang_code
         return jsonify({
             'success': True,
-            'translations': get_translations_for_frontend(lang_code)
+            'translations': dict(get_translations_for_frontend(lang_code))
         })
     
     return jsonify({'success': False, 'message': 'Invalid language code'})
 
+def parse_flag(value, default):
+    """A JSON boolean, 0/1 or one of FLAG_VALUES as a bool, default if missing, None if invalid"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        return FLAG_VALUES.get(value.strip().lower())
+    return None
+
 @app.route('/diagnose', methods=['POST'])
 def diagnose():
-    symptoms = request.get_json().get('symptoms', [])
+    data = request.get_json()
+    symptoms = data.get('symptoms', [])
+    try:
+        top_k = min(int(data.get('top_k', MAX_RESULTS)), MAX_RESULTS)
+        min_confidence = float(data.get('min_confidence', DEFAULT_MIN_CONFIDENCE))
+        check_min_confidence(min_confidence)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid top_k or min_confidence'})
+    scoring = data.get('scoring', 'overlap')
+    if scoring not in SCORING_MODES:
+        return jsonify({'success': False, 'message': 'Invalid scoring mode'})
+    explain = parse_flag(data.get('explain'), True)
+    if explain is None:
+        return jsonify({'success': False, 'message': 'Invalid explain flag'})
+    
+    # Selected symptoms as a bitmask over their IDs; unknown ones are ignored
+    mask = symptom_mask(symptoms)
     
-    # Convert to the format expected by DiagnosisEngine
-    symptom_dict = {}
-    # Initialize all symptoms to False
-    for category, category_symptoms in symptoms_data.items():
-        for symptom in category_symptoms:
-            symptom_dict[symptom] = False
+    # Run diagnosis
+    results = diagnosis_cache.run_diagnosis(mask, k=top_k, min_confidence=min_confidence, scoring=scoring)
     
-    # Set selected symptoms to True
-    for symptom_id in symptoms:
-        if symptom_id in symptom_dict:
-            symptom_dict[symptom_id] = True
+    # Format results for the frontend, with matched/missing symptoms unless
+    # the client opted out
+    explanations = engine.explain(results, mask) if explain else None
+    formatted_results = format_results(results, session['language'], explanations)
     
-    # Run diagnosis
-    results = engine.run_diagnosis(symptom_dict)
+    # Store in session for PDF export
+    session['diagnosis_results'] = results
+    session['selected_symptoms'] = symptom_names(mask)
+    
+    alerts = [{
+        'rule': rule['name'],
+        'message': get_translation(session['language'], rule['message']),
+        'disease_id': rule.get('disease'),
+    } for rule in rule_engine.evaluate(symptom_names(mask))]
     
-    # Format results for the frontend
+    return jsonify({'success': True, 'results': formatted_results, 'alerts': alerts})
+
+@app.route('/diagnose/toggle', methods=['POST'])
+def diagnose_toggle():
+    """Update the live diagnosis after one symptom checkbox changed"""
+    data = request.get_json(silent=True)
+    symptoms = data.get('symptoms', []) if isinstance(data, dict) else None
+    symptom_id = data.get('symptom') if isinstance(data, dict) else None
+    if not (isinstance(symptoms, list) and all(isinstance(s, str) for s in symptoms)
+            and (symptom_id is None or isinstance(symptom_id, str))):
+        response = jsonify({'success': False, 'message': 'symptom must be a string and symptoms a list of strings'})
+        response.status_code = 400
+        return response
+    reset = parse_flag(data.get('reset'), False)
+    selected = parse_flag(data.get('selected'), True)
+    if reset is None or selected is None:
+        response = jsonify({'success': False, 'message': 'Invalid reset or selected flag'})
+        response.status_code = 400
+        return response
+    scorer = get_live_session()
+    if reset:
+        mask = 0
+    else:
+        # The page's full selection wins over the scorer's state, which a
+        # reload, another tab sharing the cookie or another worker may have
+        # left behind; only the symptoms that differ are rescored
+        mask = symptom_mask(symptoms)
+        if symptom_id in symptom_ids:
+            bit = 1 << symptom_ids[symptom_id]
+            mask = mask | bit if selected else mask & ~bit
+    scorer.set_mask(mask)
+    
+    results = scorer.results(k=MAX_RESULTS)
+    explanations = engine.explain(results, scorer.mask)
+    return jsonify({'success': True, 'results': format_results(results, session.get('language', 'en'), explanations)})
+
+def get_live_session():
+    """Return this browser session's DiagnosisSession, creating it if needed"""
+    scorer_id = session.get('scorer_id')
+    with live_sessions_lock:
+        scorer = live_sessions.get(scorer_id) if scorer_id else None
+        if scorer is not None:
+            live_sessions.move_to_end(scorer_id)
+            return scorer
+        
+        scorer_id = uuid.uuid4().hex
+        scorer = DiagnosisSession(engine)
+        live_sessions[scorer_id] = scorer
+        while len(live_sessions) > MAX_LIVE_SESSIONS:
+            live_sessions.popitem(last=False)
+    session['scorer_id'] = scorer_id
+    return scorer
+
+def format_results(results, lang, explanations=None):
+    """Format run_diagnosis results, and optionally their explanations, for the frontend"""
     formatted_results = []
-    for disease, confidence, advice in results:
-        formatted_results.append({
-            'disease': get_translation(session['language'], disease),
+    for index, (disease, confidence, advice) in enumerate(results):
+        formatted = {
+            'disease': get_translation(lang, disease),
             'confidence': confidence,
-            'advice': get_translation(session['language'], advice),
+            'advice': get_translation(lang, advice),
             'disease_id': disease,  # Keep original ID for later reference
             'advice_id': advice     # Keep original ID for later reference
-        })
-    
-    # Store in session for PDF export
-    session['diagnosis_results'] = results
-    session['selected_symptoms'] = [s for s, v in symptom_dict.items() if v]
-    
-    return jsonify({'success': True, 'results': formatted_results})
+        }
+        if explanations is not None and explanations[index] is not None:
+            formatted['explanation'] = format_explanation(explanations[index], lang)
+        formatted_results.append(formatted)
+    return formatted_results
+
+def format_explanation(explanation, lang):
+    """Translated symptom names for each part of an Explanation"""
+    return {part: [get_translation(lang, s) for s in engine.vocabulary.names(mask)]
+            for part, mask in explanation._asdict().items()}
+
+@app.route('/symptoms/search')
+def symptoms_search():
+    """Ranked symptom matches for a partial query; limit=0 returns every match"""
+    query = request.args.get('q', '')
+    lang = request.args.get('lang') or session.get('language', 'en')
+    if lang not in available_languages():
+        lang = 'en'
+    try:
+        limit = int(request.args.get('limit', SEARCH_RESULTS))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid limit'})
+    results = symptom_search.search(lang, query, limit if limit > 0 else None)
+    return jsonify({'success': True, 'results': results})
+
+@app.route('/diagnose/cache-stats')
+def diagnose_cache_stats():
+    return jsonify({'success': True, 'stats': diagnosis_cache.stats()})
+
+@app.route('/diagnose/rule-stats')
+def diagnose_rule_stats():
+    return jsonify({'success': True, 'stats': rule_engine.stats()})
 
 @app.route('/generate-chart', methods=['POST'])
 def generate_chart():
@@ -145,110 +322,142 @@ def generate_chart():
         return jsonify({'success': False, 'message': 'No results provided'})
     
     try:
-        # Extract data for chart
         diseases = [result['disease'] for result in results]
         confidences = [result['confidence'] for result in results]
-        
-        # Create chart
-        plt.figure(figsize=(10, 6), dpi=100)
-        # Use a colorful palette for bars
-        colors = ['#4361EE', '#3A0CA3', '#4CC9F0', '#F72585', '#7209B7']
-        bars = plt.barh(diseases, confidences, color=colors[:len(diseases)])
-        
-        # Add percentage labels to the end of each bar
-        for i, (disease, confidence) in enumerate(zip(diseases, confidences)):
-            plt.text(confidence + 1, i, f"{confidence}%", va='center', fontweight='bold')
-            
-        # Add title and labels with proper translation
-        plt.xlabel(get_translation(session['language'], 'confidence_percent'), fontsize=12)
-        plt.title(get_translation(session['language'], 'diagnosis_confidence'), fontsize=14, fontweight='bold')
-        
-        # Style the chart
-        plt.grid(axis='x', linestyle='--', alpha=0.6)
-        plt.tight_layout()
-        
-        # Save to memory
-        img_bytes = io.BytesIO()
-        plt.savefig(img_bytes, format='png')
-        img_bytes.seek(0)
-        plt.close()  # Important to close the figure
-        
-        # Convert to base64 for embedding in HTML
-        img_base64 = base64.b64encode(img_bytes.read()).decode('utf-8')
-        
-        return jsonify({
-            'success': True, 
-            'chart_data': f'data:image/png;base64,{img_base64}'
-        })
+        return chart_response(diseases, confidences, session['language'], data.get('format', 'base64'))
     except Exception as e:
         print(f"Chart generation error: {str(e)}")
         return jsonify({'success': False, 'message': f'Error generating chart: {str(e)}'})
 
+def chart_failure(error):
+    """503 with Retry-After when the render pool is saturated, 504 when a render timed out"""
+    if isinstance(error, ChartPoolBusy):
+        # Shed load rather than queue behind charts already in progress
+        response = jsonify({'success': False, 'message': 'Chart rendering is busy, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(CHART_RETRY_AFTER)
+    else:
+        response = jsonify({'success': False, 'message': 'Chart rendering timed out'})
+        response.status_code = 504
+    return response
+
+def chart_response(diseases, confidences, lang, output='base64'):
+    """Chart JSON for the frontend.
+
+    output 'svg', 'png' or 'json' returns the cacheable chart_url to fetch the
+    chart from ('json' also inlines the chart spec); 'base64' embeds a PNG
+    data URL, served from chart_cache with its content hash as ETag.
+    """
+    if len(diseases) > CHART_MAX_BARS:
+        response = jsonify({'success': False, 'message': f'At most {CHART_MAX_BARS} conditions can be charted'})
+        response.status_code = 400
+        return response
+    title = get_translation(lang, 'diagnosis_confidence')
+    xlabel = get_translation(lang, 'confidence_percent')
+    if output in CHART_FORMATS:
+        token = chart_token(list(diseases), list(confidences), title, xlabel)
+        body = {'success': True, 'chart_url': url_for('chart_file', token=token, fmt=output)}
+        if output == 'json':
+            body['spec'] = chart_spec(diseases, confidences, title, xlabel)
+        return jsonify(body)
+    if output != 'base64':
+        return jsonify({'success': False, 'message': f'Unknown chart format: {output}'})
+    key = chart_key('png', diseases, confidences, title, xlabel)
+    
+    # The client already holds this exact chart
+    if key in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(key)
+        return response
+    
+    try:
+        png = chart_cache.get_or_render(key, lambda: chart_pool.render(diseases, confidences, title, xlabel))
+    except (ChartPoolBusy, ChartRenderTimeout) as e:
+        return chart_failure(e)
+    
+    # Convert to base64 for embedding in HTML
+    img_base64 = base64.b64encode(png).decode('utf-8')
+    response = jsonify({
+        'success': True, 
+        'chart_data': f'data:image/png;base64,{img_base64}'
+    })
+    response.set_etag(key)
+    return response
+
+def chart_inputs(token):
+    """(diseases, confidences, title, xlabel) from a chart URL token, or None if it is not a valid one"""
+    try:
+        diseases, confidences, title, xlabel = parse_chart_token(token)
+    except ValueError:
+        return None
+    if not (isinstance(title, str) and isinstance(xlabel, str)
+            and isinstance(diseases, list) and isinstance(confidences, list)
+            and len(diseases) == len(confidences) <= CHART_MAX_BARS
+            and all(isinstance(disease, str) for disease in diseases)
+            and all(isinstance(c, (int, float)) and not isinstance(c, bool) and math.isfinite(c)
+                    for c in confidences)):
+        return None
+    return diseases, confidences, title, xlabel
+
+@app.route('/charts/<token>.<any(png, svg, json):fmt>')
+def chart_file(token, fmt):
+    """A chart linked by chart_response, as an immutable, browser- and proxy-cacheable file"""
+    inputs = chart_inputs(token) if CHART_TOKEN.fullmatch(token) else None
+    if inputs is None:
+        response = jsonify({'success': False, 'message': 'Chart not found'})
+        response.status_code = 404
+        return response
+    etag = f'{chart_key(token)}.{fmt}'
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        try:
+            if fmt == 'json':
+                data = json.dumps(chart_spec(*inputs), ensure_ascii=False, separators=(',', ':'))
+            else:
+                data = chart_cache.get_or_render(etag, lambda: chart_pool.render(*inputs, format=fmt))
+        except (ChartPoolBusy, ChartRenderTimeout) as e:
+            return chart_failure(e)
+        except Exception as e:
+            # The URL is client-controlled; whatever it holds, a chart that
+            # cannot be drawn is a bad request, not a server error
+            print(f"Chart rendering error: {str(e)}")
+            response = jsonify({'success': False, 'message': 'Chart could not be rendered'})
+            response.status_code = 400
+            return response
+        response = app.response_class(data, mimetype=CHART_FORMATS[fmt])
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CHART_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/generate-chart/cache-stats')
+def chart_cache_stats():
+    return jsonify({'success': True, 'stats': chart_cache.stats(), 'renderer': chart_pool.stats()})
+
 @app.route('/export-pdf', methods=['POST'])
 def export_pdf():
     if 'diagnosis_results' not in session or 'selected_symptoms' not in session:
         return jsonify({'success': False, 'message': 'No diagnosis results to export'})
     
     try:
-        # Create a temporary PDF file
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.pdf')
-        os.close(temp_fd)
-        
-        c = canvas.Canvas(temp_path, pagesize=letter)
-        c.setTitle(get_translation(session['language'], "diagnosis_report"))
-        
-        # Add report title
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, 750, get_translation(session['language'], "diagnosis_report"))
-        c.setFont("Helvetica", 12)
-        
-        # Add date
-        c.drawString(100, 730, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        
-        # Add selected symptoms
-        c.drawString(100, 700, get_translation(session['language'], "selected_symptoms_label"))
-        symptoms_list = session['selected_symptoms']
-        translated_symptoms = [get_translation(session['language'], s) for s in symptoms_list]
-        symptoms_text = ", ".join(translated_symptoms) if translated_symptoms else get_translation(session['language'], "none")
+        lang = session['language']
+        date = datetime.now().strftime(REPORT_DATE_FORMAT)
+        results = session['diagnosis_results']
+        symptoms = session['selected_symptoms']
+        # Identical reports (same results, symptoms, language, translations
+        # and printed date) are served from memory instead of being laid out again
+        key = chart_key('pdf', lang, translations_version(), symptoms, results, date)
         
-        # Wrap text if too long
-        if len(symptoms_text) > 70:
-            c.drawString(120, 680, symptoms_text[:70])
-            c.drawString(120, 660, symptoms_text[70:])
-            y_position = 640
-        else:
-            c.drawString(120, 680, symptoms_text)
-            y_position = 660
-        
-        # Add diagnosis results
-        c.drawString(100, y_position, get_translation(session['language'], "diagnosis_results_label"))
-        y_position -= 20
-        
-        for disease, confidence, advice in session['diagnosis_results']:
-            trans_disease = get_translation(session['language'], disease)
-            trans_advice = get_translation(session['language'], advice)
-            
-            c.drawString(120, y_position, f"- {trans_disease} ({confidence}%)")
-            y_position -= 20
-            
-            # Wrap advice text if needed
-            advice_lines = wrap_text(f"{get_translation(session['language'], 'advice_label')}: {trans_advice}", 60)
-            for line in advice_lines:
-                c.drawString(140, y_position, line)
-                y_position -= 20
-            
-            y_position -= 10
-            
-            # Check if we need a new page
-            if y_position < 100:
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y_position = 750
-        
-        c.save()
+        def render():
+            explanations = [None if explanation is None else format_explanation(explanation, lang)
+                            for explanation in engine.explain(results, symptom_mask(symptoms))]
+            return render_report(lang, symptoms, results, explanations, date)
         
+        pdf = report_cache.get_or_render(key, render)
         return send_file(
-            temp_path,
+            io.BytesIO(pdf),
             mimetype='application/pdf',
             as_attachment=True,
             download_name="diagnosis_report.pdf",
@@ -276,39 +485,7 @@ def save_results():
 
 def get_translations_for_frontend(lang):
     """Get common translations needed on the frontend"""
-    keys = [
-        "title", "diagnose", "export", "chart", "clear", "save", "close", 
-        "language_select", "search_symptoms", "warning", "error", "success",
-        "info", "no_symptoms_selected", "result", "no_disease_match",
-        "diagnosis_result", "diagnosis_result_header", "run_diagnosis_first",
-        "confidence_percent", "diagnosis_confidence", "diagnosis_chart_title",
-        "reportlab_missing", "no_results_to_export", "advice_label",
-        "selected_symptoms_label"
-    ]
-    
-    translations = {}
-    for key in keys:
-        translations[key] = get_translation(lang, key)
-    
-    return translations
-
-def wrap_text(text, width):
-    """Wrap text to fit within a given width"""
-    words = text.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        if len(" ".join(current_line + [word])) <= width:
-            current_line.append(word)
-        else:
-            lines.append(" ".join(current_line))
-            current_line = [word]
-    
-    if current_line:
-        lines.append(" ".join(current_line))
-    
-    return lines
+    return page_contexts.get(lang).translations
 
 @app.route('/findings_page')
 def findings_page():
@@ -316,13 +493,8 @@ def findings_page():
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     # Check if we have diagnosis results in the session
     has_diagnosis = 'diagnosis_results' in session and session['diagnosis_results']
@@ -335,10 +507,11 @@ def findings_page():
 
     # Pass translated symptoms to the template
     return render_template('pages/findings.html', 
-                          languages=langs,
+                          languages=context.languages,
                           current_lang=session['language'],
                           has_diagnosis=has_diagnosis,
-                          translations=get_translations_for_frontend(session['language']),
+                          translations=context.translations,
+                          translations_json=context.translations_json,
                           translated_symptoms=translated_symptoms)
 
 @app.route('/conclusions_page')
@@ -347,22 +520,18 @@ def conclusions_page():
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     # Check if we have diagnosis results in the session
     has_diagnosis = 'diagnosis_results' in session and session['diagnosis_results']
     
     return render_template('pages/conclusions.html', 
-                          languages=langs,
+                          languages=context.languages,
                           current_lang=session['language'],
                           has_diagnosis=has_diagnosis,
-                          translations=get_translations_for_frontend(session['language']))
+                          translations=context.translations,
+                          translations_json=context.translations_json)
 
 @app.route('/questions_page')
 def questions_page():
@@ -370,13 +539,8 @@ def questions_page():
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     # Get FAQ data
     faqs = [
@@ -403,10 +567,11 @@ def questions_page():
     ]
     
     return render_template('pages/questions.html', 
-                          languages=langs,
+                          languages=context.languages,
                           current_lang=session['language'],
                           faqs=faqs,
-                          translations=get_translations_for_frontend(session['language']))
+                          translations=context.translations,
+                          translations_json=context.translations_json)
 
 @app.route('/about_page')
 def about_page():
@@ -414,18 +579,14 @@ def about_page():
     if 'language' not in session:
         session['language'] = 'en'
     
-    # Get available languages for the dropdown
-    langs = []
-    for lang in available_languages():
-        langs.append({
-            'code': lang,
-            'name': f"{get_translation('en', f'lang_{lang}')} ({lang})"
-        })
+    # Dropdown, frontend strings and symptom tree, built once per language
+    context = page_contexts.get(session['language'])
     
     return render_template('pages/about.html', 
-                          languages=langs,
+                          languages=context.languages,
                           current_lang=session['language'],
-                          translations=get_translations_for_frontend(session['language']))
+                          translations=context.translations,
+                          translations_json=context.translations_json)
 
 @app.route('/save-diagnosis-session', methods=['POST'])
 def save_diagnosis_session():
@@ -467,38 +628,8 @@ def generate_chart_from_session():
         results = session['formatted_results']
         diseases = [result['disease'] for result in results]
         confidences = [result['confidence'] for result in results]
-        
-        # Create chart
-        plt.figure(figsize=(10, 6), dpi=100)
-        # Use a colorful palette for bars
-        colors = ['#4361EE', '#3A0CA3', '#4CC9F0', '#F72585', '#7209B7']
-        bars = plt.barh(diseases, confidences, color=colors[:len(diseases)])
-        
-        # Add percentage labels to the end of each bar
-        for i, (disease, confidence) in enumerate(zip(diseases, confidences)):
-            plt.text(confidence + 1, i, f"{confidence}%", va='center', fontweight='bold')
-            
-        # Add title and labels with proper translation
-        plt.xlabel(get_translation(session['language'], 'confidence_percent'), fontsize=12)
-        plt.title(get_translation(session['language'], 'diagnosis_confidence'), fontsize=14, fontweight='bold')
-        
-        # Style the chart
-        plt.grid(axis='x', linestyle='--', alpha=0.6)
-        plt.tight_layout()
-        
-        # Save to memory
-        img_bytes = io.BytesIO()
-        plt.savefig(img_bytes, format='png')
-        img_bytes.seek(0)
-        plt.close()  # Important to close the figure
-        
-        # Convert to base64 for embedding in HTML
-        img_base64 = base64.b64encode(img_bytes.read()).decode('utf-8')
-        
-        return jsonify({
-            'success': True, 
-            'chart_data': f'data:image/png;base64,{img_base64}'
-        })
+        return chart_response(diseases, confidences, session['language'],
+                              request.args.get('format', 'base64'))
     except Exception as e:
         print(f"Chart generation error: {str(e)}")
         return jsonify({'success': False, 'message': f'Error generating chart: {str(e)}'})
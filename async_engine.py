@@ -0,0 +1,132 @@
+"""
+Asyncio front end for DiagnosisEngine and ShardedDiagnosisEngine.
+
+Single diagnoses and small batches against an in-process engine take well
+under a millisecond and run inline on the event loop. Larger batches, and
+anything sent to a sharded engine (which blocks on its worker processes),
+run in an executor; batches go over in chunks, so a cancelled or timed-out
+batch stops after the chunk in progress.
+
+Identical requests in flight at the same time are coalesced: callers asking
+for the same symptom set, k, threshold and scoring mode against the same
+knowledge-base version await one shared computation. It is cancelled only
+once every caller waiting on it has been cancelled or has timed out.
+
+Use one AsyncDiagnosisEngine per event loop:
+
+    diagnoser = AsyncDiagnosisEngine(engine)
+    results = await diagnoser.run_diagnosis({"fever": True}, k=5, timeout=2.0)
+"""
+
+import asyncio
+from functools import partial
+
+from diagnosis_engine import DEFAULT_MIN_CONFIDENCE, NUMPY_AVAILABLE, check_scoring
+from result_cache import DiagnosisCache
+from sharded_engine import ShardedDiagnosisEngine
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# Batches up to this many patients are scored inline
+INLINE_BATCH_SIZE = 64
+# Patients per executor call when a batch is offloaded
+BATCH_CHUNK_SIZE = 1024
+
+
+class AsyncDiagnosisEngine:
+    """Awaitable run_diagnosis / run_diagnosis_batch with coalescing and timeouts."""
+
+    def __init__(self, engine, executor=None, inline_batch_size=INLINE_BATCH_SIZE,
+                 chunk_size=BATCH_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.engine = engine
+        # None means the event loop's default executor
+        self.executor = executor
+        self.inline_batch_size = inline_batch_size
+        self.chunk_size = chunk_size
+        # Request key -> [shared task, number of callers awaiting it]
+        self._in_flight = {}
+        self.coalesced = 0
+
+    def _blocking(self):
+        return isinstance(self.engine, ShardedDiagnosisEngine)
+
+    async def run_diagnosis(self, symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE,
+                            scoring="overlap", timeout=None):
+        """Same results as engine.run_diagnosis; symptoms may also be a bitmask.
+
+        Raises asyncio.TimeoutError if the result takes longer than timeout
+        seconds.
+        """
+        check_scoring(scoring)
+        run = self.engine.run_diagnosis_mask if isinstance(symptoms, int) else self.engine.run_diagnosis
+        if not self._blocking():
+            return run(symptoms, k, min_confidence, scoring)
+        key = ("diagnosis", DiagnosisCache.key(symptoms, k, min_confidence, scoring), self.engine.version)
+        loop = asyncio.get_running_loop()
+        compute = partial(loop.run_in_executor, self.executor,
+                          partial(run, symptoms, k, min_confidence, scoring))
+        return list(await self._shared(key, compute, timeout))
+
+    async def run_diagnosis_batch(self, symptom_sets, compact=False, k=None,
+                                  min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap", timeout=None):
+        """Same results as engine.run_diagnosis_batch, offloaded in chunks when large."""
+        check_scoring(scoring)
+        symptom_sets = list(symptom_sets)
+        if len(symptom_sets) <= self.inline_batch_size and not self._blocking():
+            return self.engine.run_diagnosis_batch(symptom_sets, compact, k, min_confidence, scoring)
+        key = ("batch", tuple(DiagnosisCache.key(s)[0] for s in symptom_sets),
+               compact, k, float(min_confidence), scoring, self.engine.version)
+        compute = partial(self._batch_in_chunks, symptom_sets, compact, k, min_confidence, scoring)
+        results = await self._shared(key, compute, timeout)
+        return results.copy() if compact else [list(patient) for patient in results]
+
+    async def _batch_in_chunks(self, symptom_sets, compact, k, min_confidence, scoring):
+        loop = asyncio.get_running_loop()
+        chunks = []
+        for start in range(0, len(symptom_sets), self.chunk_size):
+            chunk = symptom_sets[start:start + self.chunk_size]
+            chunks.append(await loop.run_in_executor(
+                self.executor,
+                partial(self.engine.run_diagnosis_batch, chunk, compact, k, min_confidence, scoring)))
+        if compact:
+            if not chunks:
+                return np.zeros((0, len(self.engine.disease_names)))
+            return np.concatenate(chunks)
+        return [patient for chunk in chunks for patient in chunk]
+
+    async def _shared(self, key, compute, timeout):
+        # Await the in-flight computation for key, starting it if there is
+        # none. Each caller waits through a shield, so one caller giving up
+        # does not cancel the others' result.
+        entry = self._in_flight.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(compute()), 0]
+            self._in_flight[key] = entry
+            entry[0].add_done_callback(partial(self._finished, key, entry))
+        else:
+            self.coalesced += 1
+        entry[1] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # Unregister before cancelling: the done callback runs later,
+                # and a caller arriving meanwhile must start a fresh task
+                if self._in_flight.get(key) is entry:
+                    del self._in_flight[key]
+                entry[0].cancel()
+
+    def _finished(self, key, entry, task):
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Retrieve the exception so an unawaited failure is not logged
+            task.exception()
+
+    def stats(self):
+        """In-flight and coalesced request counts."""
+        return {"in_flight": len(self._in_flight), "coalesced": self.coalesced}
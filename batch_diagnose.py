@@ -0,0 +1,254 @@
+"""
+Streaming batch diagnosis of patient records from JSONL or CSV.
+
+Records are read from a file or stdin in chunks of --chunk-size, scored with
+run_diagnosis_batch across a pool of worker processes and written out in
+input order as they complete. At most a few chunks per worker are in flight
+at once, so memory stays constant however large the input is. A throughput
+report goes to stderr at the end.
+
+Input records carry an ID and the selected symptoms:
+
+    JSONL: {"id": "p1", "symptoms": ["fever", "cough"]}
+           (symptoms may also be a {"fever": true, ...} dict)
+    CSV:   id,symptoms
+           p1,fever;cough
+
+JSONL output has one {"id": ..., "results": [{"disease", "confidence",
+"advice"}, ...]} line per patient; CSV output has one id,rank,disease,
+confidence,advice row per result, and a row with only the id for a patient
+no disease qualified for, so every patient appears in either format. The
+report counts those patients. Malformed records are skipped and counted.
+
+Usage:
+    python batch_diagnose.py intake.jsonl --output results.jsonl --k 5
+    zcat intake.csv.gz | python batch_diagnose.py - --format csv --profiles kb.dxkb
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from diagnosis_engine import BACKENDS, DEFAULT_MIN_CONFIDENCE, SCORING_MODES, DiagnosisEngine
+from knowledge_base import load_profiles
+
+FORMATS = ("jsonl", "csv")
+CSV_FIELDS = ("id", "rank", "disease", "confidence", "advice")
+# Chunks queued per worker, enough to keep every worker busy
+CHUNKS_PER_WORKER = 2
+
+# The engine of this worker process, set by _init_worker
+_worker_engine = None
+
+
+def _init_worker(profiles_path, backend):
+    global _worker_engine
+    _worker_engine = build_engine(profiles_path, backend)
+
+
+def _score_chunk(symptom_sets, k, min_confidence, scoring):
+    return _worker_engine.run_diagnosis_batch(symptom_sets, k=k, min_confidence=min_confidence,
+                                              scoring=scoring)
+
+
+def build_engine(profiles_path=None, backend="python"):
+    """Engine over the profiles file (JSON, CSV or snapshot), or the built-in profiles."""
+    if profiles_path is None:
+        return DiagnosisEngine(backend=backend)
+    return DiagnosisEngine(backend=backend, disease_profiles=load_profiles(profiles_path))
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return "csv" if extension == "csv" else "jsonl"
+
+
+def _selected(symptoms):
+    if isinstance(symptoms, dict):
+        return [s for s, v in symptoms.items() if v]
+    if isinstance(symptoms, list) and all(isinstance(s, str) for s in symptoms):
+        return symptoms
+    raise ValueError("symptoms must be a list of names or a dict of flags")
+
+
+def read_jsonl(stream, stats):
+    """(id, symptom names) for each well-formed line of stream."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield record.get("id"), _selected(record["symptoms"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            stats["skipped"] += 1
+
+
+def read_csv(stream, stats):
+    """(id, symptom names) for each well-formed id,symptoms row of stream."""
+    for row in csv.DictReader(stream):
+        symptoms = row.get("symptoms")
+        if symptoms is None:
+            stats["skipped"] += 1
+            continue
+        yield row.get("id"), [s.strip() for s in symptoms.split(";") if s.strip()]
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv}
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, patient_id, results):
+        record = {"id": patient_id,
+                  "results": [{"disease": d, "confidence": c, "advice": a} for d, c, a in results]}
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(CSV_FIELDS)
+
+    def write(self, patient_id, results):
+        if not results:
+            self.writer.writerow((patient_id, "", "", "", ""))
+            return
+        self.writer.writerows((patient_id, rank, d, c, a) for rank, (d, c, a) in enumerate(results, 1))
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_stream(records, writer, args, stats):
+    """Score (id, symptoms) records chunk by chunk and write results in input order."""
+    score_args = (args.k, args.min_confidence, args.scoring)
+
+    def emit(ids, rankings):
+        for patient_id, results in zip(ids, rankings):
+            writer.write(patient_id, results)
+            if not results:
+                stats["unmatched"] += 1
+        stats["patients"] += len(ids)
+        stats["chunks"] += 1
+
+    if args.workers == 0:
+        engine = build_engine(args.profiles, args.backend)
+        for chunk in chunked(records, args.chunk_size):
+            ids, symptom_sets = zip(*chunk)
+            emit(ids, engine.run_diagnosis_batch(list(symptom_sets), k=args.k,
+                                                 min_confidence=args.min_confidence, scoring=args.scoring))
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.profiles, args.backend)) as pool:
+        for chunk in chunked(records, args.chunk_size):
+            ids, symptom_sets = zip(*chunk)
+            pending.append((ids, pool.submit(_score_chunk, list(symptom_sets), *score_args)))
+            # Bound the work in flight rather than reading the input ahead
+            if len(pending) >= args.workers * CHUNKS_PER_WORKER:
+                ids, future = pending.popleft()
+                emit(ids, future.result())
+        while pending:
+            ids, future = pending.popleft()
+            emit(ids, future.result())
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(stats, elapsed, stream):
+    rate = stats["patients"] / elapsed if elapsed else 0.0
+    print(f"Diagnosed {stats['patients']} patients in {stats['chunks']} chunks in {elapsed:.2f}s "
+          f"({rate:.0f} patients/s); {stats['unmatched']} matched no disease; "
+          f"skipped {stats['skipped']} malformed records", file=stream)
+    peak = peak_memory_mb()
+    if peak is not None:
+        print(f"Peak memory of the reading process: {peak:.1f} MB", file=stream)
+
+
+def _open_input(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _open_output(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="", write_through=False)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnose a stream of patient records")
+    parser.add_argument("input", help="JSONL or CSV file of patient records, or - for stdin")
+    parser.add_argument("--output", default="-", help="file for the results (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="input format (default: from the file extension)")
+    parser.add_argument("--output-format", choices=FORMATS, help="output format (default: the input format)")
+    parser.add_argument("--profiles", help="disease profiles (.json, .csv or compiled snapshot)")
+    parser.add_argument("--backend", choices=BACKENDS, default="python")
+    parser.add_argument("--scoring", choices=SCORING_MODES, default="overlap")
+    parser.add_argument("--k", type=int, default=None, help="results per patient (default: all)")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="patients per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, 0 to score in this process (default: CPU count)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.workers < 0:
+        parser.error("--workers must not be negative")
+    if not math.isfinite(args.min_confidence):
+        parser.error("--min-confidence must be a finite number")
+    if args.format is None:
+        args.format = "jsonl" if args.input == "-" else detect_format(args.input)
+    if args.output_format is None:
+        args.output_format = args.format
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stats = {"patients": 0, "chunks": 0, "skipped": 0, "unmatched": 0}
+    start = time.perf_counter()
+    source = _open_input(args.input)
+    sink = _open_output(args.output)
+    try:
+        records = READERS[args.format](source, stats)
+        score_stream(records, WRITERS[args.output_format](sink), args, stats)
+    finally:
+        sink.flush()
+        if args.output != "-":
+            sink.close()
+        if args.input != "-":
+            source.close()
+    report(stats, time.perf_counter() - start, sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
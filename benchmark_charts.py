@@ -0,0 +1,120 @@
+"""
+Benchmark of confidence chart rendering: template reuse against fresh figures.
+
+"fresh" builds a new Figure, axes, grid, title and labels and runs
+tight_layout for every chart, as the chart routes did before ChartTemplate;
+"template" renders through chart_renderer.render_bar_chart, which reuses
+one laid-out figure per language. Both draw the same charts, using real
+disease names in every requested language, and report throughput, p50/p99
+latency and peak traced memory per chart as JSON, like benchmark_engine.py.
+
+Usage:
+    python benchmark_charts.py --charts 200 --languages en,es,ur --output chart_bench.json
+"""
+
+import argparse
+import io
+import json
+import random
+import warnings
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from benchmark_engine import environment, measure
+from chart_renderer import BAR_COLORS, render_bar_chart
+from diagnosis_engine import DiagnosisEngine
+from localization import available_languages, get_translation
+
+MODES = ("fresh", "template")
+
+
+def render_fresh(diseases, confidences, title, xlabel):
+    """The chart built from scratch, the way it was before template reuse."""
+    figure = Figure(figsize=(10, 6), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.barh(diseases, confidences, color=BAR_COLORS[:len(diseases)])
+    for i, confidence in enumerate(confidences):
+        axes.text(confidence + 1, i, f"{confidence}%", va='center', fontweight='bold')
+    axes.set_xlabel(xlabel, fontsize=12)
+    axes.set_title(title, fontsize=14, fontweight='bold')
+    axes.grid(axis='x', linestyle='--', alpha=0.6)
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+RENDERERS = {"fresh": render_fresh, "template": render_bar_chart}
+
+
+def generate_charts(count, languages, max_bars=5, seed=0):
+    """(diseases, confidences, title, xlabel) argument tuples, cycling through languages."""
+    rng = random.Random(seed)
+    names = list(DiagnosisEngine().disease_names)
+    charts = []
+    for i in range(count):
+        lang = languages[i % len(languages)]
+        chosen = rng.sample(names, rng.randint(1, min(max_bars, len(names))))
+        confidences = sorted((round(rng.uniform(5, 100), 1) for _ in chosen), reverse=True)
+        charts.append(([get_translation(lang, name) for name in chosen], confidences,
+                       get_translation(lang, 'diagnosis_confidence'), get_translation(lang, 'confidence_percent')))
+    return charts
+
+
+def run(args):
+    charts = generate_charts(args.charts, args.languages, args.max_bars, args.seed)
+    results = []
+    for mode in args.modes:
+        render = RENDERERS[mode]
+        # One chart per language first, so template builds are not timed
+        for lang_chart in charts[:len(args.languages)]:
+            render(*lang_chart)
+        stats = measure(render, charts)
+        results.append({"mode": mode, "languages": args.languages, **stats})
+        report(results[-1])
+    if {"fresh", "template"} <= set(args.modes):
+        fresh, template = (next(r for r in results if r["mode"] == m) for m in ("fresh", "template"))
+        print(f"template speedup: {template['throughput'] / fresh['throughput']:.2f}x, "
+              f"peak memory {template['peak_memory_bytes'] / max(fresh['peak_memory_bytes'], 1):.2f}x of fresh")
+    return results
+
+
+def report(result):
+    print(f"{result['mode']:<9}{result['throughput']:>9.1f} charts/s  p50 {result['p50_ms']:>8.2f} ms"
+          f"  p99 {result['p99_ms']:>8.2f} ms  peak {result['peak_memory_bytes'] / 1024:>9.1f} KiB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark confidence chart rendering")
+    parser.add_argument("--charts", type=int, default=200, help="charts rendered per mode")
+    parser.add_argument("--languages", default=",".join(available_languages()),
+                        type=lambda v: v.split(","), help="comma-separated languages to cycle through")
+    parser.add_argument("--max-bars", type=int, default=5, help="most diseases per chart")
+    parser.add_argument("--modes", default=",".join(MODES), type=lambda v: v.split(","),
+                        help="comma-separated renderers to compare (default: fresh,template)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="chart_bench.json", help="JSON file for the results")
+    args = parser.parse_args(argv)
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    if args.charts < 1 or args.max_bars < 1:
+        parser.error("--charts and --max-bars must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # DejaVu Sans lacks some Urdu glyphs; both renderers draw the same text
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    warnings.filterwarnings("ignore", message="Matplotlib currently does not support Arabic")
+    results = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Microbenchmarks for DiagnosisEngine on synthetic catalogs.
+
+For each catalog size and backend this reports, per engine operation,
+throughput, p50/p99 latency and peak traced memory, and writes the results
+as JSON so runs can be compared across changes. MinHash/LSH retrieval is
+measured the same way for each --lsh bands x rows setting, together with its
+recall of the diseases brute-force calculate_confidence finds.
+run_diagnosis_loop diagnoses the run_diagnosis_batch batches one patient at a
+time, as the baseline the batch path has to beat.
+
+Usage:
+    python benchmark_engine.py --diseases 1000,10000,100000 --output bench_results.json
+    python benchmark_engine.py --diseases 100000 --operations run_diagnosis --lsh 16x2,32x2,64x1
+    python benchmark_engine.py --operations run_diagnosis_batch,run_diagnosis_loop
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from diagnosis_engine import DiagnosisEngine, NUMPY_AVAILABLE
+from lsh_index import MinHashIndex
+from synthetic_catalog import generate_catalog, generate_workload
+
+# Queries traced for peak memory; tracing is too slow to cover a whole run
+MEMORY_SAMPLE = 20
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(operation, calls, items=None):
+    """Time operation over each argument in calls.
+
+    items is the number of items all the calls process together, one per
+    call by default. Returns throughput in items per second, p50/p99 latency
+    per call in milliseconds and the peak traced memory of a sample of calls
+    in bytes.
+    """
+    if items is None:
+        items = len(calls)
+    latencies = []
+    gc.collect()
+    start = time.perf_counter()
+    for args in calls:
+        call_start = time.perf_counter()
+        operation(*args)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    for args in calls[:MEMORY_SAMPLE]:
+        operation(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": len(calls),
+        "items": items,
+        "throughput": items / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_build(catalog, backend, workload, args):
+    calls = [(catalog,)] * args.build_repeat
+    return measure(lambda profiles: DiagnosisEngine(backend=backend, disease_profiles=profiles), calls)
+
+
+def bench_calculate_confidence(engine, workload, args):
+    return measure(engine.calculate_confidence, [(symptoms,) for symptoms in workload])
+
+
+def bench_run_diagnosis(engine, workload, args):
+    dicts = [({s: True for s in symptoms},) for symptoms in workload]
+    return measure(engine.run_diagnosis, dicts)
+
+
+def bench_run_diagnosis_mask(engine, workload, args):
+    masks = [(engine.vocabulary.to_mask(symptoms),) for symptoms in workload]
+    return measure(engine.run_diagnosis_mask, masks)
+
+
+def bench_run_diagnosis_top_k(engine, workload, args):
+    dicts = [({s: True for s in symptoms},) for symptoms in workload]
+    return measure(lambda symptoms: engine.run_diagnosis(symptoms, k=5), dicts)
+
+
+def bench_run_diagnosis_bayes(engine, workload, args):
+    dicts = [({s: True for s in symptoms},) for symptoms in workload]
+    return measure(lambda symptoms: engine.run_diagnosis(symptoms, scoring="bayes"), dicts)
+
+
+def bench_run_diagnosis_batch(engine, workload, args):
+    batches = [(workload[i:i + args.batch_size],) for i in range(0, len(workload), args.batch_size)]
+    # The last batch may be partial, so count the patients actually scored
+    return measure(engine.run_diagnosis_batch, batches, items=len(workload))
+
+
+def bench_run_diagnosis_loop(engine, workload, args):
+    # The batches of run_diagnosis_batch, diagnosed one patient at a time
+    batches = [(workload[i:i + args.batch_size],) for i in range(0, len(workload), args.batch_size)]
+    return measure(lambda batch: [engine.run_diagnosis(dict.fromkeys(symptoms, True)) for symptoms in batch],
+                   batches, items=len(workload))
+
+
+def lsh_recall(engine, index, workload, min_confidence=50):
+    """Recall of an LSH index against brute-force calculate_confidence.
+
+    Recall is the fraction of diseases reaching min_confidence that the index
+    also returns; mean_candidates is how many diseases it scores per query.
+    """
+    found = expected = candidates = 0
+    for symptoms in workload:
+        exact = {d for d, c in engine.calculate_confidence(symptoms).items() if c >= min_confidence}
+        approximate = {d for d, _, _ in index.run_diagnosis(dict.fromkeys(symptoms, True),
+                                                             min_confidence=min_confidence)}
+        found += len(exact & approximate)
+        expected += len(exact)
+        candidates += len(index.candidates(symptoms))
+    return {
+        "recall": found / expected if expected else 1.0,
+        "mean_candidates": candidates / len(workload) if workload else 0.0,
+    }
+
+
+def bench_lsh(engine, workload, bands, rows):
+    build_start = time.perf_counter()
+    index = MinHashIndex(engine, bands=bands, rows=rows)
+    build_seconds = time.perf_counter() - build_start
+    dicts = [({s: True for s in symptoms},) for symptoms in workload]
+    stats = measure(index.run_diagnosis, dicts)
+    return {**stats, **lsh_recall(engine, index, workload), "build_seconds": build_seconds}
+
+
+# Benchmarks run against a constructed engine, by operation name
+ENGINE_BENCHMARKS = {
+    "calculate_confidence": bench_calculate_confidence,
+    "run_diagnosis": bench_run_diagnosis,
+    "run_diagnosis_mask": bench_run_diagnosis_mask,
+    "run_diagnosis_top_k": bench_run_diagnosis_top_k,
+    "run_diagnosis_bayes": bench_run_diagnosis_bayes,
+    "run_diagnosis_batch": bench_run_diagnosis_batch,
+    "run_diagnosis_loop": bench_run_diagnosis_loop,
+}
+
+
+def run(args):
+    results = []
+    for num_diseases in args.diseases:
+        catalog = generate_catalog(num_diseases, args.symptoms, seed=args.seed)
+        workload = generate_workload(catalog, args.queries, seed=args.seed + 1)
+        for backend in args.backends:
+            row = {"diseases": num_diseases, "symptoms": args.symptoms, "backend": backend}
+            stats = bench_build(catalog, backend, workload, args)
+            results.append({**row, "operation": "build", **stats})
+            report(results[-1])
+
+            engine = DiagnosisEngine(backend=backend, disease_profiles=catalog)
+            throughput = {}
+            for name in args.operations:
+                stats = ENGINE_BENCHMARKS[name](engine, workload, args)
+                results.append({**row, "operation": name, **stats})
+                report(results[-1])
+                throughput[name] = stats["throughput"]
+            if {"run_diagnosis_batch", "run_diagnosis_loop"} <= set(throughput):
+                print(f"{'':<25}batch speedup over per-patient loop: "
+                      f"{throughput['run_diagnosis_batch'] / throughput['run_diagnosis_loop']:.2f}x")
+            for bands, rows in args.lsh:
+                stats = bench_lsh(engine, workload, bands, rows)
+                results.append({**row, "operation": f"lsh_{bands}x{rows}", **stats})
+                report(results[-1])
+            del engine
+    return results
+
+
+def report(result):
+    print(f"{result['diseases']:>7} diseases  {result['backend']:<6}  {result['operation']:<22}"
+          f"{result['throughput']:>12.1f}/s  p50 {result['p50_ms']:>9.3f} ms"
+          f"  p99 {result['p99_ms']:>9.3f} ms  peak {result['peak_memory_bytes'] / 1024:>10.1f} KiB"
+          + (f"  recall {result['recall']:.3f}" if "recall" in result else ""))
+
+
+def environment():
+    """Describe the interpreter and libraries the results were taken with."""
+    info = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "argv": sys.argv[1:],
+    }
+    if NUMPY_AVAILABLE:
+        import numpy
+        info["numpy"] = numpy.__version__
+    return info
+
+
+def parse_lsh(value):
+    settings = []
+    for setting in value.split(","):
+        bands, _, rows = setting.partition("x")
+        if not (bands.isdigit() and rows.isdigit()):
+            raise argparse.ArgumentTypeError(f"expected BANDSxROWS, got {setting!r}")
+        settings.append((int(bands), int(rows)))
+    return settings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DiagnosisEngine on synthetic catalogs")
+    parser.add_argument("--diseases", default="1000,10000",
+                        type=lambda v: [int(x) for x in v.split(",")],
+                        help="comma-separated catalog sizes (default: 1000,10000)")
+    parser.add_argument("--symptoms", type=int, default=2000, help="symptom vocabulary size")
+    parser.add_argument("--queries", type=int, default=500, help="symptom sets per operation")
+    parser.add_argument("--batch-size", type=int, default=100, help="patients per run_diagnosis_batch call")
+    parser.add_argument("--build-repeat", type=int, default=3, help="engine constructions to time")
+    parser.add_argument("--backends", default=None, type=lambda v: v.split(","),
+                        help="comma-separated backends (default: python, plus numpy if installed)")
+    parser.add_argument("--operations", default=",".join(ENGINE_BENCHMARKS),
+                        type=lambda v: v.split(","), help="comma-separated operations to run")
+    parser.add_argument("--lsh", default=[], type=parse_lsh,
+                        help="comma-separated MinHash/LSH settings as BANDSxROWS, e.g. 16x2,32x2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    args = parser.parse_args(argv)
+    if args.backends is None:
+        args.backends = ["python", "numpy"] if NUMPY_AVAILABLE else ["python"]
+    unknown = set(args.operations) - set(ENGINE_BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Content-addressed cache of rendered chart images.
+
+A chart is identified by the SHA-256 of everything that goes into drawing it
+(output format, bar labels, confidences, title and axis text), so the key
+doubles as an ETag and cached images never go stale: changed inputs or
+translations simply hash to a new key. Images are kept in memory up to a
+total byte budget, least recently used first out, and optionally in a
+directory shared by worker processes and restarts. The directory has its own
+budget: every process rescans it after writing an eighth of the budget and
+deletes the least recently used files (by mtime, refreshed on disk hits)
+until it fits, so it overshoots by at most an eighth per writing process.
+
+Chart URLs should not depend on a cache entry surviving, so chart_token
+encodes the chart inputs themselves as compressed, URL-safe text that
+parse_chart_token turns back into them on any process.
+
+Usage:
+    cache = ChartCache(maxbytes=32 << 20, directory="chart_cache", max_disk_bytes=256 << 20)
+    key = chart_key("png", labels, confidences, title, xlabel)
+    png = cache.get_or_render(key, lambda: render(labels, confidences))
+    token = chart_token(labels, confidences, title, xlabel)
+    labels, confidences, title, xlabel = parse_chart_token(token)
+"""
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+# Fraction of max_disk_bytes a process writes between directory scans
+DISK_SCAN_FRACTION = 8
+# Largest decoded payload parse_chart_token accepts
+MAX_TOKEN_PAYLOAD = 16 << 10
+
+
+def chart_key(*parts):
+    """Hex SHA-256 of the JSON-serialisable chart inputs."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chart_token(*parts):
+    """URL-safe text encoding the JSON-serialisable chart inputs."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(zlib.compress(payload, 9)).rstrip(b"=").decode("ascii")
+
+
+def parse_chart_token(token):
+    """The list of parts encoded by chart_token; ValueError if token is not one."""
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        decompressor = zlib.decompressobj()
+        # Bounded, so a small token cannot expand into a huge payload
+        payload = decompressor.decompress(data, MAX_TOKEN_PAYLOAD)
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ValueError("chart token payload too large or truncated")
+        parts = json.loads(payload)
+    except (ValueError, zlib.error) as e:
+        raise ValueError("Not a chart token") from e
+    if not isinstance(parts, list):
+        raise ValueError("Not a chart token")
+    return parts
+
+
+class ChartCache:
+    """Thread-safe byte-bounded LRU of chart images with an optional disk tier."""
+
+    def __init__(self, maxbytes=32 << 20, directory=None, max_disk_bytes=256 << 20):
+        if maxbytes < 1 or max_disk_bytes < 1:
+            raise ValueError("maxbytes and max_disk_bytes must be at least 1")
+        self.maxbytes = maxbytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bytes this process wrote to disk since it last scanned the directory
+        self._disk_written = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.trim_disk()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.chart")
+
+    def get(self, key):
+        """Cached image bytes for key, or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Recently used files are the last to be trimmed
+                os.utime(path)
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.disk_hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """Store image bytes under key, in memory and on disk if configured."""
+        self._remember(key, data)
+        if self.directory is None or len(data) > self.max_disk_bytes:
+            return
+        # Write then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_written += len(data)
+            scan = self._disk_written > self.max_disk_bytes // DISK_SCAN_FRACTION
+            if scan:
+                self._disk_written = 0
+        if scan:
+            self.trim_disk()
+
+    def trim_disk(self):
+        """Delete the least recently used chart files until the directory fits max_disk_bytes.
+
+        Counts the files of every process sharing the directory. Returns the
+        number of files deleted.
+        """
+        files = []
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".chart"):
+                    continue
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue  # deleted by another process meanwhile
+                files.append((info.st_mtime, info.st_size, entry.path))
+                total += info.st_size
+        deleted = 0
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self.disk_evictions += deleted
+        return deleted
+
+    def _remember(self, key, data):
+        if len(data) > self.maxbytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """Cached bytes for key, calling render() to produce and store them on a miss."""
+        data = self.get(key)
+        if data is None:
+            # Render outside the lock so misses do not serialise requests
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        """Drop the in-memory tier; files on disk and counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters and occupancy, e.g. for a monitoring endpoint."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "maxbytes": self.maxbytes,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "disk": self.directory is not None,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
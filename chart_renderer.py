@@ -0,0 +1,359 @@
+"""
+Confidence charts rendered in worker processes.
+
+render_bar_chart draws with matplotlib's object-oriented Figure and Agg
+canvas, so it shares no global pyplot state and is safe to call from any
+thread. ChartRenderPool runs it in a few worker processes, which keeps the
+rendering (and the GIL it holds) away from the web server's request threads.
+
+Charts are drawn on ChartTemplates: a styled figure with its title, axis
+label, grid and spines, built once per title, axis label and ChartStyle (in
+practice once per language and size) and kept in a small LRU. Each chart
+then only updates the bar widths, colours, tick labels and value
+annotations; the fixed margins come from one tight_layout run when the
+template is built, and only the left margin follows the width of the
+disease names.
+
+Besides PNG, charts render as compact SVG, with text kept as <text>
+elements for the browser to shape (which also gets Urdu right), or are
+described by chart_spec as plain data for drawing on the client.
+
+The pool accepts at most max_pending jobs, queued or running. Past that,
+render raises ChartPoolBusy straight away instead of queueing, so callers
+can answer with a retry hint; a job that takes longer than timeout seconds
+raises ChartRenderTimeout. A timed-out job that has not started is dropped.
+One that is already running may be hung, and ProcessPoolExecutor cannot stop
+a single job, so the pool is recycled: later charts go to fresh workers and
+the old ones are terminated, which frees their slots. Other charts running
+on the old workers at that moment fail with ChartRenderTimeout too.
+
+Usage:
+    png = render_bar_chart(["Flu", "Cold"], [80.0, 45.5], "Diagnosis confidence", "Confidence (%)")
+    pool = ChartRenderPool(workers=2, max_pending=8, timeout=10.0)
+    png = pool.render(["Flu", "Cold"], [80.0, 45.5], "Diagnosis confidence", "Confidence (%)")
+"""
+
+import io
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import Rectangle
+
+BAR_COLORS = ('#4361EE', '#3A0CA3', '#4CC9F0', '#F72585', '#7209B7')
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_TIMEOUT = 10.0
+# Image formats render_bar_chart produces
+IMAGE_FORMATS = ("png", "svg")
+# SVG text as <text> rather than glyph paths, and stable element IDs so the
+# same chart always gives the same bytes
+SVG_RC = {"svg.fonttype": "none", "svg.hashsalt": "chart"}
+# Templates kept per process; one per language and style in practice
+TEMPLATE_CACHE_SIZE = 16
+# Largest left margin, as a fraction of the width, for long disease names
+MAX_LEFT_MARGIN = 0.6
+# Most bar artists a template keeps between renders; a larger chart adds
+# its extra bars for itself and removes them afterwards, so one big chart
+# cannot slow every later one down
+TEMPLATE_BARS = 20
+
+# Everything about a chart's look that does not depend on its data. Sizes are
+# in points; minimal hides the top and right spines and greys the others.
+ChartStyle = namedtuple("ChartStyle", (
+    "figsize", "dpi", "colors", "facecolor", "text_color", "title_color",
+    "title_size", "xlabel_size", "tick_size", "value_size",
+    "bar_height", "bar_alpha", "grid_alpha", "minimal"))
+
+WEB_STYLE = ChartStyle(figsize=(10, 6), dpi=100, colors=BAR_COLORS, facecolor='white',
+                       text_color='black', title_color='black', title_size=14, xlabel_size=12,
+                       tick_size=10, value_size=10, bar_height=0.8, bar_alpha=1.0,
+                       grid_alpha=0.6, minimal=False)
+
+
+class ChartPoolBusy(RuntimeError):
+    """Raised when the pool already has max_pending jobs."""
+
+
+class ChartRenderTimeout(TimeoutError):
+    """Raised when a chart is not rendered within the pool's timeout."""
+
+
+class ChartTemplate:
+    """A styled, laid-out bar chart figure that is redrawn with new data."""
+
+    def __init__(self, title, xlabel, style=WEB_STYLE):
+        self.style = style
+        self._lock = threading.Lock()
+        figure = self.figure = Figure(figsize=style.figsize, dpi=style.dpi, facecolor=style.facecolor)
+        self.canvas = FigureCanvasAgg(figure)
+        axes = self.axes = figure.add_subplot()
+        axes.set_facecolor(style.facecolor)
+        # Labels are plain text: "$" must not switch to mathtext, whose parser
+        # fails on (or recurses through) arbitrary input
+        axes.set_xlabel(xlabel, fontsize=style.xlabel_size, color=style.text_color, parse_math=False)
+        axes.set_title(title, fontsize=style.title_size, fontweight='bold', color=style.title_color,
+                       parse_math=False)
+        axes.tick_params(axis='both', colors=style.text_color, labelsize=style.tick_size)
+        if style.minimal:
+            axes.spines['top'].set_visible(False)
+            axes.spines['right'].set_visible(False)
+            axes.spines['left'].set_color('#DDDDDD')
+            axes.spines['bottom'].set_color('#DDDDDD')
+            axes.xaxis.grid(True, linestyle='--', alpha=style.grid_alpha, color='#888888')
+        else:
+            axes.grid(axis='x', linestyle='--', alpha=style.grid_alpha)
+        axes.set_yticks([])
+        self.bars = []
+        self.values = []
+        # Lay out once without tick labels; charts then only move the left edge
+        figure.tight_layout()
+        params = figure.subplotpars
+        self._margins = (params.right, params.top, params.bottom)
+        self._base_left = params.left
+        self._left = None
+        self._tick_font = FontProperties(size=style.tick_size)
+        # Tick length, tick label pad and tight_layout's border pad, in points
+        self._label_pad = 3.5 + 3.5 + 1.08 * FontProperties(size='medium').get_size_in_points()
+
+    def _ensure_bars(self, count):
+        style = self.style
+        while len(self.bars) < count:
+            i = len(self.bars)
+            bar = Rectangle((0, i - style.bar_height / 2), 0, style.bar_height,
+                            facecolor=style.colors[i % len(style.colors)], edgecolor='none',
+                            alpha=style.bar_alpha)
+            self.axes.add_patch(bar)
+            self.bars.append(bar)
+            self.values.append(self.axes.text(0, i, "", va='center', color=style.text_color,
+                                              fontweight='bold', fontsize=style.value_size,
+                                              parse_math=False))
+
+    def _trim_bars(self, count):
+        for artist in self.bars[count:] + self.values[count:]:
+            artist.remove()
+        del self.bars[count:], self.values[count:]
+
+    def _fit_labels(self, labels):
+        # Left margin wide enough for the longest label, measured with the
+        # canvas renderer instead of a full tight_layout pass
+        renderer = self.canvas.get_renderer()
+        widest = max((renderer.get_text_width_height_descent(label, self._tick_font, ismath=False)[0]
+                      for label in labels), default=0)
+        needed = (widest + self._label_pad * self.style.dpi / 72) / (self.style.figsize[0] * self.style.dpi)
+        left = min(MAX_LEFT_MARGIN, max(self._base_left, needed))
+        if left != self._left:
+            right, top, bottom = self._margins
+            self.figure.subplots_adjust(left=left, right=right, top=top, bottom=bottom)
+            self._left = left
+
+    def render(self, diseases, confidences, format='png'):
+        """PNG or SVG bytes of the chart with one bar per disease."""
+        if format not in IMAGE_FORMATS:
+            raise ValueError(f"unknown chart format {format!r}")
+        diseases = [str(disease) for disease in diseases]
+        count = len(diseases)
+        with self._lock:
+            kept = len(self.bars)
+            self._ensure_bars(count)
+            for i, (bar, value) in enumerate(zip(self.bars, self.values)):
+                shown = i < count
+                bar.set_visible(shown)
+                value.set_visible(shown)
+                if shown:
+                    confidence = confidences[i]
+                    bar.set_width(confidence)
+                    value.set_position((confidence + 1, i))
+                    value.set_text(f"{confidence}%")
+            axes = self.axes
+            axes.set_yticks(range(count), labels=diseases, parse_math=False)
+            # Same vertical limits autoscaling would give the bars
+            span = max(count - 1 + self.style.bar_height, 0)
+            axes.set_ylim(-self.style.bar_height / 2 - 0.05 * span,
+                          count - 1 + self.style.bar_height / 2 + 0.05 * span)
+            # Headroom past the longest bar for its value label
+            axes.set_xlim(0, (max(confidences, default=0) or 1) * 1.15)
+            self._fit_labels(diseases)
+            buffer = io.BytesIO()
+            if format == 'svg':
+                with matplotlib.rc_context(SVG_RC):
+                    self.figure.savefig(buffer, format='svg', facecolor=self.style.facecolor,
+                                        metadata={'Date': None})
+            else:
+                self.figure.savefig(buffer, format='png', facecolor=self.style.facecolor)
+            if count > TEMPLATE_BARS:
+                self._trim_bars(kept)
+            return buffer.getvalue()
+
+
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def chart_template(title, xlabel, style=WEB_STYLE):
+    """The shared ChartTemplate for title, xlabel and style, built on first use."""
+    key = (title, xlabel, style)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+    template = ChartTemplate(title, xlabel, style)
+    with _templates_lock:
+        template = _templates.setdefault(key, template)
+        _templates.move_to_end(key)
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
+
+
+def render_bar_chart(diseases, confidences, title, xlabel, style=WEB_STYLE, format='png'):
+    """Horizontal confidence bar chart as PNG (or SVG) bytes."""
+    return chart_template(title, xlabel, style).render(diseases, confidences, format)
+
+
+def chart_spec(diseases, confidences, title, xlabel, style=WEB_STYLE):
+    """The chart as JSON-serialisable data, for drawing on the client."""
+    return {
+        "title": title,
+        "xlabel": xlabel,
+        "bars": [{"label": str(disease), "value": confidence, "color": style.colors[i % len(style.colors)]}
+                 for i, (disease, confidence) in enumerate(zip(diseases, confidences))],
+    }
+
+
+def _warm_up():
+    # Loads fonts and the Agg renderer before the first real job
+    render_bar_chart(["-"], [0], "", "")
+
+
+class ChartRenderPool:
+    """Bounded pool of chart-rendering processes; workers=0 renders in the calling thread."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT):
+        if workers < 0:
+            raise ValueError("workers must not be negative")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rendered = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self._executor = self._start() if workers else None
+
+    def _start(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start every worker now, while the caller is still single-threaded
+        # (e.g. at web server import time), rather than on the first chart
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def render(self, diseases, confidences, title, xlabel, format='png'):
+        """PNG or SVG bytes of render_bar_chart(...).
+
+        Raises ChartPoolBusy when max_pending jobs are already queued or
+        running, and ChartRenderTimeout when the chart takes too long.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ChartPoolBusy(f"{self._pending} charts already pending")
+            self._pending += 1
+        executor = self._executor
+        if executor is None:
+            try:
+                image = render_bar_chart(diseases, confidences, title, xlabel, format=format)
+            finally:
+                self._release()
+        else:
+            try:
+                future = executor.submit(render_bar_chart, list(diseases), list(confidences), title, xlabel,
+                                         format=format)
+            except BaseException as error:
+                self._release()
+                if isinstance(error, BrokenProcessPool):
+                    self._restart(executor)
+                raise
+            # The slot is freed when the worker finishes, not when we stop waiting
+            future.add_done_callback(self._release)
+            try:
+                image = future.result(self.timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                # Drops the job if no worker has picked it up yet; otherwise
+                # its worker may be stuck for good
+                if not future.cancel():
+                    self._recycle(executor)
+                raise ChartRenderTimeout(f"chart not rendered within {self.timeout}s") from None
+            except BrokenProcessPool:
+                if self._executor is not executor:
+                    # Terminated along with a timed-out job's worker
+                    raise ChartRenderTimeout("chart worker recycled after another chart timed out") from None
+                # A worker died; later charts get a fresh pool
+                self._restart(executor)
+                raise
+        with self._lock:
+            self.rendered += 1
+        return image
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # another thread already replaced it
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        broken.shutdown(wait=False)
+
+    def _recycle(self, hung):
+        with self._lock:
+            if self._executor is not hung:
+                return  # already replaced
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.recycled += 1
+        # Terminating the workers fails their jobs, which releases the slots
+        processes = getattr(hung, "_processes", None) or {}
+        for process in list(processes.values()):
+            process.terminate()
+        hung.shutdown(wait=False)
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        """Pool size, jobs in flight and outcome counters."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "timeout": self.timeout,
+                "pending": self._pending,
+                "rendered": self.rendered,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+            }
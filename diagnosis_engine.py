@@ -1,6 +1,572 @@
+import heapq
+import math
+import threading
+from array import array
+from collections import namedtuple
+from bisect import bisect_right
+from types import MappingProxyType
+
+from knowledge_base import KnowledgeBase, load_snapshot
+from symptom_vocabulary import SymptomVocabulary, ids_from_mask, mask_from_ids
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+BACKENDS = ("python", "numpy")
+
+# "overlap" is the fraction of a disease's symptoms that were selected;
+# "bayes" is a naive-Bayes posterior over all diseases, in percent
+SCORING_MODES = ("overlap", "bayes")
+
+# Naive-Bayes defaults, overridable per disease with "likelihoods"
+# ({symptom: probability}) and "prior" (relative weight) profile keys
+BAYES_SYMPTOM_LIKELIHOOD = 0.8  # P(symptom | disease) for profile symptoms
+BAYES_NOISE_LIKELIHOOD = 0.02   # P(symptom | disease) for any other symptom
+
+# Diseases below this confidence (in percent) are left out of diagnoses
+DEFAULT_MIN_CONFIDENCE = 50
+
+# Upper bound on patients x diseases cells scored per matrix product in
+# run_diagnosis_batch (~32 MB of float64)
+BATCH_CELLS = 1 << 22
+
+
+def check_scoring(scoring):
+    if scoring not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {scoring!r}")
+
+
+def check_min_confidence(min_confidence):
+    if not math.isfinite(min_confidence):
+        raise ValueError(f"min_confidence must be a finite number, not {min_confidence!r}")
+
+
+# Why a disease was ranked, as bitmasks over vocabulary IDs: selected
+# symptoms in its profile, profile symptoms not selected, and selected
+# symptoms the profile does not account for
+Explanation = namedtuple("Explanation", ("matched", "missing", "unexplained"))
+
+
+class DiseaseRecord:
+    """One compiled disease profile; symptom_ids is an int32 array in profile order."""
+
+    __slots__ = ("name", "advice", "symptom_ids", "mask")
+
+    def __init__(self, name, advice, symptom_ids):
+        self.name = name
+        self.advice = advice
+        self.symptom_ids = array("i", symptom_ids)
+        self.mask = mask_from_ids(self.symptom_ids)
+
+    def __len__(self):
+        return len(self.symptom_ids)
+
+    def __repr__(self):
+        return f"DiseaseRecord({self.name!r}, {self.advice!r}, {list(self.symptom_ids)!r})"
+
+
+class CompiledProfiles:
+    """Read-only scoring tables compiled from a disease_profiles snapshot.
+
+    Instances are never mutated after construction, so any number of threads
+    can score against one concurrently; every call builds fresh results.
+    Scoring methods take symptom IDs from vocabulary and work on disease rows
+    (positions in disease_names); names only appear in the results.
+    """
+
+    __slots__ = ("version", "backend", "vocabulary", "records", "disease_names", "disease_order",
+                 "profile_sizes", "row_sizes", "max_row_size", "advice", "symptom_index", "symptom_vocab", "postings",
+                 "posting_sizes", "column_ptr", "column_rows", "column_deltas", "row_sums",
+                 "base_scores", "bayes_base", "bayes_base_max", "bayes_base_sum", "bayes_postings",
+                 "_min_matches")
+
+    def __init__(self, disease_profiles, backend, version=0, vocabulary=None):
+        self.version = version
+        self.backend = backend
+        self.vocabulary = SymptomVocabulary() if vocabulary is None else vocabulary
+        self.disease_names = tuple(disease_profiles)
+        self.disease_order = MappingProxyType({d: i for i, d in enumerate(self.disease_names)})
+        snapshot = isinstance(disease_profiles, KnowledgeBase)
+        if snapshot:
+            self.records = self.read_snapshot(disease_profiles)
+        else:
+            self.records = self.read_profiles(disease_profiles)
+        self.row_sizes = tuple(len(record) for record in self.records)
+        self.max_row_size = max(self.row_sizes, default=0)
+        self.profile_sizes = MappingProxyType(dict(zip(self.disease_names, self.row_sizes)))
+        self.advice = MappingProxyType({record.name: record.advice for record in self.records})
+
+        # Inverted index: symptom ID -> rows whose profile contains it, so a
+        # diagnosis only touches the diseases that share a selected symptom.
+        # Postings are ordered by profile size so diseases too large to reach
+        # a threshold can be cut off with one bisect.
+        if snapshot:
+            self.postings = self.snapshot_postings(disease_profiles)
+        else:
+            self.postings = self.index_postings()
+        self.posting_sizes = tuple(tuple(self.row_sizes[r] for r in rows) for rows in self.postings)
+        names = self.vocabulary.name
+        indexed = [i for i, rows in enumerate(self.postings) if rows]
+        self.symptom_vocab = MappingProxyType({names(i): i for i in indexed})
+        self.symptom_index = MappingProxyType(
+            {names(i): tuple(self.disease_names[r] for r in self.postings[i]) for i in indexed})
+
+        # min_confidence -> {profile size: matches needed}; filled on demand
+        self._min_matches = {}
+        self.build_bayes(disease_profiles)
+        self.column_ptr = None
+        self.column_rows = None
+        self.column_deltas = None
+        self.row_sums = None
+        self.base_scores = None
+        if backend == "numpy":
+            self.build_matrix()
+
+    def read_profiles(self, disease_profiles):
+        intern = self.vocabulary.intern
+        return tuple(DiseaseRecord(disease, profile["advice"], map(intern, profile["symptoms"]))
+                     for disease, profile in disease_profiles.items())
+
+    def read_snapshot(self, knowledge_base):
+        # Snapshot symptom IDs are local to the file; translate them once,
+        # unless the vocabulary hands out the same IDs (a fresh engine)
+        ids = [self.vocabulary.intern(symptom) for symptom in knowledge_base.symptoms]
+        indptr = knowledge_base.indptr
+        indices = knowledge_base.indices
+        if ids == list(range(len(ids))):
+            profiles = (indices[indptr[row]:indptr[row + 1]] for row in range(len(self.disease_names)))
+        else:
+            profiles = ((ids[i] for i in indices[indptr[row]:indptr[row + 1]])
+                        for row in range(len(self.disease_names)))
+        return tuple(DiseaseRecord(name, advice, symptom_ids)
+                     for name, advice, symptom_ids in zip(self.disease_names, knowledge_base.advice, profiles))
+
+    def index_postings(self):
+        postings = {}
+        for row, record in enumerate(self.records):
+            for symptom_id in dict.fromkeys(record.symptom_ids):
+                postings.setdefault(symptom_id, []).append(row)
+        by_id = [()] * len(self.vocabulary)
+        for symptom_id, rows in postings.items():
+            rows.sort(key=lambda r: (self.row_sizes[r], r))
+            by_id[symptom_id] = tuple(rows)
+        return tuple(by_id)
+
+    def snapshot_postings(self, knowledge_base):
+        # The snapshot stores the postings already deduplicated and ordered;
+        # they are sliced from the mapping, only their IDs are translated
+        indptr = knowledge_base.posting_indptr
+        indices = knowledge_base.posting_indices
+        by_id = [()] * len(self.vocabulary)
+        for local_id, symptom_id in enumerate(self.vocabulary.ids(knowledge_base.symptoms)):
+            by_id[symptom_id] = tuple(indices[indptr[local_id]:indptr[local_id + 1]])
+        return tuple(by_id)
+
+    def symptom_ids(self, symptoms):
+        # IDs of symptom names, keeping duplicates; names the vocabulary has
+        # never seen cannot match anything and are dropped
+        return self.vocabulary.ids(symptoms)
+
+    def posting(self, symptom_id):
+        # Rows holding symptom_id; IDs interned after this compile hold none
+        return self.postings[symptom_id] if symptom_id < len(self.postings) else ()
+
+    def build_bayes(self, disease_profiles):
+        # Naive-Bayes log tables. With p = P(symptom | disease),
+        #   log P(disease | selected) = base[disease]
+        #       + sum of delta[disease, s] over selected profile symptoms s
+        #       + terms equal for every disease, which normalisation removes
+        # where base is log prior + sum of log(1 - p) - log(1 - noise p) over
+        # the profile and delta is logit(p) - logit(noise p). Leaving the
+        # prior unnormalised and the vocabulary-wide terms out keeps scores
+        # comparable between engines over disjoint parts of one catalog.
+        noise = BAYES_NOISE_LIKELIHOOD
+        noise_logit = math.log(noise) - math.log1p(-noise)
+        if isinstance(disease_profiles, KnowledgeBase):
+            # Snapshots carry no per-disease likelihoods or priors, so every
+            # delta is the same and base only depends on the number of
+            # distinct symptoms: summed in the same order as below, without
+            # a log per profile entry
+            p = BAYES_SYMPTOM_LIKELIHOOD
+            step = math.log1p(-p) - math.log1p(-noise)
+            delta = math.log(p) - math.log1p(-p) - noise_logit
+            sums = [math.log(1.0)]
+            for _ in range(self.max_row_size):
+                sums.append(sums[-1] + step)
+            base = [sums[record.mask.bit_count()] for record in self.records]
+            postings = [tuple((row, delta) for row in rows) for rows in self.postings]
+        else:
+            base, postings = self.profile_bayes(disease_profiles, noise, noise_logit)
+        self.bayes_base = tuple(base)
+        self.bayes_postings = tuple(postings)
+        # Normaliser of the no-symptom posterior, so a query only has to
+        # correct it for the diseases its symptoms touch
+        self.bayes_base_max = max(base, default=0.0)
+        self.bayes_base_sum = math.fsum(math.exp(b - self.bayes_base_max) for b in base)
+
+    def profile_bayes(self, disease_profiles, noise, noise_logit):
+        # (base, postings) of build_bayes from per-disease likelihoods and priors
+        likelihoods = []
+        priors = []
+        for disease in self.disease_names:
+            profile = disease_profiles[disease]
+            likelihoods.append(profile.get("likelihoods", {}))
+            prior = profile.get("prior", 1.0)
+            if prior <= 0:
+                raise ValueError(f"Prior for {disease!r} must be positive")
+            priors.append(prior)
+
+        base = [math.log(prior) for prior in priors]
+        postings = []
+        for symptom_id, rows in enumerate(self.postings):
+            symptom = self.vocabulary.name(symptom_id) if rows else None
+            posting = []
+            for row in rows:
+                p = likelihoods[row].get(symptom, BAYES_SYMPTOM_LIKELIHOOD)
+                if not 0 < p < 1:
+                    raise ValueError(f"Likelihood of {symptom!r} for {self.disease_names[row]!r} "
+                                     f"must be between 0 and 1")
+                base[row] += math.log1p(-p) - math.log1p(-noise)
+                posting.append((row, math.log(p) - math.log1p(-p) - noise_logit))
+            postings.append(tuple(posting))
+        return base, postings
+
+    def build_matrix(self):
+        # Sparse disease x symptom ID incidence in compressed-column form: the
+        # rows and bayes deltas of symptom ID i are column_rows and
+        # column_deltas[column_ptr[i]:column_ptr[i + 1]], i.e. the postings as
+        # flat arrays. Memory grows with the profile entries, not with
+        # diseases x vocabulary, and a diagnosis only reads its symptoms' columns.
+        postings = self.bayes_postings
+        lengths = np.fromiter(map(len, postings), dtype=np.intp, count=len(postings))
+        column_ptr = np.zeros(len(postings) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=column_ptr[1:])
+        entries = int(column_ptr[-1])
+        column_rows = np.fromiter((row for posting in postings for row, _ in posting),
+                                  dtype=np.intp, count=entries)
+        column_deltas = np.fromiter((delta for posting in postings for _, delta in posting),
+                                    dtype=float, count=entries)
+        row_sums = np.array(self.row_sizes, dtype=float)
+        base_scores = np.array(self.bayes_base, dtype=float)
+
+        for table in (column_ptr, column_rows, column_deltas, row_sums, base_scores):
+            table.flags.writeable = False
+        self.column_ptr = column_ptr
+        self.column_rows = column_rows
+        self.column_deltas = column_deltas
+        self.row_sums = row_sums
+        self.base_scores = base_scores
+
+    def column_entries(self, id_sets, distinct=False):
+        # (patient, entry) index arrays: every known ID of id_sets[patient]
+        # expanded to the positions of its column in column_rows and
+        # column_deltas. distinct drops repeated IDs within a set.
+        width = len(self.postings)
+        ids = []
+        patients = []
+        for patient, symptom_ids in enumerate(id_sets):
+            known = [i for i in (set(symptom_ids) if distinct else symptom_ids) if i < width]
+            ids += known
+            patients += [patient] * len(known)
+        ids = np.array(ids, dtype=np.intp)
+        starts = self.column_ptr[ids]
+        lengths = self.column_ptr[ids + 1] - starts
+        # Consecutive ranges starts[j]:starts[j] + lengths[j], concatenated
+        offsets = np.cumsum(lengths) - lengths
+        entries = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()), dtype=np.intp)
+        return np.repeat(np.array(patients, dtype=np.intp), lengths), entries
+
+    def match_matrix(self, id_sets):
+        # Dense patients x rows matrix of selected symptoms in each profile
+        patients, entries = self.column_entries(id_sets)
+        width = len(self.disease_names)
+        cells = np.bincount(patients * width + self.column_rows[entries], minlength=len(id_sets) * width)
+        return cells.reshape(len(id_sets), width)
+
+    def confidence_vector(self, symptom_ids):
+        # Unrounded confidences in row order
+        return (self.match_matrix([symptom_ids])[0] / self.row_sums) * 100
+
+    def bayes_matrix_scores(self, id_sets):
+        # Unnormalised log posteriors, patients x rows, for distinct symptoms
+        patients, entries = self.column_entries(id_sets, distinct=True)
+        width = len(self.disease_names)
+        cells = np.bincount(patients * width + self.column_rows[entries], weights=self.column_deltas[entries],
+                            minlength=len(id_sets) * width)
+        return cells.reshape(len(id_sets), width) + self.base_scores
+
+    def bayes_scores(self, symptom_ids):
+        # Unnormalised log posteriors in row order
+        if self.backend == "numpy":
+            return self.bayes_matrix_scores([symptom_ids])[0]
+        scores = list(self.bayes_base)
+        postings = self.bayes_postings
+        for symptom_id in set(symptom_ids):
+            if symptom_id < len(postings):
+                for row, delta in postings[symptom_id]:
+                    scores[row] += delta
+        return scores
+
+    def bayes_confidences(self, symptom_ids):
+        # Unrounded posterior percentages in row order: one sum of log tables
+        # per disease, then a log-sum-exp normalisation
+        if not self.disease_names:
+            return []
+        scores = self.bayes_scores(symptom_ids)
+        if self.backend == "numpy":
+            weights = np.exp(scores - scores.max())
+            return (weights / weights.sum()) * 100
+        top = max(scores)
+        weights = [math.exp(score - top) for score in scores]
+        total = math.fsum(weights)
+        return [(weight / total) * 100 for weight in weights]
+
+    def bayes_candidates(self, symptom_ids, min_confidence):
+        # Pure-Python bayes_confidences restricted to the rows the selected
+        # symptoms touch; the others share the precomputed part of the
+        # normaliser and are only scanned if one of them could qualify
+        base = self.bayes_base
+        postings = self.bayes_postings
+        scores = {}
+        for symptom_id in set(symptom_ids):
+            if symptom_id < len(postings):
+                for row, delta in postings[symptom_id]:
+                    scores[row] = scores.get(row, base[row]) + delta
+        base_max = self.bayes_base_max
+        top = max(base_max, max(scores.values(), default=base_max))
+        untouched = self.bayes_base_sum - math.fsum(math.exp(base[row] - base_max) for row in scores)
+        total = (max(0.0, untouched) * math.exp(base_max - top)
+                 + math.fsum(math.exp(score - top) for score in scores.values()))
+        if (math.exp(base_max - top) / total) * 100 >= min_confidence - 0.01:
+            for row, confidence in enumerate(self.bayes_confidences(symptom_ids)):
+                if confidence >= min_confidence - 0.01:
+                    yield row, round(confidence, 2)
+            return
+        for row, score in scores.items():
+            confidence = (math.exp(score - top) / total) * 100
+            if confidence >= min_confidence - 0.01:
+                yield row, round(confidence, 2)
+
+    def bayes_matrix_confidences(self, id_sets):
+        # bayes_confidences for a whole chunk of patients at once
+        scores = self.bayes_matrix_scores(id_sets)
+        weights = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return (weights / weights.sum(axis=1, keepdims=True)) * 100
+
+    def column_tables(self, symptom_ids):
+        # Incidence and bayes delta matrices with one column per entry of
+        # symptom_ids, for scoring a table of just those symptoms
+        incidence = np.zeros((len(self.disease_names), len(symptom_ids)))
+        deltas = np.zeros_like(incidence)
+        for column, symptom_id in enumerate(symptom_ids):
+            posting = self.bayes_postings[symptom_id] if symptom_id < len(self.bayes_postings) else ()
+            if posting:
+                rows, values = zip(*posting)
+                incidence[list(rows), column] = 1.0
+                deltas[list(rows), column] = values
+        return incidence, deltas
+
+    def table_confidences(self, present, tables, scoring="overlap"):
+        # Unrounded confidences for a patients x columns 0/1 matrix over the
+        # columns of column_tables
+        incidence, deltas = tables
+        if scoring == "bayes":
+            scores = present @ deltas.T + np.asarray(self.bayes_base)
+            weights = np.exp(scores - scores.max(axis=1, keepdims=True))
+            return (weights / weights.sum(axis=1, keepdims=True)) * 100
+        return ((present @ incidence.T) / np.array(self.row_sizes, dtype=float)) * 100
+
+    def min_matches(self, min_confidence):
+        # Matches a profile of each size needs to reach min_confidence after
+        # rounding; sizes that can never reach it map to size + 1. The memo is
+        # only ever extended with deterministic values, so sharing it between
+        # threads is safe.
+        table = self._min_matches.get(min_confidence)
+        if table is None:
+            table = {}
+            for size in set(self.row_sizes):
+                needed = max(0, math.ceil(min_confidence * size / 100) - 1)
+                while needed <= size and round((needed / size) * 100, 2) < min_confidence:
+                    needed += 1
+                table[size] = needed
+            self._min_matches[min_confidence] = table
+        return table
+
+    def max_reachable_size(self, selected_count, min_confidence):
+        # Largest profile that selected_count matches can lift to
+        # min_confidence; larger profiles cannot qualify
+        if min_confidence <= 0:
+            return math.inf
+        largest = self.max_row_size
+        if selected_count == 0 or min_confidence > 100 or largest == 0:
+            return 0
+        # Start from the exact bound, capped at the largest profile, so tiny
+        # thresholds do not step down through sizes no profile has
+        bound = selected_count * 100 / min_confidence
+        size = largest if bound >= largest else max(selected_count, math.floor(bound))
+        while size > selected_count and round((selected_count / size) * 100, 2) < min_confidence:
+            size -= 1
+        while size < largest and round((selected_count / (size + 1)) * 100, 2) >= min_confidence:
+            size += 1
+        return size
+
+    def match_counts(self, symptom_ids, max_size=math.inf):
+        # Number of selected symptoms in each profile, by row, for rows with
+        # at least one match and at most max_size symptoms only
+        counts = {}
+        postings = self.postings
+        for symptom_id in symptom_ids:
+            if symptom_id >= len(postings):
+                continue
+            rows = postings[symptom_id]
+            if max_size < math.inf:
+                rows = rows[:bisect_right(self.posting_sizes[symptom_id], max_size)]
+            for row in rows:
+                counts[row] = counts.get(row, 0) + 1
+        return counts
+
+    def candidate_confidences(self, symptom_ids, min_confidence, scoring="overlap"):
+        # (row, rounded confidence) for every disease that may reach
+        # min_confidence; callers still apply the exact threshold
+        if scoring == "bayes":
+            if self.backend == "python" and min_confidence > 0:
+                yield from self.bayes_candidates(symptom_ids, min_confidence)
+                return
+            confidences = self.bayes_confidences(symptom_ids)
+            if self.backend == "numpy":
+                rows = np.flatnonzero(confidences >= min_confidence - 0.01).tolist()
+                confidences = confidences.tolist()
+            else:
+                rows = [row for row, c in enumerate(confidences) if c >= min_confidence - 0.01]
+            for row in rows:
+                yield row, round(confidences[row], 2)
+            return
+        if self.backend == "numpy":
+            if min_confidence <= 0:
+                confidences = self.confidence_vector(symptom_ids)
+                yield from enumerate(round(c, 2) for c in confidences.tolist())
+                return
+            # Only the rows sharing a selected symptom can qualify
+            _, entries = self.column_entries([symptom_ids])
+            rows, counts = np.unique(self.column_rows[entries], return_counts=True)
+            confidences = (counts / self.row_sums[rows]) * 100
+            # Loose cut-off first, so round() below decides boundary cases
+            # exactly as the pure-Python backend does
+            keep = confidences >= min_confidence - 0.01
+            yield from zip(rows[keep].tolist(), (round(c, 2) for c in confidences[keep].tolist()))
+            return
+        if min_confidence <= 0:
+            # Every disease qualifies, including those without a match
+            yield from enumerate(self.calculate_confidence(symptom_ids).values())
+            return
+        max_size = self.max_reachable_size(len(symptom_ids), min_confidence)
+        needed = self.min_matches(min_confidence)
+        sizes = self.row_sizes
+        for row, match_count in self.match_counts(symptom_ids, max_size).items():
+            weight = sizes[row]  # Weight based on the number of symptoms
+            if match_count >= needed[weight]:
+                yield row, round((match_count / weight) * 100, 2)
+
+    def calculate_confidence(self, symptom_ids, scoring="overlap"):
+        if scoring == "bayes":
+            confidences = self.bayes_confidences(symptom_ids)
+            if self.backend == "numpy":
+                confidences = confidences.tolist()
+            return {disease: round(c, 2) for disease, c in zip(self.disease_names, confidences)}
+        if self.backend == "numpy":
+            confidences = self.confidence_vector(symptom_ids).tolist()
+            return {disease: round(c, 2) for disease, c in zip(self.disease_names, confidences)}
+        results = dict.fromkeys(self.disease_names, 0.0)
+        for row, match_count in self.match_counts(symptom_ids).items():
+            weight = self.row_sizes[row]  # Weight based on the number of symptoms
+            results[self.disease_names[row]] = round((match_count / weight) * 100, 2)
+        return results
+
+    def rank(self, scored, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        # Turn (row, confidence) pairs into sorted (disease, confidence,
+        # advice) result tuples, keeping at most k of them. Ties keep
+        # profile order, as the full scan over disease_profiles did.
+        qualifying = [(row, confidence) for row, confidence in scored if confidence >= min_confidence]
+        key = lambda x: (-x[1], x[0])
+        if k is not None and k < len(qualifying):
+            qualifying = heapq.nsmallest(k, qualifying, key=key)
+        else:
+            qualifying.sort(key=key)
+        records = self.records
+        return [(records[row].name, confidence, records[row].advice) for row, confidence in qualifying]
+
+    def explain(self, row, mask):
+        # Explanation of a row for a selection bitmask: three bitwise ops
+        profile = self.records[row].mask
+        return Explanation(profile & mask, profile & ~mask, mask & ~profile)
+
+    def ranked_overlap(self, id_sets, k, min_confidence):
+        # Ranked overlap results per patient from the sparse product of the
+        # patients x symptoms selection and the symptoms x rows incidence:
+        # only (patient, row) pairs that share a symptom are ever counted
+        width = len(self.disease_names)
+        patients, entries = self.column_entries(id_sets)
+        cells, counts = np.unique(patients * width + self.column_rows[entries], return_counts=True)
+        rows = cells % width
+        confidences = (counts / self.row_sums[rows]) * 100
+        keep = confidences >= min_confidence - 0.01
+        cells = cells[keep]
+        rows = rows[keep].tolist()
+        confidences = [round(c, 2) for c in confidences[keep].tolist()]
+        # cells are sorted, so each patient's pairs are one slice
+        bounds = np.searchsorted(cells, np.arange(len(id_sets) + 1) * width).tolist()
+        return [self.rank(zip(rows[a:b], confidences[a:b]), k, min_confidence)
+                for a, b in zip(bounds, bounds[1:])]
+
+    def run_diagnosis_batch(self, id_sets, compact, k, min_confidence, scoring="overlap"):
+        if self.backend != "numpy":
+            if compact:
+                rows = [list(self.calculate_confidence(symptom_ids, scoring).values()) for symptom_ids in id_sets]
+                return np.array(rows, dtype=float).reshape(len(id_sets), len(self.disease_names))
+            return [self.rank(self.candidate_confidences(symptom_ids, min_confidence, scoring), k, min_confidence)
+                    for symptom_ids in id_sets]
+
+        chunk_rows = max(1, BATCH_CELLS // max(1, len(self.disease_names)))
+        confidences = []
+        ranked = []
+        for start in range(0, len(id_sets), chunk_rows):
+            chunk_sets = id_sets[start:start + chunk_rows]
+            if not compact and scoring == "overlap" and min_confidence > 0:
+                ranked += self.ranked_overlap(chunk_sets, k, min_confidence)
+                continue
+            if scoring == "bayes":
+                chunk = self.bayes_matrix_confidences(chunk_sets)
+            else:
+                chunk = (self.match_matrix(chunk_sets) / self.row_sums) * 100
+            if compact:
+                confidences.append(np.round(chunk, 2))
+                continue
+            for row in chunk:
+                candidates = np.flatnonzero(row >= min_confidence - 0.01).tolist()
+                ranked.append(self.rank(((col, round(float(row[col]), 2)) for col in candidates),
+                                        k, min_confidence))
+
+        if compact:
+            if not confidences:
+                return np.zeros((0, len(self.disease_names)))
+            return np.concatenate(confidences)
+        return ranked
+
+
 class DiagnosisEngine:
-    def __init__(self):
-        self.result = []
+    def __init__(self, backend="python", disease_profiles=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown scoring backend: {backend!r}")
+        if backend == "numpy" and not NUMPY_AVAILABLE:
+            raise ImportError("The numpy scoring backend requires numpy to be installed")
+        self.backend = backend
+        self.compiled = None
+        # Shared by every compile, so symptom IDs and bitmasks handed out to
+        # front ends stay valid across build_index calls
+        self.vocabulary = SymptomVocabulary()
         self.disease_profiles = {
             "Flu": {
                 "symptoms": ["fever", "cough", "sore throat", "fatigue", "body aches"],
@@ -60,26 +626,243 @@ class DiagnosisEngine:
                 "advice": "advice_hepatitis"
             }
         }
+        if disease_profiles is not None:
+            # JSON/CSV profiles or a KnowledgeBase snapshot, see knowledge_base.py
+            self.disease_profiles = disease_profiles
+        self.build_index()
+
+    def build_index(self):
+        # Compile disease_profiles into fresh read-only tables and swap them in
+        # with a single assignment; calls already running keep the old ones.
+        # Call again after changing disease_profiles; the knowledge-base
+        # version goes up by one each time.
+        version = self.compiled.version + 1 if self.compiled is not None else 1
+        self.compiled = CompiledProfiles(self.disease_profiles, self.backend, version, self.vocabulary)
+
+    @classmethod
+    def from_snapshot(cls, path, backend="python"):
+        # Engine over a memory-mapped snapshot written by
+        # knowledge_base.compile_snapshot
+        return cls(backend=backend, disease_profiles=load_snapshot(path))
+
+    # Read-only views of the current compiled tables
+    version = property(lambda self: self.compiled.version)
+    symptom_index = property(lambda self: self.compiled.symptom_index)
+    profile_sizes = property(lambda self: self.compiled.profile_sizes)
+    disease_order = property(lambda self: self.compiled.disease_order)
+    disease_names = property(lambda self: self.compiled.disease_names)
+    symptom_vocab = property(lambda self: self.compiled.symptom_vocab)
+
+    def calculate_confidence(self, selected_symptoms, scoring="overlap"):
+        check_scoring(scoring)
+        compiled = self.compiled
+        return compiled.calculate_confidence(compiled.symptom_ids(selected_symptoms), scoring)
+
+    def run_diagnosis(self, symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap",
+                      explain=False):
+        # At most k (disease, confidence, advice) tuples at or above
+        # min_confidence, best first; k=None keeps every qualifying disease.
+        # scoring picks one of SCORING_MODES for this call. With explain=True
+        # each tuple also carries the disease's Explanation.
+        compiled = self.compiled
+        symptom_ids = compiled.symptom_ids(s for s, v in symptoms.items() if v)
+        return self._diagnose(compiled, symptom_ids, k, min_confidence, scoring, explain)
 
-    def calculate_confidence(self, selected_symptoms):
-        results = {}
-        for disease, profile in self.disease_profiles.items():
-            symptoms = profile["symptoms"]
-            weight = len(symptoms)  # Weight based on the number of symptoms
-            match_count = sum(1 for symptom in selected_symptoms if symptom in symptoms)
-            confidence = (match_count / weight) * 100
-            results[disease] = round(confidence, 2)
+    def run_diagnosis_mask(self, mask, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap",
+                           explain=False):
+        # run_diagnosis for a bitmask over vocabulary IDs
+        return self._diagnose(self.compiled, ids_from_mask(mask), k, min_confidence, scoring, explain)
+
+    def _diagnose(self, compiled, symptom_ids, k, min_confidence, scoring, explain=False):
+        check_scoring(scoring)
+        check_min_confidence(min_confidence)
+        results = compiled.rank(compiled.candidate_confidences(symptom_ids, min_confidence, scoring),
+                                k, min_confidence)
+        if explain:
+            mask = mask_from_ids(symptom_ids)
+            order = compiled.disease_order
+            return [result + (compiled.explain(order[result[0]], mask),) for result in results]
         return results
 
-    def run_diagnosis(self, symptoms):
-        self.result.clear()
+    def explain(self, results, symptoms):
+        """Explanation of each (disease, ...) result for the selected symptoms.
+
+        symptoms is a bitmask over vocabulary IDs, a symptom dict or an
+        iterable of names, so results served from a DiagnosisCache or a
+        ShardedDiagnosisEngine sharing this vocabulary can be explained too.
+        Diseases no longer in the profiles get None.
+        """
+        if isinstance(symptoms, dict):
+            symptoms = [s for s, v in symptoms.items() if v]
+        mask = symptoms if isinstance(symptoms, int) else self.vocabulary.to_mask(symptoms)
+        compiled = self.compiled
+        order = compiled.disease_order
+        return [compiled.explain(order[result[0]], mask) if result[0] in order else None
+                for result in results]
+
+    def run_diagnosis_batch(self, symptom_sets, compact=False, k=None,
+                            min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        """Diagnose many patients at once.
+
+        Each entry of symptom_sets is a symptom dict as taken by
+        run_diagnosis, an iterable of selected symptom names or a bitmask over
+        vocabulary IDs. Identical symptom sets are scored once. Returns one run_diagnosis-style list per
+        patient (honouring k and min_confidence), or with compact=True a
+        (patients x diseases) array of rounded confidences whose columns
+        follow disease_names.
+        """
+        check_scoring(scoring)
+        check_min_confidence(min_confidence)
+        if compact and not NUMPY_AVAILABLE:
+            raise ImportError("Compact batch results require numpy to be installed")
+
+        compiled = self.compiled
+        unique_sets = {}
+        patient_rows = []
+        for selected in symptom_sets:
+            if isinstance(selected, dict):
+                selected = [s for s, v in selected.items() if v]
+            mask = selected if isinstance(selected, int) else self.vocabulary.to_mask(selected)
+            patient_rows.append(unique_sets.setdefault(mask, len(unique_sets)))
+
+        id_sets = [ids_from_mask(mask) for mask in unique_sets]
+        scored = compiled.run_diagnosis_batch(id_sets, compact, k, min_confidence, scoring)
+        if compact:
+            return scored[patient_rows]
+        return [list(scored[row]) for row in patient_rows]
+
+    def score_table(self, present, symptoms, scoring="overlap"):
+        """Confidences for a table of symptom flags, without a per-patient loop.
+
+        present is a (patients x len(symptoms)) boolean or 0/1 array whose
+        column j flags symptoms[j]; symptoms the engine does not know are
+        ignored. Returns the same (patients x diseases) array as
+        run_diagnosis_batch with compact=True.
+        """
+        check_scoring(scoring)
+        if not NUMPY_AVAILABLE:
+            raise ImportError("Scoring symptom tables requires numpy to be installed")
+        compiled = self.compiled
+        present = np.asarray(present)
+        vocab = compiled.symptom_vocab
+        known = [column for column, symptom in enumerate(symptoms) if symptom in vocab]
+        tables = compiled.column_tables([vocab[symptoms[column]] for column in known])
+        if not compiled.disease_names:
+            return np.zeros((len(present), 0))
+        chunk_rows = max(1, BATCH_CELLS // max(1, len(compiled.disease_names), len(known)))
+        chunks = [np.round(compiled.table_confidences(present[start:start + chunk_rows, known].astype(float),
+                                                      tables, scoring), 2)
+                  for start in range(0, len(present), chunk_rows)]
+        if not chunks:
+            return np.zeros((0, len(compiled.disease_names)))
+        return np.concatenate(chunks)
+
+
+class DiagnosisSession:
+    """Incrementally maintained diagnosis for one user's symptom selection.
+
+    Adding or removing a symptom only updates the diseases on that symptom's
+    posting list, so the ranking can be refreshed on every checkbox click.
+    The selection is kept as a bitmask over the engine's vocabulary. If the
+    engine recompiles its profiles, the session rescores its current
+    selection against the new tables on the next call.
+    """
+
+    def __init__(self, engine, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        self.engine = engine
+        self.min_confidence = min_confidence
+        self.mask = 0
+        self._lock = threading.Lock()
+        self._reset(engine.compiled)
+
+    @property
+    def selected(self):
+        """Names of the selected symptoms."""
+        return set(self.engine.vocabulary.names(self.mask))
+
+    def _reset(self, compiled):
+        self._compiled = compiled
+        self._needed = compiled.min_matches(self.min_confidence) if self.min_confidence > 0 else None
+        self._counts = {}
+        self._qualifying = {}
+        for symptom_id in ids_from_mask(self.mask):
+            self._update(symptom_id, 1)
+
+    def _update(self, symptom_id, delta):
+        # Counts and qualifying confidences are keyed by disease row
+        compiled = self._compiled
+        counts = self._counts
+        sizes = compiled.row_sizes
+        for row in compiled.posting(symptom_id):
+            count = counts.get(row, 0) + delta
+            if count:
+                counts[row] = count
+            else:
+                del counts[row]
+            size = sizes[row]
+            if self._needed is not None and count >= self._needed[size]:
+                self._qualifying[row] = round((count / size) * 100, 2)
+            else:
+                self._qualifying.pop(row, None)
+
+    def _sync(self):
+        compiled = self.engine.compiled
+        if compiled is not self._compiled:
+            self._reset(compiled)
+
+    def set_id(self, symptom_id, selected=True):
+        """Select or deselect one symptom by vocabulary ID."""
+        bit = 1 << symptom_id
+        with self._lock:
+            self._sync()
+            if selected and not self.mask & bit:
+                self.mask |= bit
+                self._update(symptom_id, 1)
+            elif not selected and self.mask & bit:
+                self.mask &= ~bit
+                self._update(symptom_id, -1)
+
+    def set_mask(self, mask):
+        """Make mask the selection, updating only the symptoms that changed."""
+        with self._lock:
+            self._sync()
+            changed = self.mask ^ mask
+            for symptom_id in ids_from_mask(changed & self.mask):
+                self._update(symptom_id, -1)
+            for symptom_id in ids_from_mask(changed & mask):
+                self._update(symptom_id, 1)
+            self.mask = mask
+
+    def set(self, symptom, selected=True):
+        """Select or deselect one symptom by name.
+
+        Names the vocabulary does not know cannot match any profile and are
+        ignored rather than interned, so client input cannot grow the
+        shared vocabulary.
+        """
+        symptom_id = self.engine.vocabulary.get(symptom)
+        if symptom_id is not None:
+            self.set_id(symptom_id, selected)
+
+    def add(self, symptom):
+        self.set(symptom, True)
+
+    def remove(self, symptom):
+        self.set(symptom, False)
 
-        input_symptoms = [k for k, v in symptoms.items() if v]
-        results = self.calculate_confidence(input_symptoms)
-        
-        for disease, confidence in results.items():
-            if confidence >= 50:
-                advice = self.disease_profiles[disease]["advice"]
-                self.result.append((disease, confidence, advice))
+    def clear(self):
+        with self._lock:
+            self.mask = 0
+            self._reset(self.engine.compiled)
 
-        return sorted(self.result, key=lambda x: x[1], reverse=True)
+    def results(self, k=None):
+        """Current ranking in run_diagnosis form."""
+        with self._lock:
+            self._sync()
+            compiled = self._compiled
+            if self._needed is None:
+                # Every disease qualifies, including those without a match
+                scored = enumerate(compiled.calculate_confidence(ids_from_mask(self.mask)).values())
+            else:
+                scored = list(self._qualifying.items())
+        return compiled.rank(scored, k, self.min_confidence)
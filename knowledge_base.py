@@ -0,0 +1,215 @@
+"""
+Knowledge base loading and compiled snapshots for Diagnosis-AI.
+
+Disease profiles can be read from JSON or CSV, and compiled into a binary
+snapshot that is memory-mapped at startup. A snapshot holds the symptom
+vocabulary, the advice keys, and CSR-style int32 arrays mapping diseases to
+symptom IDs and symptom IDs back to diseases. The arrays are read straight
+from the mapping and worker processes share the same pages. An engine built
+from a snapshot takes its profiles and its size-ordered postings from these
+arrays instead of parsing and sorting profiles, and skips the per-entry
+naive-Bayes logs, since snapshots only hold default likelihoods.
+
+Usage:
+    python knowledge_base.py compile profiles.json profiles.dxkb
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+MAGIC = b"DXKB"
+FORMAT_VERSION = 1
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<4sII")
+
+
+def load_profiles_json(path):
+    """Load disease profiles from a JSON file.
+
+    Accepts either the DiagnosisEngine mapping
+    ({"Flu": {"symptoms": [...], "advice": "advice_flu"}, ...}) or a list of
+    {"disease": ..., "symptoms": [...], "advice": ...} records.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {record["disease"]: record for record in data}
+    return {disease: {"symptoms": list(profile["symptoms"]), "advice": profile["advice"]}
+            for disease, profile in data.items()}
+
+
+def load_profiles_csv(path):
+    """Load disease profiles from a CSV file with disease, advice and symptoms columns.
+
+    Symptoms are separated by semicolons. A disease may also be spread over
+    several rows, in which case its symptoms are concatenated.
+    """
+    profiles = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            profile = profiles.setdefault(row["disease"], {"symptoms": [], "advice": row["advice"]})
+            profile["symptoms"].extend(s.strip() for s in row["symptoms"].split(";") if s.strip())
+    return profiles
+
+
+def load_profiles(path):
+    """Load disease profiles from a JSON, CSV or compiled snapshot file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        return load_profiles_json(path)
+    if extension == ".csv":
+        return load_profiles_csv(path)
+    return load_snapshot(path)
+
+
+def _int32_array(values):
+    data = array("i", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def compile_snapshot(disease_profiles, path):
+    """Write disease_profiles to path as a binary snapshot."""
+    diseases = list(disease_profiles)
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    for disease in diseases:
+        for symptom in disease_profiles[disease]["symptoms"]:
+            indices.append(vocabulary.setdefault(symptom, len(vocabulary)))
+        indptr.append(len(indices))
+
+    # Transposed postings: symptom ID -> disease rows holding it once each,
+    # ordered by profile size then profile order like CompiledProfiles
+    postings = [[] for _ in vocabulary]
+    for row in range(len(diseases)):
+        for symptom_id in set(indices[indptr[row]:indptr[row + 1]]):
+            postings[symptom_id].append(row)
+    posting_indptr = [0]
+    posting_indices = []
+    for rows in postings:
+        rows.sort(key=lambda r: (indptr[r + 1] - indptr[r], r))
+        posting_indices.extend(rows)
+        posting_indptr.append(len(posting_indices))
+
+    arrays = {
+        "indptr": _int32_array(indptr),
+        "indices": _int32_array(indices),
+        "posting_indptr": _int32_array(posting_indptr),
+        "posting_indices": _int32_array(posting_indices),
+    }
+    layout = {}
+    offset = 0
+    for name, data in arrays.items():
+        layout[name] = [offset, len(data)]
+        offset += len(data) * data.itemsize
+    header = json.dumps({
+        "diseases": diseases,
+        "advice": [disease_profiles[d]["advice"] for d in diseases],
+        "symptoms": list(vocabulary),
+        "arrays": layout,
+    }, ensure_ascii=False).encode("utf-8")
+    # Keep the arrays 8-byte aligned
+    header += b" " * (-(_PREAMBLE.size + len(header)) % 8)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for data in arrays.values():
+            data.tofile(f)
+    os.replace(tmp_path, path)
+
+
+class KnowledgeBase(Mapping):
+    """A memory-mapped snapshot, usable anywhere disease_profiles is expected.
+
+    Mapping access builds {"symptoms": [...], "advice": ...} on demand; the
+    diseases, advice and symptoms tuples and the int32 arrays (indptr,
+    indices, posting_indptr, posting_indices) expose the snapshot directly.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a knowledge base snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported knowledge base snapshot version {version} in {path}")
+        header_end = _PREAMBLE.size + header_length
+        header = json.loads(bytes(self._mmap[_PREAMBLE.size:header_end]))
+
+        self.diseases = tuple(header["diseases"])
+        self.advice = tuple(header["advice"])
+        self.symptoms = tuple(header["symptoms"])
+        self.arrays_offset = header_end
+        self.array_layout = header["arrays"]
+        self._rows = {disease: row for row, disease in enumerate(self.diseases)}
+        buffer = memoryview(self._mmap)
+        for name, (offset, count) in self.array_layout.items():
+            start = header_end + offset
+            view = buffer[start:start + count * 4]
+            if sys.byteorder == "little":
+                setattr(self, name, view.cast("i"))
+            else:
+                data = array("i", view)
+                data.byteswap()
+                setattr(self, name, data)
+
+    def __getitem__(self, disease):
+        row = self._rows[disease]
+        symptoms = self.indices[self.indptr[row]:self.indptr[row + 1]]
+        return {"symptoms": [self.symptoms[i] for i in symptoms], "advice": self.advice[row]}
+
+    def __iter__(self):
+        return iter(self.diseases)
+
+    def __len__(self):
+        return len(self.diseases)
+
+    def __contains__(self, disease):
+        return disease in self._rows
+
+    def __reduce__(self):
+        # Other processes map the same file rather than receiving a copy
+        return load_snapshot, (self.path,)
+
+
+def load_snapshot(path):
+    """Memory-map a compiled snapshot."""
+    return KnowledgeBase(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnosis-AI knowledge base tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subcommands.add_parser("compile", help="compile JSON/CSV profiles into a snapshot")
+    compile_parser.add_argument("source", help="profiles file (.json or .csv)")
+    compile_parser.add_argument("output", help="snapshot file to write")
+    export_parser = subcommands.add_parser("export", help="write the built-in profiles as JSON")
+    export_parser.add_argument("output", help="JSON file to write")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        profiles = load_profiles(args.source)
+        compile_snapshot(profiles, args.output)
+        print(f"Compiled {len(profiles)} disease profiles into {args.output}")
+    elif args.command == "export":
+        from diagnosis_engine import DiagnosisEngine
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(DiagnosisEngine().disease_profiles, f, indent=4, ensure_ascii=False)
+        print(f"Exported built-in disease profiles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import threading
+
 translations = {
     "en": {
         "title": "Medical Diagnosis System",
@@ -30,6 +32,9 @@ translations = {
         "none": "None",
         "diagnosis_results_label": "Diagnosis Results:",
         "advice_label": "Advice",
+        "matched_symptoms_label": "Matching symptoms",
+        "missing_symptoms_label": "Symptoms not reported",
+        "unexplained_symptoms_label": "Not explained by this condition",
         "report_exported_to": "Report exported to",
         "pdf_export_error": "Failed to export PDF",
         "no_results_to_save": "No diagnosis results to save.",
@@ -82,6 +87,12 @@ translations = {
         "advice_pneumonia": "Complete the prescribed antibiotic course and take plenty of rest.",
         "advice_hepatitis": "Rest adequately, avoid alcohol, and follow up with a hepatologist.",
         
+        # Rule Alerts
+        "rule_escalate_tuberculosis": "Fever, night sweats and weight loss together can indicate tuberculosis. Please see a doctor for a TB test soon.",
+        "rule_urgent_chest_pain": "Chest pain with shortness of breath can be an emergency. Seek immediate medical care.",
+        "rule_urgent_fever_confusion": "Fever with confusion can indicate a serious infection. Seek immediate medical care.",
+        "rule_escalate_hypertension": "Headache, blurred vision and chest pain can indicate a hypertensive crisis. Check your blood pressure and contact a doctor today.",
+        
         # Symptom Names
         "fever": "Fever",
         "cough": "Cough",
@@ -135,6 +146,9 @@ translations = {
         "none": "Ninguno",
         "diagnosis_results_label": "Resultados del Diagnóstico:",
         "advice_label": "Consejo",
+        "matched_symptoms_label": "Síntomas coincidentes",
+        "missing_symptoms_label": "Síntomas no reportados",
+        "unexplained_symptoms_label": "No explicados por esta condición",
         "report_exported_to": "Informe exportado a",
         "pdf_export_error": "Error al exportar PDF",
         "no_results_to_save": "No hay resultados de diagnóstico para guardar.",
@@ -187,6 +201,12 @@ translations = {
         "advice_pneumonia": "Complete el curso de antibióticos recetado y descanse mucho.",
         "advice_hepatitis": "Descanse adecuadamente, evite el alcohol y haga seguimiento con un hepatólogo.",
         
+        # Rule Alerts
+        "rule_escalate_tuberculosis": "Fiebre, sudores nocturnos y pérdida de peso juntos pueden indicar tuberculosis. Consulte pronto a un médico para una prueba de TB.",
+        "rule_urgent_chest_pain": "El dolor de pecho con dificultad para respirar puede ser una emergencia. Busque atención médica inmediata.",
+        "rule_urgent_fever_confusion": "La fiebre con confusión puede indicar una infección grave. Busque atención médica inmediata.",
+        "rule_escalate_hypertension": "Dolor de cabeza, visión borrosa y dolor de pecho pueden indicar una crisis hipertensiva. Mida su presión arterial y contacte a un médico hoy.",
+        
         # Symptom Names
         "fever": "Fiebre",
         "cough": "Tos",
@@ -241,6 +261,9 @@ translations = {
         "none": "کوئی نہیں",
         "diagnosis_results_label": "تشخیصی نتائج:",
         "advice_label": "مشورہ",
+        "matched_symptoms_label": "مماثل علامات",
+        "missing_symptoms_label": "غیر رپورٹ شدہ علامات",
+        "unexplained_symptoms_label": "اس بیماری سے غیر واضح علامات",
         "report_exported_to": "رپورٹ کو برآمد کیا گیا",
         "pdf_export_error": "پی ڈی ایف برآمد میں ناکامی",
         "no_results_to_save": "محفوظ کرنے کے لئے کوئی تشخیصی نتائج نہیں ہیں۔",
@@ -294,6 +317,12 @@ translations = {
         "advice_pneumonia": "تجویز کردہ اینٹی بائیوٹک کورس مکمل کریں اور بھرپور آرام کریں۔",
         "advice_hepatitis": "مناسب آرام کریں، الکحل سے پرہیز کریں، اور ہیپاٹولوجسٹ کے ساتھ فالو اپ کریں۔",
         
+        # Rule Alerts
+        "rule_escalate_tuberculosis": "بخار، رات میں پسینہ آنا اور وزن میں کمی ایک ساتھ ٹی بی کی علامت ہو سکتے ہیں۔ جلد ٹی بی ٹیسٹ کے لئے ڈاکٹر سے ملیں۔",
+        "rule_urgent_chest_pain": "سانس کی تکلیف کے ساتھ سینے میں درد ہنگامی صورتحال ہو سکتی ہے۔ فوری طبی امداد حاصل کریں۔",
+        "rule_urgent_fever_confusion": "بخار کے ساتھ الجھن شدید انفیکشن کی علامت ہو سکتی ہے۔ فوری طبی امداد حاصل کریں۔",
+        "rule_escalate_hypertension": "سر درد، دھندلی نظر اور سینے میں درد ہائی بلڈ پریشر کے بحران کی علامت ہو سکتے ہیں۔ اپنا بلڈ پریشر چیک کریں اور آج ہی ڈاکٹر سے رابطہ کریں۔",
+        
         # Symptom Names
         "fever": "بخار",
         "cough": "کھانسی",
@@ -323,6 +352,52 @@ translations = {
     # Add more languages here
 }
 
+# Bumped by reload_translations, so anything memoizing translated text can
+# tell when to rebuild
+_version = 0
+
+def translations_version():
+    """Generation of the translation tables, starting at 0."""
+    return _version
+
+class LanguageMemo:
+    """build(lang) memoized per language until the translations reload.
+
+    Lookups read a (translations version, {lang: value}) pair that is only
+    ever replaced as a whole, so they take no lock; builds are serialised.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._lock = threading.Lock()
+        self._values = (None, {})
+
+    def get(self, lang):
+        version = _version
+        built, values = self._values
+        value = values.get(lang) if built == version else None
+        if value is None:
+            with self._lock:
+                built, values = self._values
+                values = dict(values) if built == version else {}
+                value = values.get(lang)
+                if value is None:
+                    value = values[lang] = self.build(lang)
+                self._values = (version, values)
+        return value
+
+def reload_translations(updated):
+    """Replace the translation tables with updated ({lang: {key: text}}) in place.
+
+    Memoized page context and symptom search indexes are rebuilt on their
+    next use.
+    """
+    global _version
+    new_tables = {lang: dict(table) for lang, table in updated.items()}
+    translations.clear()
+    translations.update(new_tables)
+    _version += 1
+
 def get_translation(lang, key):
     """Get a translation for a key in the specified language, fallback to English."""
     # Fallback to English if language not found, then fallback to the key itself if key not found
@@ -0,0 +1,129 @@
+"""
+MinHash/LSH candidate retrieval in front of DiagnosisEngine scoring.
+
+Each disease's symptom set is summarised by a MinHash signature of
+bands * rows values, and every band of the signature is hashed into a
+bucket. A query is hashed the same way and only the diseases sharing at
+least one bucket with it are scored, with the engine's exact overlap
+formula. A disease whose symptom set has Jaccard similarity s with the
+query is retrieved with probability 1 - (1 - s**rows)**bands, so more bands
+or fewer rows raise recall at the cost of scoring more candidates.
+
+Retrieval is approximate: a qualifying disease the buckets miss is left out,
+and diseases without any selected symptom are never returned.
+
+Usage:
+    index = MinHashIndex(engine, bands=32, rows=2)
+    index.run_diagnosis({"fever": True, "cough": True}, k=5)
+"""
+
+import random
+import threading
+
+from diagnosis_engine import DEFAULT_MIN_CONFIDENCE
+
+
+class MinHashIndex:
+    """LSH buckets over an engine's compiled profiles, rebuilt when they change."""
+
+    def __init__(self, engine, bands=32, rows=2, seed=0):
+        if bands < 1 or rows < 1:
+            raise ValueError("bands and rows must be at least 1")
+        self.engine = engine
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._tables = None
+        self._sync()
+
+    @property
+    def num_perm(self):
+        return self.bands * self.rows
+
+    def _sync(self):
+        # (compiled, hashes, profiles, buckets) for the engine's current
+        # profiles, built once per version and replaced in one assignment
+        compiled = self.engine.compiled
+        tables = self._tables
+        if tables is None or tables[0] is not compiled:
+            with self._lock:
+                tables = self._tables
+                if tables is None or tables[0] is not compiled:
+                    tables = self._tables = self._build(compiled)
+        return tables
+
+    def _build(self, compiled):
+        # One random 32-bit value per symptom and permutation stands in for
+        # the permutation; seeding by name keeps signatures stable across
+        # processes and rebuilds. Everything else works on symptom IDs and
+        # disease rows.
+        hashes = {}
+        for symptom, symptom_id in compiled.symptom_vocab.items():
+            rng = random.Random(f"{self.seed}:{symptom}")
+            hashes[symptom_id] = [rng.getrandbits(32) for _ in range(self.num_perm)]
+
+        profiles = tuple(frozenset(record.symptom_ids) for record in compiled.records)
+        buckets = {}
+        for row, symptom_ids in enumerate(profiles):
+            if symptom_ids:
+                for key in self._band_keys(self._signature(symptom_ids, hashes)):
+                    buckets.setdefault(key, []).append(row)
+
+        buckets = {key: tuple(rows) for key, rows in buckets.items()}
+        return compiled, hashes, profiles, buckets
+
+    def _signature(self, symptoms, hashes):
+        return [min(values) for values in zip(*(hashes[s] for s in symptoms))]
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _candidate_rows(self, tables, symptom_ids):
+        _, hashes, _, buckets = tables
+        known = {i for i in symptom_ids if i in hashes}
+        if not known:
+            return set()
+        found = set()
+        for key in self._band_keys(self._signature(known, hashes)):
+            found.update(buckets.get(key, ()))
+        return found
+
+    def _confidences(self, tables, symptom_ids):
+        # (row, exact overlap confidence) for every retrieved row
+        compiled, _, profiles, _ = tables
+        sizes = compiled.row_sizes
+        return [(row, round((len(symptom_ids & profiles[row]) / sizes[row]) * 100, 2))
+                for row in self._candidate_rows(tables, symptom_ids)]
+
+    def candidates(self, selected_symptoms):
+        """Diseases sharing at least one LSH bucket with the selected symptoms."""
+        tables = self._sync()
+        names = tables[0].disease_names
+        symptom_ids = set(tables[0].symptom_ids(selected_symptoms))
+        return {names[row] for row in self._candidate_rows(tables, symptom_ids)}
+
+    def calculate_confidence(self, selected_symptoms):
+        """Exact overlap confidences of the retrieved candidates only."""
+        tables = self._sync()
+        names = tables[0].disease_names
+        symptom_ids = set(tables[0].symptom_ids(selected_symptoms))
+        return {names[row]: confidence for row, confidence in self._confidences(tables, symptom_ids)}
+
+    def run_diagnosis(self, symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        # Same result tuples as DiagnosisEngine.run_diagnosis, over the
+        # retrieved candidates
+        tables = self._sync()
+        symptom_ids = set(tables[0].symptom_ids(s for s, v in symptoms.items() if v))
+        return tables[0].rank(self._confidences(tables, symptom_ids), k, min_confidence)
+
+    def stats(self):
+        """Index size, e.g. to compare bands/rows settings."""
+        buckets = self._sync()[3]
+        return {
+            "bands": self.bands,
+            "rows": self.rows,
+            "buckets": len(buckets),
+            "largest_bucket": max(map(len, buckets.values()), default=0),
+        }
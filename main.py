@@ -1,16 +1,17 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
-from diagnosis_engine import DiagnosisEngine
+from diagnosis_engine import DiagnosisEngine, DiagnosisSession
 try:
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import letter
     REPORTLAB_AVAILABLE = True
 except ImportError:
     REPORTLAB_AVAILABLE = False
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from chart_renderer import ChartStyle, render_bar_chart
+import base64
 import json
 from localization import get_translation, available_languages
+from symptom_search import SearchIndexes
 import os
 
 class DiagnosisApp:
@@ -19,8 +20,10 @@ class DiagnosisApp:
         self.root = root
         self.language = "en"
         self.engine = DiagnosisEngine()
+        self.session = DiagnosisSession(self.engine)  # Live results as symptoms are toggled
         self.diagnosis_results = []
         self.symptom_vars = {}
+        self.max_results = 10  # Conditions shown per diagnosis
         
         # Color scheme - Modern and vibrant
         self.colors = {
@@ -40,6 +43,14 @@ class DiagnosisApp:
             "border": "#E0E0E0"     # Border color
         }
         
+        # Chart look; render_bar_chart reuses one laid-out figure per language
+        self.chart_style = ChartStyle(
+            figsize=(7.2, 4.5), dpi=100,
+            colors=('#4361EE', '#3A0CA3', '#4CC9F0', '#F72585', '#7209B7', '#4D908E', '#06D6A0'),
+            facecolor=self.colors["bg_main"], text_color=self.colors["text_dark"],
+            title_color=self.colors["primary"], title_size=18, xlabel_size=14, tick_size=12,
+            value_size=12, bar_height=0.6, bar_alpha=0.9, grid_alpha=0.2, minimal=True)
+        
         # Set up the root window
         self.root.title(get_translation(self.language, "title"))
         self.root.configure(bg=self.colors["bg_main"])
@@ -156,10 +167,20 @@ class DiagnosisApp:
             "Musculoskeletal": ["joint pain", "joint stiffness", "swelling", "reduced range of motion"]
         }
         
-        # Initialize symptom variables
+        # Initialize symptom variables; toggles reach the live session by ID
         for category, symptoms in self.symptoms_data.items():
             for symptom in symptoms:
-                self.symptom_vars[symptom] = tk.BooleanVar()
+                if symptom in self.symptom_vars:
+                    continue
+                var = tk.BooleanVar()
+                symptom_id = self.engine.vocabulary.intern(symptom)
+                var.trace_add("write", lambda *args, i=symptom_id, v=var: self.on_symptom_toggle(i, v))
+                self.symptom_vars[symptom] = var
+
+        # Per-language symptom search; the notebook is only rebuilt when a
+        # keystroke changes which symptoms match
+        self.search_indexes = SearchIndexes(self.symptom_vars)
+        self.shown_symptoms = None
 
         # Create the GUI
         self.create_gui(root)
@@ -335,6 +356,22 @@ class DiagnosisApp:
             # Store references to buttons for later text updates
             setattr(self, btn_info["name"], btn)
             
+        # Live results section, refreshed on every symptom toggle
+        live_section = ttk.Frame(right_panel, style='Card.TFrame', padding=10)
+        live_section.pack(fill="x", pady=(20, 0))
+        
+        self.live_header = ttk.Label(live_section, 
+                                text=get_translation(self.language, "diagnosis_result"),
+                                style='Header.TLabel')
+        self.live_header.pack(anchor="w", pady=(0, 10))
+        
+        self.live_results_label = ttk.Label(live_section, 
+                                       text="",
+                                       wraplength=250, 
+                                       justify=tk.LEFT,
+                                       style='TLabel')
+        self.live_results_label.pack(anchor="w", pady=5)
+            
         # Help section
         help_section = ttk.Frame(right_panel, style='Card.TFrame', padding=10)
         help_section.pack(fill="x", pady=(20, 0))
@@ -357,7 +394,8 @@ class DiagnosisApp:
         for widget in self.symptom_frame.winfo_children():
             widget.destroy()
 
-        search_term = search_term.lower()
+        matches = self.matching_symptoms(search_term)
+        self.shown_symptoms = (self.language, matches)
         
         # Use notebook tabs for symptom categories
         notebook = ttk.Notebook(self.symptom_frame)
@@ -380,10 +418,8 @@ class DiagnosisApp:
             tab_frame = ttk.Frame(parent, style='Card.TFrame', padding=10)
             
             # Filter symptoms by search term
-            filtered_symptoms = [s for s in self.symptoms_data[category] 
-                              if not search_term or 
-                              search_term in s.lower() or 
-                              search_term in get_translation(self.language, s).lower()]
+            filtered_symptoms = [s for s in self.symptoms_data[category]
+                              if matches is None or s in matches]
             
             if not filtered_symptoms:
                 ttk.Label(tab_frame, 
@@ -429,15 +465,31 @@ class DiagnosisApp:
             # Add tab with translated category name
             notebook.add(tab_content, text=get_translation(self.language, category))
 
+    def on_symptom_toggle(self, symptom_id, var):
+        # Only the diseases sharing this symptom are rescored
+        self.session.set_id(symptom_id, var.get())
+        self.update_live_results()
+
+    def update_live_results(self):
+        if not hasattr(self, 'live_results_label'):
+            return
+        lines = [f"{get_translation(self.language, disease)}: {confidence}%" 
+                 for disease, confidence, advice in self.session.results(k=self.max_results)]
+        self.live_results_label.config(text="\n".join(lines))
+
+    def matching_symptoms(self, search_term):
+        """Symptoms matching search_term in the current language, or None for no filter"""
+        if not search_term.strip():
+            return None
+        return frozenset(r["id"] for r in self.search_indexes.search(self.language, search_term, limit=None))
+
     def filter_symptoms(self, event=None):
         search_term = self.search_var.get()
-        self.display_symptoms(search_term)
+        if (self.language, self.matching_symptoms(search_term)) != self.shown_symptoms:
+            self.display_symptoms(search_term)
 
     def diagnose(self):
-        symptom_data = {symptom: var.get() for symptom, var in self.symptom_vars.items()}
-        selected_symptoms_list = [symptom for symptom, selected in symptom_data.items() if selected]
-
-        if not selected_symptoms_list:
+        if not self.session.mask:
             messagebox.showwarning(
                 get_translation(self.language, "warning"), 
                 get_translation(self.language, "no_symptoms_selected"),
@@ -445,7 +497,7 @@ class DiagnosisApp:
             )
             return
 
-        self.diagnosis_results = self.engine.run_diagnosis(symptom_data)
+        self.diagnosis_results = self.session.results(k=self.max_results)
 
         if not self.diagnosis_results:
             messagebox.showinfo(
@@ -626,47 +678,20 @@ class DiagnosisApp:
         chart_win.configure(bg=self.colors["bg_main"])
         chart_win.geometry("800x550")
         
-        # Modern color palette for chart
-        chart_colors = ['#4361EE', '#3A0CA3', '#4CC9F0', '#F72585', '#7209B7', '#4D908E', '#06D6A0']
-        
-        # Create the figure with custom styling
-        fig = plt.Figure(figsize=(8, 5), dpi=100, facecolor=self.colors["bg_main"])
-        ax = fig.add_subplot(111)
-        ax.set_facecolor(self.colors["bg_main"])
-        
-        # Create horizontal bars with gradient colors
-        bars = ax.barh(diseases, confidences, color=chart_colors[:len(diseases)], 
-                      height=0.6, edgecolor='none', alpha=0.9)
-        
-        # Add confidence values as text
-        for i, (bar, confidence) in enumerate(zip(bars, confidences)):
-            ax.text(confidence + 1, bar.get_y() + bar.get_height()/2, 
-                   f"{confidence}%", va='center', color=self.colors["text_dark"], 
-                   fontweight='bold', fontsize=12)
-        
-        # Style the chart for modern look
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['left'].set_color('#DDDDDD')
-        ax.spines['bottom'].set_color('#DDDDDD')
-        
-        ax.tick_params(axis='both', colors=self.colors["text_dark"], 
-                     labelsize=12, grid_alpha=0.3)
-        ax.set_xlabel(get_translation(self.language, "confidence_percent"), 
-                    fontsize=14, color=self.colors["text_dark"])
-        ax.set_title(get_translation(self.language, "diagnosis_confidence"), 
-                   fontsize=18, fontweight='bold', color=self.colors["primary"])
-        
-        # Add grid lines for better readability
-        ax.xaxis.grid(True, linestyle='--', alpha=0.2, color='#888888')
+        # Only the bars, labels and values change between charts of a language
+        png = render_bar_chart(diseases, confidences,
+                               get_translation(self.language, "diagnosis_confidence"),
+                               get_translation(self.language, "confidence_percent"),
+                               self.chart_style)
         
         # Display the chart in a nicely styled frame
         chart_container = ttk.Frame(chart_win, style='Card.TFrame', padding=20)
         chart_container.pack(fill="both", expand=True, padx=20, pady=20)
         
-        canvas_chart = FigureCanvasTkAgg(fig, master=chart_container)
-        canvas_chart.draw()
-        canvas_chart.get_tk_widget().pack(fill="both", expand=True)
+        chart_image = tk.PhotoImage(data=base64.b64encode(png))
+        chart_label = tk.Label(chart_container, image=chart_image, bg=self.colors["bg_card"])
+        chart_label.image = chart_image  # Keep a reference so Tk does not drop it
+        chart_label.pack(fill="both", expand=True)
         
         # Bottom button frame
         button_frame = ttk.Frame(chart_win, style='TFrame', padding=10)
@@ -782,6 +807,9 @@ class DiagnosisApp:
             self.clear_button.config(text=get_translation(self.language, "clear"))
         if hasattr(self, 'save_button'):
             self.save_button.config(text=get_translation(self.language, "save"))
+        if hasattr(self, 'live_header'):
+            self.live_header.config(text=get_translation(self.language, "diagnosis_result"))
+        self.update_live_results()
             
         # Refresh symptom display to update translations
         self.display_symptoms(self.search_var.get())
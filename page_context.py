@@ -0,0 +1,60 @@
+"""
+Per-language page context for the Flask front end.
+
+The language dropdown, the frontend translation strings (also pre-serialised
+for the page script) and the translated symptom tree are the same for every
+page view in a language, so they are built once per language on first use,
+stored frozen and shared by all requests. localization.reload_translations
+makes every language rebuild on its next use.
+
+Usage:
+    page_contexts = PageContexts(symptoms_data)
+    context = page_contexts.get(session['language'])
+    render_template('pages/diagnosis.html', symptoms=context.symptoms, ...)
+"""
+
+from collections import namedtuple
+from types import MappingProxyType
+
+from jinja2.utils import htmlsafe_json_dumps
+
+import localization
+
+Language = namedtuple("Language", ("code", "name"))
+SymptomOption = namedtuple("SymptomOption", ("id", "name"))
+PageContext = namedtuple("PageContext", ("languages", "translations", "translations_json", "symptoms"))
+
+# Translation keys the page scripts use
+FRONTEND_KEYS = (
+    "title", "diagnose", "export", "chart", "clear", "save", "close",
+    "language_select", "search_symptoms", "warning", "error", "success",
+    "info", "no_symptoms_selected", "result", "no_disease_match",
+    "diagnosis_result", "diagnosis_result_header", "run_diagnosis_first",
+    "confidence_percent", "diagnosis_confidence", "diagnosis_chart_title",
+    "reportlab_missing", "no_results_to_export", "advice_label",
+    "selected_symptoms_label", "matched_symptoms_label", "missing_symptoms_label",
+    "unexplained_symptoms_label",
+)
+
+
+class PageContexts:
+    """Frozen PageContext per language, memoized until the translations reload."""
+
+    def __init__(self, symptoms_data, keys=FRONTEND_KEYS):
+        self.symptoms_data = {category: tuple(symptoms) for category, symptoms in symptoms_data.items()}
+        self.keys = tuple(keys)
+        self._contexts = localization.LanguageMemo(self._build)
+
+    def get(self, lang):
+        return self._contexts.get(lang)
+
+    def _build(self, lang):
+        get_translation = localization.get_translation
+        languages = tuple(Language(code, f"{get_translation('en', f'lang_{code}')} ({code})")
+                          for code in localization.available_languages())
+        translations = {key: get_translation(lang, key) for key in self.keys}
+        symptoms = {get_translation(lang, category): tuple(SymptomOption(s, get_translation(lang, s))
+                                                           for s in category_symptoms)
+                    for category, category_symptoms in self.symptoms_data.items()}
+        return PageContext(languages, MappingProxyType(translations), htmlsafe_json_dumps(translations),
+                           MappingProxyType(symptoms))
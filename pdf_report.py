@@ -0,0 +1,128 @@
+"""
+PDF diagnosis reports built in memory.
+
+render_report lays the report out on a ReportLab canvas backed by a BytesIO
+buffer, so exporting never touches the disk. The report title is drawn once
+per document into a form XObject that every page places. ReportLab forms
+belong to a single document, so what is cached per language (and
+translations version) is everything that goes into them and into the page
+text: the translated title and labels. Long lines are wrapped by the
+measured width of the font with simpleSplit, not by character count.
+
+Usage:
+    pdf = render_report("es", ["fever", "cough"], results, explanations, "2024-05-01 09:30")
+"""
+
+import io
+from collections import namedtuple
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+import localization
+from localization import get_translation
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+LEFT = 100
+INDENT = 20
+RIGHT_MARGIN = 72
+TOP = 750
+BOTTOM = 100
+LINE_HEIGHT = 20
+# Extra space after each condition
+RESULT_GAP = 10
+FONT = "Helvetica"
+TITLE_FONT = "Helvetica-Bold"
+FONT_SIZE = 12
+TITLE_SIZE = 16
+HEADER_FORM = "report_header"
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+EXPLANATION_PARTS = ("matched", "missing", "unexplained")
+
+# Translated text of a report, apart from the symptoms and conditions
+ReportLabels = namedtuple("ReportLabels", ("title", "symptoms", "results", "advice", "none", "parts"))
+
+
+@lru_cache(maxsize=32)
+def _labels(lang, version):
+    return ReportLabels(
+        title=get_translation(lang, "diagnosis_report"),
+        symptoms=get_translation(lang, "selected_symptoms_label"),
+        results=get_translation(lang, "diagnosis_results_label"),
+        advice=get_translation(lang, "advice_label"),
+        none=get_translation(lang, "none"),
+        parts=tuple((part, get_translation(lang, f"{part}_symptoms_label")) for part in EXPLANATION_PARTS),
+    )
+
+
+def report_labels(lang):
+    """ReportLabels for lang, rebuilt after translations reload."""
+    return _labels(lang, localization.translations_version())
+
+
+class _ReportWriter:
+    # Draws lines top to bottom, starting a new page below BOTTOM
+
+    def __init__(self, pdf, labels):
+        self.pdf = pdf
+        pdf.setTitle(labels.title)
+        pdf.beginForm(HEADER_FORM)
+        pdf.setFont(TITLE_FONT, TITLE_SIZE)
+        pdf.drawString(LEFT, TOP, labels.title)
+        pdf.endForm()
+        self._start_page()
+
+    def _start_page(self):
+        self.pdf.doForm(HEADER_FORM)
+        self.pdf.setFont(FONT, FONT_SIZE)
+        self.y = TOP - LINE_HEIGHT
+
+    def skip(self, points):
+        self.y -= points
+
+    def line(self, text, x=LEFT):
+        if self.y < BOTTOM:
+            self.pdf.showPage()
+            self._start_page()
+        self.pdf.drawString(x, self.y, text)
+        self.y -= LINE_HEIGHT
+
+    def wrapped(self, text, x=LEFT):
+        for line in simpleSplit(text, FONT, FONT_SIZE, PAGE_WIDTH - RIGHT_MARGIN - x):
+            self.line(line, x)
+
+
+def render_report(lang, symptoms, results, explanations, date):
+    """PDF bytes of a diagnosis report.
+
+    symptoms are symptom keys, results (disease, confidence, advice) keys as
+    returned by run_diagnosis, and explanations one {part: translated symptom
+    names} dict (or None) per result. date is the text printed as the date.
+    """
+    labels = report_labels(lang)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    writer = _ReportWriter(pdf, labels)
+    writer.line(f"Date: {date}")
+    writer.skip(LINE_HEIGHT / 2)
+
+    writer.line(labels.symptoms)
+    names = [get_translation(lang, symptom) for symptom in symptoms]
+    writer.wrapped(", ".join(names) if names else labels.none, LEFT + INDENT)
+
+    writer.line(labels.results)
+    for (disease, confidence, advice), explanation in zip(results, explanations):
+        writer.line(f"- {get_translation(lang, disease)} ({confidence}%)", LEFT + INDENT)
+        # Which selected symptoms support the condition and which of its
+        # symptoms were not reported
+        if explanation is not None:
+            for part, label in labels.parts:
+                if explanation.get(part):
+                    writer.wrapped(f"{label}: {', '.join(explanation[part])}", LEFT + 2 * INDENT)
+        writer.wrapped(f"{labels.advice}: {get_translation(lang, advice)}", LEFT + 2 * INDENT)
+        writer.skip(RESULT_GAP)
+
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,99 @@
+"""
+Bounded LRU cache in front of DiagnosisEngine.run_diagnosis.
+
+Traffic to /diagnose is dominated by a handful of symptom combinations, so
+results are cached under the canonical selection (a symptom bitmask, or the
+frozen set of selected names) together with k, min_confidence, the scoring mode and the engine's
+knowledge-base version. When the engine recompiles its profiles the version
+changes and the cache empties itself on the next lookup.
+"""
+
+import threading
+from collections import OrderedDict
+
+from diagnosis_engine import DEFAULT_MIN_CONFIDENCE
+
+
+class DiagnosisCache:
+    """Thread-safe LRU cache of run_diagnosis results for one engine."""
+
+    def __init__(self, engine, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.engine = engine
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = engine.version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        """Canonical cache key for a symptom bitmask, dict or iterable of symptom names."""
+        if isinstance(symptoms, int):
+            return symptoms, k, float(min_confidence), scoring
+        if isinstance(symptoms, dict):
+            symptoms = (s for s, v in symptoms.items() if v)
+        return frozenset(symptoms), k, float(min_confidence), scoring
+
+    def run_diagnosis(self, symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        """Same as DiagnosisEngine.run_diagnosis, served from the cache when possible.
+
+        symptoms may also be a bitmask over the engine's vocabulary, as taken
+        by run_diagnosis_mask.
+        """
+        selected, k, min_confidence, scoring = self.key(symptoms, k, min_confidence, scoring)
+        version = self.engine.version
+        key = (selected, k, min_confidence, scoring, version)
+        with self._lock:
+            if version != self._version:
+                self._invalidate(version)
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(results)
+            self.misses += 1
+
+        # Score outside the lock so misses do not serialise requests
+        if isinstance(selected, int):
+            results = self.engine.run_diagnosis_mask(selected, k, min_confidence, scoring)
+        else:
+            results = self.engine.run_diagnosis(dict.fromkeys(selected, True), k, min_confidence, scoring)
+        results = tuple(results)
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = results
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return list(results)
+
+    def _invalidate(self, version):
+        self._entries.clear()
+        self._version = version
+        self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached result; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters and occupancy, e.g. for a monitoring endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "version": self._version,
+            }
@@ -0,0 +1,163 @@
+"""
+Rule-based escalations evaluated alongside DiagnosisEngine scoring.
+
+A rule fires when every symptom in its "all" list is selected and none in
+its optional "none" list is, e.g. fever AND night sweats AND unexplained
+weight loss -> escalate Tuberculosis. Rules are plain dicts:
+
+    {"name": "escalate_tuberculosis",
+     "all": ["fever", "night sweats", "unexplained weight loss"],
+     "none": [],                        # optional
+     "disease": "Tuberculosis",         # optional, the disease it concerns
+     "message": "rule_escalate_tuberculosis"}  # translation key
+
+The "experta" backend compiles the rules into an experta KnowledgeEngine
+class once; each thread builds one instance (and with it the Rete network)
+and only resets its working memory between requests. The "python" backend
+evaluates the same rules from a symptom -> rules index. Both time every
+evaluation, see RuleEngine.stats().
+"""
+
+import threading
+import time
+
+try:
+    from experta import NOT, Fact, KnowledgeEngine, Rule
+    EXPERTA_AVAILABLE = True
+except (ImportError, AttributeError):
+    # experta 1.9 pins a frozendict release that fails to import on
+    # Python 3.10 and later
+    EXPERTA_AVAILABLE = False
+
+RULE_BACKENDS = ("python", "experta")
+
+DEFAULT_RULES = (
+    {
+        "name": "escalate_tuberculosis",
+        "all": ["fever", "night sweats", "unexplained weight loss"],
+        "disease": "Tuberculosis",
+        "message": "rule_escalate_tuberculosis",
+    },
+    {
+        "name": "urgent_chest_pain",
+        "all": ["chest pain", "shortness of breath"],
+        "message": "rule_urgent_chest_pain",
+    },
+    {
+        "name": "urgent_fever_confusion",
+        "all": ["fever", "confusion"],
+        "message": "rule_urgent_fever_confusion",
+    },
+    {
+        "name": "escalate_hypertension",
+        "all": ["headache", "blurred vision", "chest pain"],
+        "none": ["nausea"],
+        "disease": "Hypertension",
+        "message": "rule_escalate_hypertension",
+    },
+)
+
+
+def check_rules(rules):
+    names = set()
+    for rule in rules:
+        if not rule.get("all"):
+            raise ValueError(f"Rule {rule.get('name')!r} needs at least one symptom in 'all'")
+        if rule["name"] in names:
+            raise ValueError(f"Duplicate rule name: {rule['name']!r}")
+        names.add(rule["name"])
+
+
+if EXPERTA_AVAILABLE:
+    class Symptom(Fact):
+        """A selected symptom, as a fact in working memory."""
+
+    def _knowledge_engine_class(rules):
+        # One experta rule per definition; firing records the rule's index
+        attrs = {}
+        for index, rule in enumerate(rules):
+            patterns = [Symptom(name=s) for s in rule["all"]]
+            patterns += [NOT(Symptom(name=s)) for s in rule.get("none", ())]
+
+            def fire(self, index=index):
+                self.fired.append(index)
+
+            attrs[f"rule_{index}"] = Rule(*patterns)(fire)
+        return type("DiagnosisRules", (KnowledgeEngine,), attrs)
+
+
+class RuleEngine:
+    """Evaluates escalation rules against a symptom selection, with timing."""
+
+    def __init__(self, rules=DEFAULT_RULES, backend="python"):
+        if backend not in RULE_BACKENDS:
+            raise ValueError(f"Unknown rule backend: {backend!r}")
+        if backend == "experta" and not EXPERTA_AVAILABLE:
+            raise ImportError("The experta rule backend requires experta to be installed")
+        check_rules(rules)
+        self.backend = backend
+        self.rules = tuple(dict(rule) for rule in rules)
+        if backend == "experta":
+            self._engine_class = _knowledge_engine_class(self.rules)
+            self._local = threading.local()
+        else:
+            # symptom -> indices of the rules requiring it
+            self._by_symptom = {}
+            for index, rule in enumerate(self.rules):
+                for symptom in set(rule["all"]):
+                    self._by_symptom.setdefault(symptom, []).append(index)
+        self._stats_lock = threading.Lock()
+        self.evaluations = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def _fire_python(self, selected):
+        counts = {}
+        for symptom in selected:
+            for index in self._by_symptom.get(symptom, ()):
+                counts[index] = counts.get(index, 0) + 1
+        return [index for index, count in counts.items()
+                if count == len(set(self.rules[index]["all"]))
+                and not selected.intersection(self.rules[index].get("none", ()))]
+
+    def _fire_experta(self, selected):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            # Built once per thread; the Rete network lives as long as it does
+            engine = self._local.engine = self._engine_class()
+        engine.reset()
+        engine.fired = []
+        if selected:
+            engine.declare(*(Symptom(name=s) for s in selected))
+        engine.run()
+        return engine.fired
+
+    def evaluate(self, selected_symptoms):
+        """Rules fired by the selected symptoms, in definition order."""
+        selected = set(selected_symptoms)
+        start = time.perf_counter()
+        if self.backend == "experta":
+            fired = self._fire_experta(selected)
+        else:
+            fired = self._fire_python(selected)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.evaluations += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.last_seconds = elapsed
+        return [self.rules[index] for index in sorted(fired)]
+
+    def stats(self):
+        """Evaluation counts and timings in milliseconds, e.g. for a monitoring endpoint."""
+        with self._stats_lock:
+            return {
+                "backend": self.backend,
+                "rules": len(self.rules),
+                "evaluations": self.evaluations,
+                "total_ms": self.total_seconds * 1000,
+                "mean_ms": (self.total_seconds / self.evaluations) * 1000 if self.evaluations else 0.0,
+                "max_ms": self.max_seconds * 1000,
+                "last_ms": self.last_seconds * 1000,
+            }
@@ -0,0 +1,284 @@
+"""
+Process-pool sharded diagnosis for very large disease catalogs.
+
+ShardedDiagnosisEngine splits the disease profiles into contiguous shards and
+gives each shard its own worker process holding a DiagnosisEngine over just
+that shard, so scoring a query uses one core per shard. Every worker returns
+its local top-k and the parent merges them; ties still follow catalog order,
+so results are the same as a single DiagnosisEngine's.
+
+When the profiles come from a compiled snapshot (see knowledge_base.py) the
+workers map the same file instead of being sent a copy of their shard.
+
+Usage:
+    with ShardedDiagnosisEngine(shards=4, disease_profiles=load_snapshot(path)) as engine:
+        engine.run_diagnosis({"fever": True, "cough": True}, k=5)
+"""
+
+import heapq
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnosis_engine import (BACKENDS, DEFAULT_MIN_CONFIDENCE, NUMPY_AVAILABLE,
+                              DiagnosisEngine, check_scoring)
+from knowledge_base import KnowledgeBase
+from symptom_vocabulary import SymptomVocabulary
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# The shard engine of this worker process, set by _init_shard
+_shard_engine = None
+
+
+def _init_shard(disease_profiles, start, stop, backend):
+    global _shard_engine
+    diseases = list(disease_profiles)[start:stop]
+    shard = {disease: disease_profiles[disease] for disease in diseases}
+    _shard_engine = DiagnosisEngine(backend=backend, disease_profiles=shard)
+
+
+def _shard_size():
+    return len(_shard_engine.disease_names)
+
+
+def _log_sum_exp(scores):
+    top = max(scores)
+    return top + math.log(math.fsum(math.exp(score - top) for score in scores))
+
+
+def _score_shard(unique_sets, compact, k, min_confidence, scoring):
+    compiled = _shard_engine.compiled
+    # Symptom IDs are per process, so sets travel as names
+    id_sets = [compiled.symptom_ids(selected) for selected in unique_sets]
+    if scoring != "bayes":
+        # Overlap confidences are per disease, so the shard's own ranking
+        # is already its part of the answer
+        return compiled.run_diagnosis_batch(id_sets, compact, k, min_confidence)
+    if compact:
+        if compiled.backend == "numpy":
+            return compiled.bayes_matrix_scores(id_sets)
+        return np.array([compiled.bayes_scores(symptom_ids) for symptom_ids in id_sets], dtype=float)
+    return _bayes_shard(unique_sets, k, min_confidence)
+
+
+def _bayes_shard(unique_sets, k, min_confidence, log_norms=None):
+    # Posteriors need a normaliser over the whole catalog. Without one, return
+    # per patient the shard's log normaliser, the raw log scores of its local
+    # top-k that may still qualify, and the best score left out. Given the
+    # catalog-wide log_norms, return an exact local ranking instead.
+    compiled = _shard_engine.compiled
+    results = []
+    for i, selected in enumerate(unique_sets):
+        scores = compiled.bayes_scores(compiled.symptom_ids(selected))
+        if compiled.backend == "numpy":
+            scores = scores.tolist()
+        if log_norms is not None:
+            log_norm = log_norms[i]
+            results.append(compiled.rank(
+                ((row, round(math.exp(score - log_norm) * 100, 2)) for row, score in enumerate(scores)),
+                k, min_confidence))
+            continue
+
+        log_norm = _log_sum_exp(scores)
+        # The full normaliser is at least log_norm, so diseases below the
+        # threshold locally are below it globally too
+        cutoff = (min_confidence - 0.01) / 100
+        cutoff = log_norm + math.log(cutoff) if cutoff > 0 else -math.inf
+        candidates = [(row, score) for row, score in enumerate(scores) if score >= cutoff]
+        left_out = -math.inf
+        if k is not None and k < len(candidates):
+            candidates = heapq.nlargest(k + 1, candidates, key=lambda x: x[1])
+            left_out = candidates.pop()[1]
+        names = compiled.disease_names
+        results.append((log_norm, [(names[row], score, compiled.advice[names[row]])
+                                   for row, score in candidates], left_out))
+    return results
+
+
+def _calculate_shard(selected_symptoms, scoring):
+    compiled = _shard_engine.compiled
+    symptom_ids = compiled.symptom_ids(selected_symptoms)
+    if scoring == "bayes":
+        scores = compiled.bayes_scores(symptom_ids)
+        return scores.tolist() if compiled.backend == "numpy" else scores
+    return compiled.calculate_confidence(symptom_ids)
+
+
+class ShardedDiagnosisEngine:
+    """DiagnosisEngine API over disease profiles split across worker processes."""
+
+    def __init__(self, shards=2, backend="python", disease_profiles=None, vocabulary=None):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown scoring backend: {backend!r}")
+        if backend == "numpy" and not NUMPY_AVAILABLE:
+            raise ImportError("The numpy scoring backend requires numpy to be installed")
+        self.backend = backend
+        self.shards = shards
+        self.disease_profiles = (DiagnosisEngine().disease_profiles
+                                 if disease_profiles is None else disease_profiles)
+        # Only used to decode run_diagnosis_mask bitmasks; workers intern
+        # their own IDs
+        self.vocabulary = SymptomVocabulary() if vocabulary is None else vocabulary
+        self.version = 0
+        self._pools = []
+        self.build_index()
+
+    def build_index(self):
+        # Re-split disease_profiles and start fresh workers. Call again after
+        # changing disease_profiles; the version goes up by one each time.
+        profiles = self.disease_profiles
+        diseases = list(profiles)
+        if isinstance(profiles, KnowledgeBase):
+            symptoms = profiles.symptoms
+        else:
+            symptoms = (s for profile in profiles.values() for s in profile["symptoms"])
+        for symptom in symptoms:
+            self.vocabulary.intern(symptom)
+        bounds = [len(diseases) * i // self.shards for i in range(self.shards + 1)]
+        pools = []
+        for start, stop in zip(bounds, bounds[1:]):
+            if start == stop:
+                continue
+            if isinstance(profiles, KnowledgeBase):
+                # Pickles by path, so the worker maps the snapshot itself
+                initargs = (profiles, start, stop, self.backend)
+            else:
+                shard = {disease: profiles[disease] for disease in diseases[start:stop]}
+                initargs = (shard, 0, None, self.backend)
+            pools.append(ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=initargs))
+        # Start every worker now, while the caller is still single-threaded
+        # (e.g. at web server import time), rather than on the first query
+        for future in [pool.submit(_shard_size) for pool in pools]:
+            future.result()
+        old_pools = self._pools
+        self.disease_names = tuple(diseases)
+        self.disease_order = {disease: order for order, disease in enumerate(diseases)}
+        self._pools = pools
+        self.version += 1
+        for pool in old_pools:
+            pool.shutdown(wait=False)
+
+    def close(self):
+        """Stop the worker processes."""
+        for pool in self._pools:
+            pool.shutdown()
+        self._pools = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _map(self, function, *args):
+        # Run function on every shard at once; results come back in shard order
+        futures = [pool.submit(function, *args) for pool in self._pools]
+        return [future.result() for future in futures]
+
+    def calculate_confidence(self, selected_symptoms, scoring="overlap"):
+        check_scoring(scoring)
+        selected_symptoms = list(selected_symptoms)
+        shard_results = self._map(_calculate_shard, selected_symptoms, scoring)
+        if scoring != "bayes":
+            results = {}
+            for shard in shard_results:
+                results.update(shard)
+            return results
+        scores = [score for shard in shard_results for score in shard]
+        if not scores:
+            return {}
+        log_norm = _log_sum_exp(scores)
+        return {disease: round(math.exp(score - log_norm) * 100, 2)
+                for disease, score in zip(self.disease_names, scores)}
+
+    def run_diagnosis(self, symptoms, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        # Same results as DiagnosisEngine.run_diagnosis
+        return self.run_diagnosis_batch([symptoms], k=k, min_confidence=min_confidence, scoring=scoring)[0]
+
+    def run_diagnosis_mask(self, mask, k=None, min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        # run_diagnosis for a bitmask over vocabulary IDs
+        return self.run_diagnosis_batch([mask], k=k, min_confidence=min_confidence, scoring=scoring)[0]
+
+    def run_diagnosis_batch(self, symptom_sets, compact=False, k=None,
+                            min_confidence=DEFAULT_MIN_CONFIDENCE, scoring="overlap"):
+        """Same as DiagnosisEngine.run_diagnosis_batch, one task per shard for the whole batch."""
+        check_scoring(scoring)
+        if compact and not NUMPY_AVAILABLE:
+            raise ImportError("Compact batch results require numpy to be installed")
+
+        unique_sets = {}
+        patient_rows = []
+        for selected in symptom_sets:
+            if isinstance(selected, dict):
+                selected = [s for s, v in selected.items() if v]
+            elif isinstance(selected, int):
+                selected = self.vocabulary.names(selected)
+            key = frozenset(selected)
+            patient_rows.append(unique_sets.setdefault(key, len(unique_sets)))
+        unique_sets = list(unique_sets)
+
+        shard_results = self._map(_score_shard, unique_sets, compact, k, min_confidence, scoring)
+        if compact:
+            scored = self._merge_compact(shard_results, len(unique_sets), scoring)
+            return scored[patient_rows]
+        if scoring == "bayes":
+            scored = self._merge_bayes(unique_sets, shard_results, k, min_confidence)
+        else:
+            scored = [self._merge([shard[row] for shard in shard_results], k)
+                      for row in range(len(unique_sets))]
+        return [list(scored[row]) for row in patient_rows]
+
+    def _merge(self, shard_rankings, k):
+        # Combine per-shard rankings; each is sorted by (-confidence, order)
+        key = lambda x: (-x[1], self.disease_order[x[0]])
+        merged = heapq.merge(*shard_rankings, key=key)
+        return list(merged) if k is None else [result for _, result in zip(range(k), merged)]
+
+    def _merge_bayes(self, unique_sets, shard_results, k, min_confidence):
+        if not shard_results:
+            return [[] for _ in unique_sets]
+        key = lambda x: (-x[1], self.disease_order[x[0]])
+        scored = []
+        recheck = {}
+        for row in range(len(unique_sets)):
+            shards = [shard[row] for shard in shard_results]
+            log_norm = _log_sum_exp([shard_norm for shard_norm, _, _ in shards])
+            qualifying = []
+            for _, candidates, _ in shards:
+                for disease, score, advice in candidates:
+                    confidence = round(math.exp(score - log_norm) * 100, 2)
+                    if confidence >= min_confidence:
+                        qualifying.append((disease, confidence, advice))
+            qualifying.sort(key=key)
+            if k is not None:
+                qualifying = qualifying[:k]
+            scored.append(qualifying)
+            # A disease a shard left out can still belong in the answer if it
+            # rounds to the last place's confidence; rank those patients
+            # again with the full normaliser
+            if k is not None and len(qualifying) == k:
+                bar = qualifying[-1][1] if k else math.inf
+            else:
+                bar = min_confidence
+            left_out = max(shard_left_out for _, _, shard_left_out in shards)
+            if left_out > -math.inf and round(math.exp(left_out - log_norm) * 100, 2) >= bar:
+                recheck[row] = log_norm
+        if recheck:
+            rows = list(recheck)
+            exact = self._map(_bayes_shard, [unique_sets[row] for row in rows], k, min_confidence,
+                              list(recheck.values()))
+            for i, row in enumerate(rows):
+                scored[row] = self._merge([shard[i] for shard in exact], k)
+        return scored
+
+    def _merge_compact(self, shard_arrays, rows, scoring):
+        if not shard_arrays:
+            return np.zeros((rows, 0))
+        matrix = np.concatenate(shard_arrays, axis=1)
+        if scoring != "bayes":
+            return matrix
+        weights = np.exp(matrix - matrix.max(axis=1, keepdims=True))
+        return np.round((weights / weights.sum(axis=1, keepdims=True)) * 100, 2)
@@ -9,18 +9,31 @@ $(document).ready(function() {
 
 // Initialize search functionality for symptoms
 function initSearch() {
+    let pending = null;
+    
     $('#symptom-search').on('keyup', function() {
-        const searchTerm = $(this).val().toLowerCase();
+        const searchTerm = $(this).val().trim();
+        clearTimeout(pending);
         
-        $('.symptom-item').each(function() {
-            const symptomText = $(this).data('search');
-            
-            if (symptomText.includes(searchTerm)) {
-                $(this).show();
-            } else {
-                $(this).hide();
-            }
-        });
+        if (!searchTerm) {
+            $('.symptom-item').show();
+            return;
+        }
+        
+        // Ask the server's search index once typing pauses
+        pending = setTimeout(function() {
+            $.getJSON('/symptoms/search', { q: searchTerm, limit: 0 }, function(response) {
+                // Ignore answers to a query the user has typed past
+                if (!response.success || $('#symptom-search').val().trim() !== searchTerm) {
+                    return;
+                }
+                const matches = new Set(response.results.map(result => result.id));
+                $('.symptom-item').each(function() {
+                    const symptomId = $(this).find('.symptom-checkbox').data('symptom-id');
+                    $(this).toggle(matches.has(symptomId));
+                });
+            });
+        }, 100);
     });
     
     $('#search-btn').on('click', function() {
@@ -55,6 +68,14 @@ function initDiagnosisEventListeners() {
         saveResults();
     });
 
+    // Live results as symptoms are toggled
+    $('.symptom-checkbox').on('change', function() {
+        updateLiveResults({
+            symptom: $(this).data('symptom-id'),
+            selected: $(this).is(':checked')
+        });
+    });
+
     // Continue to findings button
     $('#continue-to-findings-btn').on('click', function() {
         saveDiagnosisAndRedirect('findings_page');
@@ -87,6 +108,9 @@ function diagnose() {
             if (response.success) {
                 diagnosisResults = response.results;
                 
+                // Escalation rules that fired for this selection
+                (response.alerts || []).forEach(alert => showAlert('danger', alert.message));
+                
                 if (diagnosisResults.length === 0) {
                     showAlert('info', translations.no_disease_match);
                 } else {
@@ -106,6 +130,18 @@ function diagnose() {
     });
 }
 
+// Matched, missing and unexplained symptoms of one result, if the server sent them
+function explanationHtml(explanation) {
+    if (!explanation) {
+        return '';
+    }
+    const parts = ['matched', 'missing', 'unexplained'];
+    return parts
+        .filter(part => explanation[part] && explanation[part].length)
+        .map(part => `<p class="explanation-${part}"><strong>${translations[part + '_symptoms_label']}:</strong> ${explanation[part].join(', ')}</p>`)
+        .join('');
+}
+
 // Display diagnosis results in modal
 function displayDiagnosisResults(results) {
     const resultsContainer = $('#diagnosis-results');
@@ -135,6 +171,7 @@ function displayDiagnosisResults(results) {
                 <div class="result-body">
                     <p class="advice-title">${translations.advice_label}:</p>
                     <p class="advice-text">${result.advice}</p>
+                    ${explanationHtml(result.explanation)}
                 </div>
             </div>
         `);
@@ -161,10 +198,45 @@ function enableResultButtons() {
 function clearSelections() {
     $('.symptom-checkbox').prop('checked', false);
     diagnosisResults = [];
+    updateLiveResults({ reset: true });
     $('#chart-btn, #export-btn, #save-btn, #continue-to-findings-btn').prop('disabled', true);
     showAlert('info', translations.selections_cleared || 'Symptom selections cleared.');
 }
 
+// Refresh the live results panel after a symptom change
+function updateLiveResults(change) {
+    // Send the whole selection too, so a new server-side session can catch up
+    const selectedSymptoms = [];
+    $('.symptom-checkbox:checked').each(function() {
+        selectedSymptoms.push($(this).data('symptom-id'));
+    });
+    
+    $.ajax({
+        url: '/diagnose/toggle',
+        type: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify(Object.assign({ symptoms: selectedSymptoms }, change)),
+        success: function(response) {
+            if (response.success) {
+                displayLiveResults(response.results);
+            }
+        }
+    });
+}
+
+// Show the current ranking in the live results panel
+function displayLiveResults(results) {
+    const liveResults = $('#live-results');
+    liveResults.empty();
+    
+    results.forEach(result => {
+        const item = $('<li class="list-group-item d-flex justify-content-between align-items-center"></li>');
+        item.append($('<span></span>').text(result.disease));
+        item.append($('<span class="badge bg-primary rounded-pill"></span>').text(`${result.confidence}%`));
+        liveResults.append(item);
+    });
+}
+
 // Show chart with diagnosis results
 function showChart() {
     if (diagnosisResults.length === 0) {
@@ -181,14 +253,16 @@ function showChart() {
         url: '/generate-chart',
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({ results: diagnosisResults }),
+        data: JSON.stringify({ results: diagnosisResults, format: 'svg' }),
         success: function(response) {
             if (response.success) {
-                // Create image from base64 data
+                // The SVG comes from a content-addressed URL the browser caches
                 const chartImg = $('<img>').attr({
-                    'src': response.chart_data,
+                    'src': response.chart_url,
                     'class': 'img-fluid',
                     'alt': 'Diagnosis Chart'
+                }).on('error', function() {
+                    $('#chart-container').html('<p class="text-danger">Failed to generate chart</p>');
                 });
                 
                 $('#chart-container').empty().append(chartImg);
@@ -156,13 +156,16 @@ function showChart() {
     $.ajax({
         url: '/generate-chart-from-session',
         type: 'GET',
+        data: { format: 'svg' },
         success: function(response) {
             if (response.success) {
-                // Create image from base64 data
+                // The SVG comes from a content-addressed URL the browser caches
                 const chartImg = $('<img>').attr({
-                    'src': response.chart_data,
+                    'src': response.chart_url,
                     'class': 'img-fluid',
                     'alt': 'Diagnosis Chart'
+                }).on('error', function() {
+                    $('#chart-container').html('<p class="text-danger">Failed to generate chart</p>');
                 });
                 
                 $('#chart-container').empty().append(chartImg);
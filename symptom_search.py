@@ -0,0 +1,208 @@
+"""
+Multilingual symptom search over a prefix trie and character n-grams.
+
+Every symptom is indexed under its translated name and its English key.
+Text is folded before indexing and querying: compatibility normalisation,
+case folding, combining marks (accents, Arabic-script harakat) removed, and
+the Arabic code points commonly typed for Urdu letters (ي, ك, ه, ى) mapped to
+their Urdu forms, with tatweel and zero-width joiners dropped.
+
+A query matches a symptom when each of its words is a prefix of one of the
+symptom's words, found in the trie; a query word that prefixes nothing may
+instead resemble a word, by bigram overlap, which catches misspellings. Results rank exact names, then name
+prefixes, then word prefixes, then fuzzy matches.
+
+Usage:
+    index = SymptomSearchIndex.for_language("es", symptoms)
+    index.search("dolor ca", limit=5)
+"""
+
+import re
+import unicodedata
+
+import localization
+from localization import get_translation
+
+# Arabic code points often typed in place of Urdu letters
+_URDU_FOLDS = str.maketrans({
+    "\u064a": "\u06cc",  # arabic yeh -> farsi yeh
+    "\u0649": "\u06cc",  # alef maksura -> farsi yeh
+    "\u0643": "\u06a9",  # arabic kaf -> keheh
+    "\u0647": "\u06c1",  # arabic heh -> heh goal
+    "\u0629": "\u06c1",  # teh marbuta -> heh goal
+    "\u0640": None,      # tatweel
+    "\u200c": None,      # zero-width non-joiner
+    "\u200d": None,      # zero-width joiner
+})
+_WORD = re.compile(r"\w+")
+NGRAM = 2
+# Dice similarity of n-gram sets above which a word counts as a misspelling
+MIN_NGRAM_SIMILARITY = 0.4
+
+def fold(text):
+    """Case-, accent- and Urdu-variant-insensitive form of text."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return unicodedata.normalize("NFC", stripped).casefold().translate(_URDU_FOLDS)
+
+
+def words(text):
+    return _WORD.findall(text)
+
+
+def ngrams(word):
+    padded = f" {word} "
+    return {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+
+
+class SymptomSearchIndex:
+    """Read-only search index over (symptom ID, display name, aliases) entries."""
+
+    def __init__(self, entries):
+        self.ids = []
+        self.names = []
+        # Folded searchable strings per entry, display name first
+        self._texts = []
+        # Trie of folded words; every node lists the entries below it
+        self._trie = {}
+        word_entries = {}
+        for entry, (symptom_id, name, aliases) in enumerate(entries):
+            self.ids.append(symptom_id)
+            self.names.append(name)
+            texts = list(dict.fromkeys(fold(t) for t in (name, *aliases)))
+            self._texts.append(texts)
+            for word in {w for text in texts for w in words(text)}:
+                word_entries.setdefault(word, set()).add(entry)
+                node = self._trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                    node.setdefault(None, set()).add(entry)
+        self._freeze(self._trie)
+        # Whole folded names, for the exact and name-prefix tiers
+        self._name_trie = {}
+        for entry, texts in enumerate(self._texts):
+            for text in texts:
+                node = self._name_trie
+                for char in text:
+                    node = node.setdefault(char, {})
+                    node.setdefault(None, set()).add(entry)
+                node.setdefault(True, set()).add(entry)
+        self._freeze(self._name_trie)
+        # Position of each entry when sorted by display name length, then name
+        self._sorted = sorted(range(len(self.names)), key=lambda e: (len(self.names[e]), self.names[e]))
+        self._order = [0] * len(self._sorted)
+        for position, entry in enumerate(self._sorted):
+            self._order[entry] = position
+        # N-grams index distinct words rather than entries, so a word shared
+        # by many symptoms is only compared once
+        self._word_entries = {word: frozenset(found) for word, found in word_entries.items()}
+        self._word_grams = {word: len(ngrams(word)) for word in word_entries}
+        grams = {}
+        for word in word_entries:
+            for gram in ngrams(word):
+                grams.setdefault(gram, []).append(word)
+        self._grams = {gram: tuple(found) for gram, found in grams.items()}
+
+    def _freeze(self, node):
+        for key, child in node.items():
+            if key is None or key is True:
+                node[key] = frozenset(child)
+            else:
+                self._freeze(child)
+
+    @classmethod
+    def for_language(cls, lang, symptoms):
+        """Index of symptom keys under their lang translations and English names."""
+        return cls([(symptom, get_translation(lang, symptom), (symptom, get_translation("en", symptom)))
+                    for symptom in symptoms])
+
+    def _prefixed(self, word, trie=None):
+        node = self._trie if trie is None else trie
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return frozenset(), {}
+        return node.get(None, frozenset()), node
+
+    def _similar(self, word):
+        # entry -> best Dice similarity of its words to word, over the words
+        # sharing enough n-grams with it
+        grams = ngrams(word)
+        shared = {}
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + self._word_grams[candidate])
+            if similarity >= MIN_NGRAM_SIMILARITY:
+                for entry in self._word_entries[candidate]:
+                    if similarity > similar.get(entry, 0.0):
+                        similar[entry] = similarity
+        return similar
+
+    def _take(self, entries, limit):
+        # entries in display order, at most limit of them; large sets are
+        # scanned in precomputed order instead of being sorted
+        if limit is not None and len(entries) > 4 * limit:
+            taken = []
+            for entry in self._sorted:
+                if entry in entries:
+                    taken.append(entry)
+                    if len(taken) == limit:
+                        break
+            return taken
+        return sorted(entries, key=self._order.__getitem__)[:limit]
+
+    def search(self, query, limit=10):
+        """Best matching symptoms as {"id", "name"} dicts; limit=None returns all.
+
+        Every query word has to prefix a word of the symptom, or failing
+        that resemble one.
+        """
+        query = fold(query).strip()
+        query_words = words(query)
+        if not query_words:
+            return []
+        found = None
+        # entry -> summed dissimilarity of its fuzzily matched words
+        penalties = {}
+        for word in query_words:
+            matches = self._prefixed(word)[0]
+            if not matches:
+                similar = self._similar(word)
+                for entry, similarity in similar.items():
+                    penalties[entry] = penalties.get(entry, 0.0) + 1 - similarity
+                matches = similar.keys()
+            found = set(matches) if found is None else found.intersection(matches)
+            if not found:
+                return []
+
+        if penalties:
+            ranked = sorted(found, key=lambda entry: (penalties.get(entry, 0.0), self._order[entry]))[:limit]
+        else:
+            # Exact names, then names starting with the query, then the rest
+            name_prefixed, node = self._prefixed(query, self._name_trie)
+            exact = found.intersection(node.get(True, ()))
+            prefixed = found.intersection(name_prefixed) - exact
+            ranked = []
+            for tier in (exact, prefixed, found - exact - prefixed):
+                ranked += self._take(tier, None if limit is None else limit - len(ranked))
+                if limit is not None and len(ranked) >= limit:
+                    break
+        return [{"id": self.ids[entry], "name": self.names[entry]} for entry in ranked]
+
+
+class SearchIndexes:
+    """One SymptomSearchIndex per language, built on first use and again after translations reload."""
+
+    def __init__(self, symptoms):
+        self.symptoms = list(dict.fromkeys(symptoms))
+        self._indexes = localization.LanguageMemo(
+            lambda lang: SymptomSearchIndex.for_language(lang, self.symptoms))
+
+    def get(self, lang):
+        return self._indexes.get(lang)
+
+    def search(self, lang, query, limit=10):
+        return self.get(lang).search(query, limit)
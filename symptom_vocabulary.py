@@ -0,0 +1,84 @@
+"""
+Dense integer IDs for symptom names.
+
+Scoring, live sessions and the front ends pass symptoms around as IDs or as
+bitmasks over IDs (bit i set when the symptom with ID i is selected), and
+only turn them back into names for display. A vocabulary only ever grows, so
+an ID or bitmask stays valid for as long as the vocabulary it came from,
+including across engine rebuilds.
+"""
+
+import threading
+
+
+def mask_from_ids(symptom_ids):
+    """Bitmask with the bit of every ID in symptom_ids set."""
+    mask = 0
+    for symptom_id in symptom_ids:
+        mask |= 1 << symptom_id
+    return mask
+
+
+def ids_from_mask(mask):
+    """IDs of the bits set in mask, lowest first."""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+class SymptomVocabulary:
+    """Append-only registry mapping symptom names to dense integer IDs."""
+
+    __slots__ = ("_ids", "_names", "_lock")
+
+    def __init__(self, names=()):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        """ID of name, assigning the next free one if it is new."""
+        symptom_id = self._ids.get(name)
+        if symptom_id is None:
+            with self._lock:
+                symptom_id = self._ids.get(name)
+                if symptom_id is None:
+                    # Publish the name before the ID so readers that find
+                    # the ID can always look the name up
+                    self._names.append(name)
+                    symptom_id = self._ids[name] = len(self._names) - 1
+        return symptom_id
+
+    def get(self, name, default=None):
+        """ID of name, or default if it was never interned."""
+        return self._ids.get(name, default)
+
+    def name(self, symptom_id):
+        return self._names[symptom_id]
+
+    def ids(self, names):
+        """IDs of the known names, in order; unknown names are skipped."""
+        get = self._ids.get
+        return [i for i in map(get, names) if i is not None]
+
+    def to_mask(self, names):
+        """Bitmask of the known names; unknown names are skipped."""
+        return mask_from_ids(self.ids(names))
+
+    def names(self, mask):
+        """Names of the bits set in mask, in ID order."""
+        return [self._names[i] for i in ids_from_mask(mask)]
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(list(self._names))
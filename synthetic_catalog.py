@@ -0,0 +1,93 @@
+"""
+Synthetic disease catalogs and symptom workloads for Diagnosis-AI benchmarks.
+
+Catalogs have the same shape as DiagnosisEngine.disease_profiles. Symptom
+popularity follows a Zipf-like distribution, so a few symptoms (think fever
+or fatigue) appear in many profiles while most are rare, and workloads skew
+towards popular symptoms the way real intake does. Everything is derived
+from a seed, so runs are reproducible.
+
+Usage:
+    python synthetic_catalog.py 10000 --symptoms 2000 --output catalog.json
+"""
+
+import argparse
+import json
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+
+def symptom_names(count):
+    """Stable synthetic symptom names."""
+    return [f"symptom_{i:05d}" for i in range(count)]
+
+
+def _zipf_sampler(rng, population, exponent):
+    # Weighted sampling without replacement by rejection over a cumulative table
+    cumulative = list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(len(population))))
+    total = cumulative[-1]
+
+    def sample(size):
+        size = min(size, len(population))
+        chosen = set()
+        while len(chosen) < size:
+            chosen.add(bisect_left(cumulative, rng.random() * total))
+        return [population[i] for i in chosen]
+
+    return sample
+
+
+def generate_catalog(num_diseases, num_symptoms=2000, min_profile=3, max_profile=12,
+                     exponent=0.8, seed=0):
+    """Generate num_diseases profiles over a vocabulary of num_symptoms symptoms."""
+    rng = random.Random(seed)
+    sample = _zipf_sampler(rng, symptom_names(num_symptoms), exponent)
+    catalog = {}
+    for i in range(num_diseases):
+        catalog[f"disease_{i:06d}"] = {
+            "symptoms": sample(rng.randint(min_profile, max_profile)),
+            "advice": f"advice_{i:06d}",
+        }
+    return catalog
+
+
+def generate_workload(catalog, num_queries, min_selected=1, max_selected=6,
+                      from_profile=0.7, exponent=0.8, seed=1):
+    """Generate symptom sets (lists of names) to diagnose against catalog.
+
+    A from_profile fraction of queries start from a random disease's profile,
+    so they actually reach the confidence threshold; the rest are drawn from
+    the symptom popularity distribution.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({s for profile in catalog.values() for s in profile["symptoms"]})
+    sample = _zipf_sampler(rng, vocabulary, exponent)
+    diseases = list(catalog)
+    workload = []
+    for _ in range(num_queries):
+        size = rng.randint(min_selected, max_selected)
+        if diseases and rng.random() < from_profile:
+            symptoms = catalog[rng.choice(diseases)]["symptoms"]
+            workload.append(rng.sample(symptoms, min(size, len(symptoms))))
+        else:
+            workload.append(sample(size))
+    return workload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic disease catalog")
+    parser.add_argument("diseases", type=int, help="number of disease profiles")
+    parser.add_argument("--symptoms", type=int, default=2000, help="symptom vocabulary size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="JSON file to write")
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.diseases, args.symptoms, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    print(f"Wrote {len(catalog)} synthetic disease profiles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
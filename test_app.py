@@ -0,0 +1,194 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+try:
+    import app as web_app
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+
+@unittest.skipUnless(FLASK_AVAILABLE, "Flask app dependencies not installed")
+class TestApp(unittest.TestCase):
+    def setUp(self):
+        self.client = web_app.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['language'] = 'en'
+
+    def diagnose(self, symptoms):
+        response = self.client.post('/diagnose', json={'symptoms': symptoms})
+        return response.get_json()['results']
+
+    def test_diagnose_toggle(self):
+        selected = []
+        for symptom in ["fever", "cough", "sore throat", "fever"]:
+            on = symptom not in selected
+            selected.append(symptom) if on else selected.remove(symptom)
+            response = self.client.post('/diagnose/toggle', json={
+                'symptom': symptom, 'selected': on, 'symptoms': selected})
+            self.assertEqual(response.get_json()['results'], self.diagnose(selected))
+
+        response = self.client.post('/diagnose/toggle', json={
+            'symptom': 'cough', 'selected': 'false', 'symptoms': ['cough', 'sore throat']})
+        self.assertEqual(response.get_json()['results'], self.diagnose(['sore throat']))
+        response = self.client.post('/diagnose/toggle', json={'reset': True})
+        self.assertEqual(response.get_json()['results'], [])
+
+    def test_diagnose_toggle_new_session_catches_up(self):
+        response = self.client.post('/diagnose/toggle', json={
+            'symptom': 'sore throat', 'selected': True, 'symptoms': ['fever', 'cough', 'sore throat']})
+        results = response.get_json()['results']
+        self.assertEqual(results[0]['disease_id'], 'Flu')
+        self.assertEqual(results, self.diagnose(['fever', 'cough', 'sore throat']))
+
+    def test_diagnose_toggle_resyncs_stale_selection(self):
+        # Tab A and tab B share the cookie, so they share the live session
+        for symptom, selected in (('fever', ['fever']), ('cough', ['fever', 'cough']),
+                                  ('sore throat', ['fever', 'cough', 'sore throat'])):
+            self.client.post('/diagnose/toggle', json={'symptom': symptom, 'selected': True, 'symptoms': selected})
+        for symptom, selected in (('joint pain', ['joint pain']), ('swelling', ['joint pain', 'swelling'])):
+            response = self.client.post('/diagnose/toggle', json={
+                'symptom': symptom, 'selected': True, 'symptoms': selected})
+        results = response.get_json()['results']
+        self.assertEqual(results[0]['disease_id'], 'Arthritis')
+        self.assertEqual(results, self.diagnose(['joint pain', 'swelling']))
+        # A reload clears the checkboxes before the next change
+        response = self.client.post('/diagnose/toggle', json={
+            'symptom': 'nausea', 'selected': True, 'symptoms': ['nausea']})
+        self.assertEqual(response.get_json()['results'], self.diagnose(['nausea']))
+
+    def test_diagnose_toggle_rejects_malformed_input(self):
+        for body in ({'symptom': ['fever']}, {'symptom': {'a': 1}}, {'symptoms': 'fever'},
+                     {'symptoms': [['fever']]}, ['fever'], {'symptom': 'fever', 'selected': 'maybe'}):
+            response = self.client.post('/diagnose/toggle', json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.get_json()['success'])
+
+    def test_diagnose_rule_alerts(self):
+        response = self.client.post('/diagnose', json={
+            'symptoms': ['fever', 'night sweats', 'unexplained weight loss']})
+        alerts = response.get_json()['alerts']
+        self.assertEqual([a['rule'] for a in alerts], ['escalate_tuberculosis'])
+        self.assertEqual(alerts[0]['disease_id'], 'Tuberculosis')
+        stats = self.client.get('/diagnose/rule-stats').get_json()['stats']
+        self.assertGreaterEqual(stats['evaluations'], 1)
+
+    def test_diagnose_explanations(self):
+        response = self.client.post('/diagnose', json={'symptoms': ['fever', 'cough', 'sore throat', 'nausea']})
+        flu = response.get_json()['results'][0]
+        self.assertEqual(flu['disease_id'], 'Flu')
+        self.assertEqual(flu['explanation'], {'matched': ['Fever', 'Cough', 'Sore Throat'],
+                                              'missing': ['Fatigue', 'Body Aches'],
+                                              'unexplained': ['Nausea']})
+        flu_symptoms = ['fever', 'cough', 'sore throat']
+        for flag in (False, 'false', '0', 'off', 0):
+            response = self.client.post('/diagnose', json={'symptoms': flu_symptoms, 'explain': flag})
+            self.assertNotIn('explanation', response.get_json()['results'][0])
+        response = self.client.post('/diagnose', json={'symptoms': flu_symptoms, 'explain': 'True'})
+        self.assertIn('explanation', response.get_json()['results'][0])
+        response = self.client.post('/diagnose', json={'symptoms': flu_symptoms, 'explain': 'maybe'})
+        self.assertFalse(response.get_json()['success'])
+
+    def test_symptom_search(self):
+        response = self.client.get('/symptoms/search', query_string={'q': 'fiebre', 'lang': 'es'})
+        self.assertEqual(response.get_json()['results'], [{'id': 'fever', 'name': 'Fiebre'}])
+        response = self.client.get('/symptoms/search', query_string={'q': 'pain', 'limit': 0})
+        self.assertIn('chest pain', [r['id'] for r in response.get_json()['results']])
+        self.assertFalse(self.client.get('/symptoms/search?q=x&limit=many').get_json()['success'])
+
+    def test_diagnose_rejects_non_finite_threshold(self):
+        for value in ('NaN', 'Infinity', '1e400'):
+            response = self.client.post('/diagnose', data='{"symptoms": ["fever"], "min_confidence": %s}' % value,
+                                        content_type='application/json')
+            self.assertFalse(response.get_json()['success'])
+
+    def test_chart_etag(self):
+        results = [{'disease': 'Flu', 'confidence': 60.0}, {'disease': 'COVID-19', 'confidence': 40.0}]
+        first = self.client.post('/generate-chart', json={'results': results})
+        etag = first.headers['ETag']
+        self.assertTrue(first.get_json()['chart_data'].startswith('data:image/png;base64,'))
+        again = self.client.post('/generate-chart', json={'results': results})
+        self.assertEqual(again.get_json(), first.get_json())
+        cached = self.client.post('/generate-chart', json={'results': results}, headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        with self.client.session_transaction() as sess:
+            sess['language'] = 'es'
+        translated = self.client.post('/generate-chart', json={'results': results})
+        self.assertNotEqual(translated.headers['ETag'], etag)
+
+    def test_chart_url(self):
+        results = [{'disease': 'Flu', 'confidence': 70.0}, {'disease': 'Cold', 'confidence': 20.0}]
+        response = self.client.post('/generate-chart', json={'results': results, 'format': 'svg'}).get_json()
+        url = response['chart_url']
+        self.assertTrue(url.startswith('/charts/') and url.endswith('.svg'))
+        svg = self.client.get(url)
+        self.assertEqual(svg.mimetype, 'image/svg+xml')
+        self.assertIn(b'<svg', svg.data)
+        self.assertIn('immutable', svg.headers['Cache-Control'])
+        cached = self.client.get(url, headers={'If-None-Match': svg.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        response = self.client.post('/generate-chart', json={'results': results, 'format': 'json'}).get_json()
+        self.assertEqual([bar['label'] for bar in response['spec']['bars']], ['Flu', 'Cold'])
+        self.assertEqual(self.client.get(response['chart_url']).get_json(), response['spec'])
+        self.assertEqual(self.client.get(url.replace('.svg', '.png')).mimetype, 'image/png')
+        # The URL alone is enough, e.g. after a restart or on another worker
+        web_app.chart_cache.clear()
+        self.assertEqual(self.client.get(url).data, svg.data)
+        self.assertEqual(self.client.get('/charts/' + 'f' * 64 + '.svg').status_code, 404)
+        forged = web_app.chart_token(['Flu'] * 51, [1.0] * 51, 'title', 'x')
+        self.assertEqual(self.client.get(f'/charts/{forged}.png').status_code, 404)
+        # "$" in labels is drawn as text, not parsed as mathtext
+        nested = '$' + '{' * 500 + '}' * 500 + '$'
+        crafted = web_app.chart_token(['$\\frac{$', nested], [10.0, 20.0], '$\\frac{$', nested)
+        for fmt in ('svg', 'png'):
+            response = self.client.get(f'/charts/{crafted}.{fmt}')
+            self.assertEqual(response.status_code, 200)
+        self.assertIn(b'frac{', self.client.get(f'/charts/{crafted}.svg').data)
+        with mock.patch.object(web_app.chart_pool, 'render', side_effect=RecursionError):
+            response = self.client.get(f'/charts/{web_app.chart_token(["Flu"], [1.0], "t", "x")}.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.client.post('/generate-chart', json={'results': results, 'format': 'gif'})
+                         .get_json()['success'])
+
+    def test_export_pdf(self):
+        self.diagnose(['fever', 'cough', 'body aches'])
+        # Both exports print the same date, so the second comes from the cache
+        with mock.patch.object(web_app, 'datetime') as fake_datetime:
+            fake_datetime.now.return_value = datetime(2024, 5, 1, 9, 30)
+            first = self.client.post('/export-pdf')
+            self.assertEqual(first.mimetype, 'application/pdf')
+            self.assertTrue(first.data.startswith(b'%PDF'))
+            hits = web_app.report_cache.stats()['hits']
+            self.assertEqual(self.client.post('/export-pdf').data, first.data)
+        self.assertEqual(web_app.report_cache.stats()['hits'], hits + 1)
+
+    def test_saved_selection_survives_vocabulary_change(self):
+        self.diagnose(['fever', 'cough', 'body aches'])
+        # A deploy that interns the page's symptoms in another order
+        ids = list(web_app.symptom_ids.values())
+        reordered = dict(zip(web_app.symptom_ids, reversed(ids)))
+        with mock.patch.object(web_app, 'symptom_ids', reordered):
+            saved = self.client.post('/save-results').get_json()
+            self.assertEqual(saved['selected_symptoms'], ['cough', 'fever', 'body aches'])
+            self.assertTrue(self.client.post('/export-pdf').data.startswith(b'%PDF'))
+
+    def test_chart_bar_limit(self):
+        results = [{'disease': f'Disease {i}', 'confidence': 50.0} for i in range(web_app.CHART_MAX_BARS + 1)]
+        for output in ('base64', 'png', 'json'):
+            response = self.client.post('/generate-chart', json={'results': results, 'format': output})
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.get_json()['success'])
+
+    def test_chart_back_pressure(self):
+        results = [{'disease': 'Flu', 'confidence': 33.0}]
+        with mock.patch.object(web_app.chart_pool, 'render', side_effect=web_app.ChartPoolBusy):
+            response = self.client.post('/generate-chart', json={'results': results})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertFalse(response.get_json()['success'])
+
+
+if __name__ == "__main__":
+    unittest.main()
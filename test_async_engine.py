@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import unittest
+from diagnosis_engine import DiagnosisEngine
+from async_engine import AsyncDiagnosisEngine
+from sharded_engine import ShardedDiagnosisEngine
+from synthetic_catalog import generate_catalog, generate_workload
+
+
+class SlowEngine(DiagnosisEngine):
+    """Counts batch calls and holds each one until released."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_calls = 0
+        self.release = threading.Event()
+
+    def run_diagnosis_batch(self, *args, **kwargs):
+        self.batch_calls += 1
+        self.release.wait(5)
+        return super().run_diagnosis_batch(*args, **kwargs)
+
+
+class TestAsyncDiagnosisEngine(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = generate_catalog(200, 40, seed=3)
+        cls.workload = generate_workload(cls.catalog, 30, seed=4)
+        cls.reference = DiagnosisEngine(disease_profiles=cls.catalog)
+
+    async def test_inline_matches_engine(self):
+        diagnoser = AsyncDiagnosisEngine(self.reference)
+        symptoms = {s: True for s in self.workload[0]}
+        self.assertEqual(await diagnoser.run_diagnosis(symptoms, k=3), self.reference.run_diagnosis(symptoms, k=3))
+        mask = self.reference.vocabulary.to_mask(self.workload[0])
+        self.assertEqual(await diagnoser.run_diagnosis(mask, k=3), self.reference.run_diagnosis(symptoms, k=3))
+        self.assertEqual(await diagnoser.run_diagnosis_batch(self.workload, k=5),
+                         self.reference.run_diagnosis_batch(self.workload, k=5))
+
+    async def test_chunked_batch_matches_engine(self):
+        diagnoser = AsyncDiagnosisEngine(self.reference, inline_batch_size=0, chunk_size=7)
+        for scoring in ("overlap", "bayes"):
+            self.assertEqual(await diagnoser.run_diagnosis_batch(self.workload, k=5, scoring=scoring),
+                             self.reference.run_diagnosis_batch(self.workload, k=5, scoring=scoring))
+        self.assertEqual(diagnoser.stats()["in_flight"], 0)
+
+    async def test_sharded_runs_in_executor(self):
+        with ShardedDiagnosisEngine(2, disease_profiles=self.catalog) as engine:
+            diagnoser = AsyncDiagnosisEngine(engine)
+            symptoms = {s: True for s in self.workload[1]}
+            self.assertEqual(await diagnoser.run_diagnosis(symptoms, min_confidence=0),
+                             self.reference.run_diagnosis(symptoms, min_confidence=0))
+            self.assertEqual(await diagnoser.run_diagnosis_batch(self.workload, k=3),
+                             self.reference.run_diagnosis_batch(self.workload, k=3))
+
+    async def test_identical_requests_coalesce(self):
+        engine = SlowEngine(disease_profiles=self.catalog)
+        diagnoser = AsyncDiagnosisEngine(engine, inline_batch_size=0)
+        calls = [asyncio.ensure_future(diagnoser.run_diagnosis_batch(self.workload, k=5)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        engine.release.set()
+        results = await asyncio.gather(*calls)
+        self.assertEqual(engine.batch_calls, 1)
+        self.assertEqual(diagnoser.stats(), {"in_flight": 0, "coalesced": 3})
+        self.assertTrue(all(r == results[0] for r in results))
+        self.assertIsNot(results[0], results[1])
+
+    async def test_timeout_leaves_other_callers_running(self):
+        engine = SlowEngine(disease_profiles=self.catalog)
+        diagnoser = AsyncDiagnosisEngine(engine, inline_batch_size=0)
+        patient = asyncio.ensure_future(diagnoser.run_diagnosis_batch(self.workload))
+        with self.assertRaises(asyncio.TimeoutError):
+            await diagnoser.run_diagnosis_batch(self.workload, timeout=0.01)
+        engine.release.set()
+        self.assertEqual(await patient, self.reference.run_diagnosis_batch(self.workload))
+
+    async def test_cancel_stops_remaining_chunks(self):
+        engine = SlowEngine(disease_profiles=self.catalog)
+        diagnoser = AsyncDiagnosisEngine(engine, inline_batch_size=0, chunk_size=5)
+        call = asyncio.ensure_future(diagnoser.run_diagnosis_batch(self.workload))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+        engine.release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual(engine.batch_calls, 1)
+        self.assertEqual(diagnoser.stats()["in_flight"], 0)
+
+    async def test_identical_call_after_cancel_starts_fresh(self):
+        diagnoser = AsyncDiagnosisEngine(self.reference)
+        calls = []
+
+        async def compute():
+            calls.append(None)
+            if len(calls) > 1:
+                return "fresh"
+            try:
+                await asyncio.sleep(10)
+            finally:
+                # Cleanup that outlasts the cancellation request
+                await asyncio.sleep(0.05)
+
+        first = asyncio.ensure_future(diagnoser._shared("key", compute, None))
+        await asyncio.sleep(0)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        # The cancelled task is still winding down; an identical call must not join it
+        self.assertEqual(await diagnoser._shared("key", compute, None), "fresh")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(diagnoser.stats(), {"in_flight": 0, "coalesced": 0})
+
+    async def test_rejects_unknown_scoring(self):
+        with self.assertRaises(ValueError):
+            await AsyncDiagnosisEngine(self.reference).run_diagnosis({"fever": True}, scoring="magic")
+
+
+if __name__ == "__main__":
+    unittest.main()
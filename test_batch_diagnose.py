@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from batch_diagnose import main
+from diagnosis_engine import DiagnosisEngine
+from knowledge_base import compile_snapshot
+from synthetic_catalog import generate_catalog, generate_workload
+
+
+class TestBatchDiagnose(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.catalog = generate_catalog(300, 60, seed=8)
+        cls.workload = generate_workload(cls.catalog, 45, seed=9)
+        cls.reference = DiagnosisEngine(disease_profiles=cls.catalog)
+        cls.profiles = os.path.join(cls.tmpdir.name, "catalog.dxkb")
+        compile_snapshot(cls.catalog, cls.profiles)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def write_jsonl(self, name):
+        with open(self.path(name), "w", encoding="utf-8") as f:
+            for i, symptoms in enumerate(self.workload):
+                f.write(json.dumps({"id": f"p{i}", "symptoms": symptoms}) + "\n")
+            f.write("not json\n")
+            f.write(json.dumps({"id": "no-symptoms"}) + "\n")
+        return self.path(name)
+
+    def expected(self, k=None, min_confidence=50, scoring="overlap"):
+        return self.reference.run_diagnosis_batch(self.workload, k=k, min_confidence=min_confidence,
+                                                  scoring=scoring)
+
+    def read_jsonl_results(self, path):
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        return ([r["id"] for r in records],
+                [[(x["disease"], x["confidence"], x["advice"]) for x in r["results"]] for r in records])
+
+    def test_jsonl_process_pool(self):
+        output = self.path("out_pool.jsonl")
+        main([self.write_jsonl("in.jsonl"), "--output", output, "--profiles", self.profiles,
+              "--workers", "2", "--chunk-size", "4", "--k", "3"])
+        ids, results = self.read_jsonl_results(output)
+        self.assertEqual(ids, [f"p{i}" for i in range(len(self.workload))])
+        self.assertEqual(results, self.expected(k=3))
+
+    def test_in_process_bayes(self):
+        output = self.path("out_bayes.jsonl")
+        main([self.write_jsonl("in_bayes.jsonl"), "--output", output, "--profiles", self.profiles,
+              "--workers", "0", "--scoring", "bayes", "--min-confidence", "1"])
+        self.assertEqual(self.read_jsonl_results(output)[1], self.expected(min_confidence=1, scoring="bayes"))
+
+    def test_csv(self):
+        source = self.path("in.csv")
+        with open(source, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "symptoms"])
+            writer.writerows((f"p{i}", ";".join(s)) for i, s in enumerate(self.workload))
+        output = self.path("out.csv")
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            main([source, "--output", output, "--profiles", self.profiles, "--workers", "1", "--chunk-size", "7"])
+        with open(output, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        # Patients without a qualifying disease keep one row with empty fields
+        expected = [row for i, results in enumerate(self.expected())
+                    for row in ([(f"p{i}", str(rank), d, str(c), a) for rank, (d, c, a) in enumerate(results, 1)]
+                                or [(f"p{i}", "", "", "", "")])]
+        self.assertIn(("", "", "", ""), [row[1:] for row in expected])
+        self.assertEqual([(r["id"], r["rank"], r["disease"], r["confidence"], r["advice"]) for r in rows], expected)
+        unmatched = sum(not results for results in self.expected())
+        self.assertIn(f"{unmatched} matched no disease", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
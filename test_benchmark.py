@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmark_engine import main as run_benchmarks
+from benchmark_charts import main as run_chart_benchmarks
+from synthetic_catalog import generate_catalog, generate_workload
+
+
+class TestSyntheticCatalog(unittest.TestCase):
+    def test_reproducible(self):
+        self.assertEqual(generate_catalog(50, 100, seed=3), generate_catalog(50, 100, seed=3))
+        self.assertNotEqual(generate_catalog(50, 100, seed=3), generate_catalog(50, 100, seed=4))
+
+    def test_shape(self):
+        catalog = generate_catalog(200, 300, min_profile=2, max_profile=5)
+        self.assertEqual(len(catalog), 200)
+        for profile in catalog.values():
+            self.assertTrue(2 <= len(profile["symptoms"]) <= 5)
+            self.assertEqual(len(set(profile["symptoms"])), len(profile["symptoms"]))
+        workload = generate_workload(catalog, 100, max_selected=4)
+        self.assertEqual(len(workload), 100)
+        self.assertTrue(all(1 <= len(symptoms) <= 4 for symptoms in workload))
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_writes_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "bench.json")
+            run_benchmarks(["--diseases", "50", "--symptoms", "100", "--queries", "20",
+                            "--batch-size", "7", "--build-repeat", "1",
+                            "--backends", "python", "--lsh", "8x2", "--output", output])
+            with open(output) as f:
+                data = json.load(f)
+        operations = {r["operation"] for r in data["results"]}
+        self.assertIn("build", operations)
+        self.assertIn("run_diagnosis", operations)
+        self.assertIn("run_diagnosis_loop", operations)
+        self.assertIn("lsh_8x2", operations)
+        for result in data["results"]:
+            self.assertGreater(result["throughput"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        # Batches of 7, 7 and 6 patients
+        for result in data["results"]:
+            if result["operation"] in ("run_diagnosis_batch", "run_diagnosis_loop"):
+                self.assertEqual((result["calls"], result["items"]), (3, 20))
+
+
+class TestChartBenchmark(unittest.TestCase):
+    def test_writes_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "chart_bench.json")
+            run_chart_benchmarks(["--charts", "4", "--languages", "en,es", "--output", output])
+            with open(output) as f:
+                data = json.load(f)
+        self.assertEqual([r["mode"] for r in data["results"]], ["fresh", "template"])
+        for result in data["results"]:
+            self.assertGreater(result["throughput"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
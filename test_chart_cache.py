@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from chart_cache import ChartCache, chart_key
+
+
+class TestChartCache(unittest.TestCase):
+    def test_key_is_content_hash(self):
+        key = chart_key("png", ["Flu"], [60.0], "Title", "Confidence")
+        self.assertEqual(key, chart_key("png", ["Flu"], [60.0], "Title", "Confidence"))
+        self.assertNotEqual(key, chart_key("png", ["Flu"], [60.0], "Título", "Confidence"))
+        self.assertNotEqual(key, chart_key("svg", ["Flu"], [60.0], "Title", "Confidence"))
+
+    def test_get_or_render_renders_once(self):
+        cache = ChartCache()
+        calls = []
+        render = lambda: calls.append(1) or b"png"
+        self.assertEqual(cache.get_or_render("a", render), b"png")
+        self.assertEqual(cache.get_or_render("a", render), b"png")
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_evicts_by_size(self):
+        cache = ChartCache(maxbytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"12345")
+        self.assertEqual(cache.stats()["bytes"], 10)
+        # Too large to keep in memory at all
+        cache.put("d", b"x" * 11)
+        self.assertIsNone(cache.get("d"))
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ChartCache(directory=tmpdir).put("a", b"png")
+            cache = ChartCache(directory=tmpdir)
+            self.assertEqual(cache.get("a"), b"png")
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            self.assertEqual(os.listdir(tmpdir), ["a.chart"])
+
+    def test_disk_budget(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ChartCache(maxbytes=1, directory=tmpdir, max_disk_bytes=100)
+            for i, key in enumerate("abcd"):
+                cache.put(key, bytes(40))
+                os.utime(os.path.join(tmpdir, f"{key}.chart"), (i, i))
+            self.assertEqual(cache.trim_disk(), 0)  # writes already trimmed a and b
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["c.chart", "d.chart"])
+            self.assertEqual(cache.stats()["disk_evictions"], 2)
+            # Disk hits count as use; larger than the budget never reaches disk
+            self.assertIsNotNone(cache.get("c"))
+            cache.put("e", bytes(40))
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["c.chart", "e.chart"])
+            cache.put("f", bytes(101))
+            self.assertNotIn("f.chart", os.listdir(tmpdir))
+            # Budget applies to files left by other processes too
+            self.assertEqual(ChartCache(directory=tmpdir, max_disk_bytes=50).stats()["disk_evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
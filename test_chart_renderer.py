@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    import chart_renderer
+    from chart_renderer import (WEB_STYLE, ChartPoolBusy, ChartRenderPool, ChartRenderTimeout,
+                                chart_spec, chart_template, render_bar_chart)
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@unittest.skipUnless(MATPLOTLIB_AVAILABLE, "matplotlib not installed")
+class TestChartRenderer(unittest.TestCase):
+    def test_render_png(self):
+        png = render_bar_chart(["Flu", "Cold"], [60.0, 40.0], "Confidence", "%")
+        self.assertTrue(png.startswith(PNG_SIGNATURE))
+
+    def test_render_svg(self):
+        args = (["Flu", "Cold"], [60.0, 40.0], "Confianza", "%")
+        svg = render_bar_chart(*args, format="svg")
+        self.assertIn(b"<svg", svg)
+        # Text stays text, and the output is reproducible
+        self.assertIn(b"Confianza", svg)
+        self.assertEqual(render_bar_chart(*args, format="svg"), svg)
+        with self.assertRaises(ValueError):
+            render_bar_chart(*args, format="gif")
+
+    def test_chart_spec(self):
+        spec = chart_spec(["Flu", "Cold"], [60.0, 40.0], "Confidence", "%")
+        self.assertEqual(spec["title"], "Confidence")
+        self.assertEqual([(bar["label"], bar["value"]) for bar in spec["bars"]], [("Flu", 60.0), ("Cold", 40.0)])
+
+    def test_template_reuse_keeps_no_state(self):
+        first = (["Flu", "Common Cold", "COVID-19"], [60.0, 40.0, 12.5], "Confidence", "%")
+        png = render_bar_chart(*first)
+        # A chart with more bars and longer labels in between
+        render_bar_chart(["Generalized anxiety disorder"] * 6, [90.0, 80, 70, 60, 50, 40], "Confidence", "%")
+        self.assertEqual(render_bar_chart(*first), png)
+
+    def test_large_chart_leaves_template_unchanged(self):
+        small = (["Flu", "Cold"], [60.0, 40.0], "Confidence", "%")
+        png = render_bar_chart(*small)
+        axes = chart_template("Confidence", "%").axes
+        artists = (len(axes.patches), len(axes.texts))
+        count = chart_renderer.TEMPLATE_BARS * 5
+        render_bar_chart([f"Disease {i}" for i in range(count)], [50.0] * count, "Confidence", "%")
+        self.assertEqual((len(axes.patches), len(axes.texts)), artists)
+        self.assertEqual(render_bar_chart(*small), png)
+
+    def test_template_per_language_and_style(self):
+        template = chart_template("Confidence", "%")
+        self.assertIs(chart_template("Confidence", "%"), template)
+        self.assertIsNot(chart_template("Confianza", "%"), template)
+        self.assertIsNot(chart_template("Confidence", "%", WEB_STYLE._replace(figsize=(8, 5))), template)
+
+    def test_pool_matches_inline_render(self):
+        args = (["Flu", "Cold"], [60.0, 40.0], "Confidence", "%")
+        with ChartRenderPool(workers=1) as pool:
+            self.assertEqual(pool.render(*args), render_bar_chart(*args))
+            stats = pool.stats()
+        self.assertEqual((stats["rendered"], stats["pending"]), (1, 0))
+
+    def test_busy_when_saturated(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_render(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return b"png"
+
+        pool = ChartRenderPool(workers=0, max_pending=1)
+        with mock.patch.object(chart_renderer, "render_bar_chart", slow_render):
+            worker = threading.Thread(target=pool.render, args=(["Flu"], [60.0], "", ""))
+            worker.start()
+            started.wait(5)
+            with self.assertRaises(ChartPoolBusy):
+                pool.render(["Cold"], [40.0], "", "")
+            release.set()
+            worker.join()
+            self.assertEqual(pool.render(["Cold"], [40.0], "", ""), b"png")
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+    def test_timeout_recycles_running_worker(self):
+        # Takes seconds to draw, far longer than the timeout
+        diseases = [f"Disease {i}" for i in range(2000)]
+        with ChartRenderPool(workers=1, max_pending=1, timeout=0.5) as pool:
+            start = time.monotonic()
+            with self.assertRaises(ChartRenderTimeout):
+                pool.render(diseases, [50.0] * len(diseases), "Confidence", "%")
+            deadline = time.monotonic() + 5
+            while pool.stats()["pending"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            stats = pool.stats()
+            self.assertEqual((stats["pending"], stats["timeouts"], stats["recycled"]), (0, 1, 1))
+            self.assertLess(time.monotonic() - start, 3)
+            # The slot is free again and a fresh worker renders
+            pool.timeout = 30
+            args = (["Flu"], [60.0], "Confidence", "%")
+            self.assertEqual(pool.render(*args), render_bar_chart(*args))
+
+if __name__ == "__main__":
+    unittest.main()
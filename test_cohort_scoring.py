@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+from diagnosis_engine import DiagnosisEngine, NUMPY_AVAILABLE
+from synthetic_catalog import generate_catalog, generate_workload
+import cohort_scoring
+from cohort_scoring import PANDAS_AVAILABLE, read_cohort, score_cohort, symptom_columns, write_scores
+
+if PANDAS_AVAILABLE:
+    import pandas as pd
+
+
+@unittest.skipUnless(PANDAS_AVAILABLE and NUMPY_AVAILABLE, "pandas not installed")
+class TestCohortScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = generate_catalog(250, 50, seed=11)
+        cls.workload = generate_workload(cls.catalog, 80, seed=12)
+        cls.engine = DiagnosisEngine(disease_profiles=cls.catalog)
+        symptoms = sorted({s for selected in cls.workload for s in selected})
+        cls.frame = pd.DataFrame([{s: s in selected for s in symptoms} for selected in cls.workload],
+                                 index=pd.Index([f"p{i}" for i in range(len(cls.workload))], name="patient_id"))
+        cls.frame["age"] = 40
+
+    def test_matches_compact_batch(self):
+        for backend in ("python", "numpy"):
+            engine = DiagnosisEngine(backend=backend, disease_profiles=self.catalog)
+            for scoring in ("overlap", "bayes"):
+                scores = score_cohort(engine, self.frame, scoring)
+                self.assertEqual(list(scores.columns), list(engine.disease_names))
+                self.assertEqual(list(scores.index), list(self.frame.index))
+                self.assertEqual(scores.to_numpy().tolist(),
+                                 engine.run_diagnosis_batch(self.workload, compact=True, scoring=scoring).tolist())
+
+    def test_non_symptom_columns_ignored(self):
+        self.assertNotIn("age", symptom_columns(self.engine, self.frame))
+
+    def test_missing_values_not_selected(self):
+        frame = self.frame.astype(object)
+        frame.iloc[0, 0] = None
+        expected = self.frame.copy()
+        expected.iloc[0, 0] = False
+        self.assertTrue(score_cohort(self.engine, frame).equals(score_cohort(self.engine, expected)))
+
+    def test_csv_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cohort = os.path.join(tmpdir, "cohort.csv")
+            output = os.path.join(tmpdir, "scores.csv")
+            profiles = os.path.join(tmpdir, "catalog.json")
+            with open(profiles, "w", encoding="utf-8") as f:
+                json.dump(self.catalog, f)
+            self.frame.to_csv(cohort)
+            cohort_scoring.main([cohort, "--output", output, "--index-column", "patient_id", "--profiles", profiles])
+            scores = read_cohort(output, "patient_id")
+            self.assertEqual(scores.to_numpy().tolist(), score_cohort(self.engine, self.frame).to_numpy().tolist())
+
+    def test_parquet_round_trip(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "scores.parquet")
+            scores = score_cohort(self.engine, self.frame)
+            write_scores(scores, path)
+            self.assertTrue(pd.read_parquet(path).equals(scores))
+
+
+if __name__ == "__main__":
+    unittest.main()
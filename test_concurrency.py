@@ -0,0 +1,112 @@
+import random
+import threading
+import unittest
+from diagnosis_engine import DiagnosisEngine, NUMPY_AVAILABLE
+
+try:
+    import app as web_app
+    FLASK_AVAILABLE = True
+except ImportError:
+    FLASK_AVAILABLE = False
+
+THREADS = 16
+ROUNDS = 200
+
+
+def make_workload(engine, size, seed):
+    rng = random.Random(seed)
+    vocab = sorted(engine.symptom_index)
+    return [rng.sample(vocab, rng.randint(1, 6)) for _ in range(size)]
+
+
+def hammer(worker, threads=THREADS):
+    # Start all workers together and collect any assertion failures
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            worker(index)
+        except Exception as e:  # Reported from the main thread below
+            errors.append(e)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return errors
+
+
+class TestEngineConcurrency(unittest.TestCase):
+    def check_engine(self, engine):
+        workload = make_workload(engine, ROUNDS, seed=0)
+        expected = [engine.run_diagnosis({s: True for s in symptoms}) for symptoms in workload]
+
+        def worker(index):
+            # Each thread walks the workload from a different offset so
+            # different symptom sets are in flight at the same time
+            for i in range(ROUNDS):
+                j = (i + index * 7) % ROUNDS
+                result = engine.run_diagnosis({s: True for s in workload[j]})
+                if result != expected[j]:
+                    raise AssertionError(f"{workload[j]}: {result} != {expected[j]}")
+
+        self.assertEqual(hammer(worker), [])
+
+    def test_python_backend(self):
+        self.check_engine(DiagnosisEngine())
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_backend(self):
+        self.check_engine(DiagnosisEngine(backend="numpy"))
+
+    def test_rebuild_while_scoring(self):
+        # Recompiling swaps tables atomically; readers never see a mix
+        engine = DiagnosisEngine()
+        symptoms = {"fever": True, "cough": True, "sore throat": True}
+        expected = engine.run_diagnosis(symptoms)
+        stop = threading.Event()
+
+        def rebuild():
+            while not stop.is_set():
+                engine.build_index()
+
+        rebuilder = threading.Thread(target=rebuild)
+        rebuilder.start()
+        try:
+            def worker(index):
+                for _ in range(ROUNDS):
+                    self.assertEqual(engine.run_diagnosis(symptoms), expected)
+
+            self.assertEqual(hammer(worker), [])
+        finally:
+            stop.set()
+            rebuilder.join()
+
+
+@unittest.skipUnless(FLASK_AVAILABLE, "Flask app dependencies not installed")
+class TestDiagnoseEndpointConcurrency(unittest.TestCase):
+    def test_diagnose_endpoint(self):
+        engine = web_app.engine
+        workload = make_workload(engine, 50, seed=1)
+        expected = [[r[0] for r in engine.run_diagnosis({s: True for s in symptoms})]
+                    for symptoms in workload]
+
+        def worker(index):
+            client = web_app.app.test_client()
+            with client.session_transaction() as sess:
+                sess['language'] = 'en'
+            for i in range(len(workload)):
+                j = (i + index * 3) % len(workload)
+                response = client.post('/diagnose', json={'symptoms': workload[j]})
+                data = response.get_json()
+                self.assertTrue(data['success'])
+                self.assertEqual([r['disease_id'] for r in data['results']], expected[j])
+
+        self.assertEqual(hammer(worker, threads=8), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
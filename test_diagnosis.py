@@ -1,5 +1,6 @@
+import random
 import unittest
-from diagnosis_engine import DiagnosisEngine
+from diagnosis_engine import DiagnosisEngine, DiagnosisSession, NUMPY_AVAILABLE
 
 class TestDiagnosisEngine(unittest.TestCase):
     def setUp(self):
@@ -11,6 +12,17 @@ class TestDiagnosisEngine(unittest.TestCase):
         results = self.engine.calculate_confidence(symptoms)
         self.assertGreaterEqual(results["Flu"], 60)
         
+    def test_calculate_confidence_untouched_diseases(self):
+        # Diseases sharing no selected symptom are still reported, at zero
+        results = self.engine.calculate_confidence(["wheezing"])
+        self.assertEqual(set(results), set(self.engine.disease_profiles))
+        self.assertEqual(results["Asthma"], 25.0)
+        self.assertEqual(results["Flu"], 0.0)
+
+    def test_symptom_index(self):
+        self.assertIn("Tuberculosis", self.engine.symptom_index["night sweats"])
+        self.assertEqual(self.engine.profile_sizes["Diabetes"], 4)
+
     def test_run_diagnosis(self):
         # Create a symptoms dictionary simulating UI input
         symptoms = {
@@ -25,5 +37,214 @@ class TestDiagnosisEngine(unittest.TestCase):
         # Flu should be detected with high confidence
         self.assertEqual(results[0][0], "Flu")
         
+    def test_run_diagnosis_top_k(self):
+        symptoms = {s: True for s in ["fever", "cough", "fatigue", "chest pain", "shortness of breath"]}
+        full = self.engine.run_diagnosis(symptoms, min_confidence=0)
+        self.assertEqual(len(full), len(self.engine.disease_profiles))
+        self.assertEqual(self.engine.run_diagnosis(symptoms, k=3, min_confidence=0), full[:3])
+        strict = self.engine.run_diagnosis(symptoms, min_confidence=80)
+        self.assertEqual(strict, [r for r in full if r[1] >= 80])
+
+    def test_min_matches(self):
+        needed = self.engine.compiled.min_matches(50)
+        self.assertEqual(needed[4], 2)
+        self.assertEqual(needed[5], 3)
+        self.assertEqual(self.engine.compiled.min_matches(101)[4], 5)
+
+    def test_tiny_min_confidence(self):
+        # The size bound starts at the largest profile instead of stepping
+        # down from selected * 100 / min_confidence
+        symptoms = {"fever": True, "cough": True}
+        expected = [r for r in self.engine.run_diagnosis(symptoms, min_confidence=0) if r[1] > 0]
+        for threshold in (1e-6, 1e-300, 5e-324):
+            self.assertEqual(self.engine.run_diagnosis(symptoms, min_confidence=threshold), expected)
+        with self.assertRaises(ValueError):
+            self.engine.run_diagnosis(symptoms, min_confidence=float("nan"))
+
+    def test_run_diagnosis_batch(self):
+        patients = [
+            {"fever": True, "cough": True, "sore throat": True, "headache": False},
+            ["headache", "nausea", "sensitivity to light"],
+            ["cough", "fever", "sore throat"],
+            [],
+        ]
+        results = self.engine.run_diagnosis_batch(patients)
+        self.assertEqual(len(results), len(patients))
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(results[1], self.engine.run_diagnosis({s: True for s in patients[1]}))
+        self.assertEqual(results[3], [])
+
+    def test_explain(self):
+        symptoms = {"fever": True, "cough": True, "nausea": True}
+        results = self.engine.run_diagnosis(symptoms, min_confidence=0, explain=True)
+        self.assertEqual([r[:3] for r in results], self.engine.run_diagnosis(symptoms, min_confidence=0))
+        names = self.engine.vocabulary.names
+        flu = next(r[3] for r in results if r[0] == "Flu")
+        self.assertEqual(set(names(flu.matched)), {"fever", "cough"})
+        self.assertEqual(set(names(flu.missing)), {"sore throat", "fatigue", "body aches"})
+        self.assertEqual(names(flu.unexplained), ["nausea"])
+        mask = self.engine.vocabulary.to_mask(symptoms)
+        self.assertEqual(self.engine.explain([r[:3] for r in results], mask), [r[3] for r in results])
+        self.assertEqual(self.engine.run_diagnosis_mask(mask, min_confidence=0, explain=True), results)
+        self.assertEqual(self.engine.explain([("Gone", 50.0, "advice_gone")], ["fever"]), [None])
+
+class TestBayesScoring(unittest.TestCase):
+    def setUp(self):
+        self.engine = DiagnosisEngine()
+
+    def test_posterior(self):
+        posterior = self.engine.calculate_confidence(["fever", "cough", "sore throat"], scoring="bayes")
+        self.assertAlmostEqual(sum(posterior.values()), 100, delta=0.1)
+        self.assertEqual(max(posterior, key=posterior.get), "Flu")
+        results = self.engine.run_diagnosis({"fever": True, "cough": True, "sore throat": True},
+                                            scoring="bayes")
+        self.assertEqual(results[0][0], "Flu")
+
+    def test_unprofiled_symptoms_count_against_a_disease(self):
+        # Overlap ignores extra symptoms; the posterior moves away from Flu
+        flu = ["fever", "cough", "sore throat", "fatigue"]
+        extra = flu + ["joint pain", "joint stiffness"]
+        self.assertEqual(self.engine.calculate_confidence(flu)["Flu"],
+                         self.engine.calculate_confidence(extra)["Flu"])
+        self.assertGreater(self.engine.calculate_confidence(flu, scoring="bayes")["Flu"],
+                           self.engine.calculate_confidence(extra, scoring="bayes")["Flu"])
+
+    def test_priors_and_likelihoods(self):
+        profiles = {
+            "Common": {"symptoms": ["fever"], "advice": "a", "prior": 9},
+            "Rare": {"symptoms": ["fever"], "advice": "b", "prior": 1},
+        }
+        engine = DiagnosisEngine(disease_profiles=profiles)
+        self.assertEqual(engine.calculate_confidence(["fever"], scoring="bayes"),
+                         {"Common": 90.0, "Rare": 10.0})
+        profiles["Rare"]["likelihoods"] = {"fever": 1.5}
+        with self.assertRaises(ValueError):
+            DiagnosisEngine(disease_profiles=profiles)
+
+    def test_pruned_ranking_matches_full_posterior(self):
+        rng = random.Random(4)
+        vocab = sorted(self.engine.symptom_index)
+        for _ in range(200):
+            selected = rng.sample(vocab, rng.randint(0, 6))
+            min_confidence = rng.choice([1, 10, 50])
+            posterior = self.engine.calculate_confidence(selected, scoring="bayes")
+            expected = sorted(((d, c) for d, c in posterior.items() if c >= min_confidence),
+                              key=lambda x: -x[1])
+            results = self.engine.run_diagnosis(dict.fromkeys(selected, True),
+                                                min_confidence=min_confidence, scoring="bayes")
+            self.assertEqual([(d, c) for d, c, a in results], expected)
+
+    def test_unknown_scoring(self):
+        with self.assertRaises(ValueError):
+            self.engine.run_diagnosis({"fever": True}, scoring="vibes")
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_backend(self):
+        numpy_engine = DiagnosisEngine(backend="numpy")
+        rng = random.Random(3)
+        vocab = sorted(self.engine.symptom_index)
+        for _ in range(200):
+            selected = rng.sample(vocab, rng.randint(0, 6))
+            expected = self.engine.calculate_confidence(selected, scoring="bayes")
+            actual = numpy_engine.calculate_confidence(selected, scoring="bayes")
+            for disease, confidence in expected.items():
+                self.assertAlmostEqual(actual[disease], confidence, delta=0.011)
+        patients = [rng.sample(vocab, rng.randint(1, 6)) for _ in range(50)]
+        self.assertEqual(numpy_engine.run_diagnosis_batch(patients, min_confidence=5, scoring="bayes"),
+                         [numpy_engine.run_diagnosis(dict.fromkeys(p, True), min_confidence=5, scoring="bayes")
+                          for p in patients])
+
+class TestDiagnosisSession(unittest.TestCase):
+    def setUp(self):
+        self.engine = DiagnosisEngine()
+        self.vocab = sorted(self.engine.symptom_index)
+
+    def test_toggles_match_full_diagnosis(self):
+        rng = random.Random(2)
+        for min_confidence in (0, 30, 50, 75):
+            session = DiagnosisSession(self.engine, min_confidence=min_confidence)
+            selected = set()
+            for _ in range(300):
+                symptom = rng.choice(self.vocab)
+                on = rng.random() < 0.6
+                session.set(symptom, on)
+                (selected.add if on else selected.discard)(symptom)
+                self.assertEqual(session.results(),
+                                 self.engine.run_diagnosis(dict.fromkeys(selected, True),
+                                                           min_confidence=min_confidence))
+
+    def test_unknown_names_are_not_interned(self):
+        session = DiagnosisSession(self.engine)
+        session.add("fever")
+        size = len(self.engine.vocabulary)
+        session.add("not a symptom")
+        session.remove("also not a symptom")
+        self.assertEqual(len(self.engine.vocabulary), size)
+        self.assertEqual(session.selected, {"fever"})
+
+    def test_set_mask(self):
+        rng = random.Random(3)
+        session = DiagnosisSession(self.engine)
+        for _ in range(100):
+            selected = rng.sample(self.vocab, rng.randint(0, 6))
+            session.set_mask(self.engine.vocabulary.to_mask(selected))
+            self.assertEqual(session.selected, set(selected))
+            self.assertEqual(session.results(), self.engine.run_diagnosis(dict.fromkeys(selected, True)))
+
+    def test_clear_and_rebuild(self):
+        session = DiagnosisSession(self.engine)
+        for symptom in ("joint pain", "swelling"):
+            session.add(symptom)
+        self.assertEqual(session.results(k=1)[0][0], "Arthritis")
+        self.engine.disease_profiles["Gout"] = {"symptoms": ["joint pain", "swelling"], "advice": "advice_gout"}
+        self.engine.build_index()
+        self.assertEqual(session.results(k=1)[0][0], "Gout")
+        session.clear()
+        self.assertEqual(session.results(), [])
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.python_engine = DiagnosisEngine()
+        self.numpy_engine = DiagnosisEngine(backend="numpy")
+        self.vocab = sorted(self.python_engine.symptom_index) + ["not a symptom"]
+
+    def test_matches_python_backend(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            selected = rng.sample(self.vocab, rng.randint(0, 8))
+            self.assertEqual(self.numpy_engine.calculate_confidence(selected),
+                             self.python_engine.calculate_confidence(selected))
+            symptoms = {s: True for s in selected}
+            self.assertEqual(self.numpy_engine.run_diagnosis(symptoms),
+                             self.python_engine.run_diagnosis(symptoms))
+
+    def test_batch_matches_single_diagnosis(self):
+        rng = random.Random(1)
+        patients = [rng.sample(self.vocab, rng.randint(0, 6)) for _ in range(300)]
+        patients += patients[:50]  # duplicates are scored once
+        expected = [self.python_engine.run_diagnosis({s: True for s in p}) for p in patients]
+        self.assertEqual(self.numpy_engine.run_diagnosis_batch(patients), expected)
+        self.assertEqual(self.python_engine.run_diagnosis_batch(patients), expected)
+        # Sparse ranked path with k, and the dense path below min_confidence 0
+        for k, min_confidence in ((3, 20), (None, 0)):
+            expected = [self.python_engine.run_diagnosis({s: True for s in p}, k=k, min_confidence=min_confidence)
+                        for p in patients]
+            self.assertEqual(self.numpy_engine.run_diagnosis_batch(patients, k=k, min_confidence=min_confidence),
+                             expected)
+
+    def test_batch_compact(self):
+        patients = [["fever", "cough"], ["joint pain"], ["fever", "cough"]]
+        confidences = self.numpy_engine.run_diagnosis_batch(patients, compact=True)
+        self.assertEqual(confidences.shape, (3, len(self.numpy_engine.disease_names)))
+        flu = self.numpy_engine.disease_names.index("Flu")
+        self.assertEqual(confidences[0, flu], 40.0)
+        self.assertEqual(confidences.tolist(),
+                         self.python_engine.run_diagnosis_batch(patients, compact=True).tolist())
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            DiagnosisEngine(backend="fortran")
+
 if __name__ == "__main__":
     unittest.main()
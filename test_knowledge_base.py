@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import pickle
+import random
+import tempfile
+import unittest
+from diagnosis_engine import DiagnosisEngine, NUMPY_AVAILABLE
+from knowledge_base import (compile_snapshot, load_profiles, load_profiles_csv,
+                            load_profiles_json, load_snapshot)
+
+
+class TestKnowledgeBase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.profiles = DiagnosisEngine().disease_profiles
+        self.snapshot_path = os.path.join(self.tmpdir.name, "profiles.dxkb")
+        compile_snapshot(self.profiles, self.snapshot_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_json_round_trip(self):
+        path = os.path.join(self.tmpdir.name, "profiles.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.profiles, f)
+        self.assertEqual(load_profiles_json(path), self.profiles)
+        self.assertEqual(load_profiles(path), self.profiles)
+
+    def test_csv(self):
+        path = os.path.join(self.tmpdir.name, "profiles.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["disease", "advice", "symptoms"])
+            for disease, profile in self.profiles.items():
+                writer.writerow([disease, profile["advice"], ";".join(profile["symptoms"])])
+        self.assertEqual(load_profiles_csv(path), self.profiles)
+
+    def test_snapshot_mapping(self):
+        snapshot = load_snapshot(self.snapshot_path)
+        self.assertEqual(list(snapshot), list(self.profiles))
+        self.assertEqual(dict(snapshot), self.profiles)
+        self.assertEqual(dict(pickle.loads(pickle.dumps(snapshot))), self.profiles)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.tmpdir.name, "bogus.dxkb")
+        with open(path, "wb") as f:
+            f.write(b"not a snapshot at all")
+        with self.assertRaises(ValueError):
+            load_snapshot(path)
+
+    def check_engine(self, backend, engine=None):
+        reference = DiagnosisEngine(backend=backend)
+        if engine is None:
+            engine = DiagnosisEngine.from_snapshot(self.snapshot_path, backend=backend)
+        self.assertEqual(dict(engine.symptom_index), dict(reference.symptom_index))
+        rng = random.Random(0)
+        vocab = sorted(reference.symptom_index)
+        for _ in range(200):
+            selected = rng.sample(vocab, rng.randint(0, 6))
+            for scoring in ("overlap", "bayes"):
+                self.assertEqual(engine.calculate_confidence(selected, scoring),
+                                 reference.calculate_confidence(selected, scoring))
+                symptoms = {s: True for s in selected}
+                self.assertEqual(engine.run_diagnosis(symptoms, scoring=scoring),
+                                 reference.run_diagnosis(symptoms, scoring=scoring))
+
+    def test_engine_from_snapshot(self):
+        self.check_engine("python")
+
+    def test_snapshot_into_existing_vocabulary(self):
+        # Snapshot symptom IDs differ from the engine's and are translated
+        engine = DiagnosisEngine(disease_profiles={d: self.profiles[d] for d in reversed(self.profiles)})
+        engine.disease_profiles = load_snapshot(self.snapshot_path)
+        engine.build_index()
+        self.check_engine("python", engine)
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_engine_from_snapshot(self):
+        self.check_engine("numpy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from benchmark_engine import lsh_recall
+from diagnosis_engine import DiagnosisEngine
+from lsh_index import MinHashIndex
+from synthetic_catalog import generate_catalog, generate_workload
+
+
+class TestMinHashIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = generate_catalog(2000, 400, seed=7)
+        cls.workload = generate_workload(cls.catalog, 100, seed=8)
+        cls.engine = DiagnosisEngine(disease_profiles=cls.catalog)
+
+    def test_exact_confidences_for_candidates(self):
+        index = MinHashIndex(self.engine)
+        for symptoms in self.workload:
+            exact = self.engine.calculate_confidence(symptoms)
+            approximate = index.calculate_confidence(symptoms)
+            self.assertEqual(set(approximate), index.candidates(symptoms))
+            for disease, confidence in approximate.items():
+                self.assertEqual(confidence, exact[disease])
+
+    def test_whole_profile_always_found(self):
+        index = MinHashIndex(self.engine, bands=4, rows=8)
+        for disease in list(self.catalog)[:50]:
+            symptoms = dict.fromkeys(self.catalog[disease]["symptoms"], True)
+            self.assertIn(disease, [d for d, _, _ in index.run_diagnosis(symptoms)])
+
+    def test_more_bands_raise_recall(self):
+        low = lsh_recall(self.engine, MinHashIndex(self.engine, bands=4, rows=4), self.workload)
+        high = lsh_recall(self.engine, MinHashIndex(self.engine, bands=32, rows=2), self.workload)
+        self.assertLessEqual(low["recall"], high["recall"])
+        self.assertLess(low["mean_candidates"], high["mean_candidates"])
+        self.assertGreater(high["recall"], 0.9)
+
+    def test_rebuilds_after_engine_rebuild(self):
+        engine = DiagnosisEngine()
+        index = MinHashIndex(engine)
+        symptoms = {"fever": True, "cough": True, "sore throat": True, "fatigue": True, "body aches": True}
+        self.assertEqual(index.run_diagnosis(symptoms, k=1)[0][0], "Flu")
+        del engine.disease_profiles["Flu"]
+        engine.build_index()
+        self.assertNotIn("Flu", index.candidates(symptoms))
+
+    def test_unknown_symptoms(self):
+        index = MinHashIndex(self.engine)
+        self.assertEqual(index.candidates(["not a symptom"]), set())
+        self.assertEqual(index.run_diagnosis({}), [])
+        with self.assertRaises(ValueError):
+            MinHashIndex(self.engine, bands=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
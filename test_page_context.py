@@ -0,0 +1,57 @@
+import copy
+import unittest
+import localization
+from symptom_search import SearchIndexes
+
+try:
+    from page_context import PageContexts
+    JINJA_AVAILABLE = True
+except ImportError:
+    JINJA_AVAILABLE = False
+
+
+class ReloadTranslationsMixin:
+    def setUp(self):
+        self.original = copy.deepcopy(localization.translations)
+
+    def tearDown(self):
+        localization.reload_translations(self.original)
+
+    def rename_fever(self, text):
+        updated = copy.deepcopy(localization.translations)
+        updated["es"]["fever"] = text
+        localization.reload_translations(updated)
+
+
+@unittest.skipUnless(JINJA_AVAILABLE, "Jinja2 not installed")
+class TestPageContexts(ReloadTranslationsMixin, unittest.TestCase):
+    def test_memoized_and_frozen(self):
+        contexts = PageContexts({"General": ["fever", "cough"]})
+        context = contexts.get("es")
+        self.assertIs(contexts.get("es"), context)
+        self.assertEqual(context.symptoms["General"][0], ("fever", "Fiebre"))
+        self.assertEqual([lang.code for lang in context.languages], localization.available_languages())
+        self.assertEqual(context.translations["advice_label"], "Consejo")
+        with self.assertRaises(TypeError):
+            context.translations["advice_label"] = "x"
+        self.assertIn('"advice_label": "Consejo"', context.translations_json)
+
+    def test_rebuilt_after_reload(self):
+        contexts = PageContexts({"General": ["fever"]})
+        before = contexts.get("es")
+        self.rename_fever("Calentura")
+        after = contexts.get("es")
+        self.assertIsNot(after, before)
+        self.assertEqual(after.symptoms["General"][0].name, "Calentura")
+
+
+class TestSearchIndexReload(ReloadTranslationsMixin, unittest.TestCase):
+    def test_rebuilt_after_reload(self):
+        indexes = SearchIndexes(["fever", "cough"])
+        self.assertEqual(indexes.search("es", "calen"), [])
+        self.rename_fever("Calentura")
+        self.assertEqual(indexes.search("es", "calen"), [{"id": "fever", "name": "Calentura"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
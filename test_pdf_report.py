@@ -0,0 +1,31 @@
+import unittest
+
+try:
+    from pdf_report import report_labels, render_report
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+RESULT = ("Flu", 75.0, "Rest and drink plenty of fluids. " * 8)
+EXPLANATION = {"matched": ["Fever", "Cough"], "missing": ["Body Aches"], "unexplained": []}
+
+
+@unittest.skipUnless(REPORTLAB_AVAILABLE, "reportlab not installed")
+class TestPdfReport(unittest.TestCase):
+    def test_render(self):
+        pdf = render_report("en", ["fever", "cough"], [RESULT], [EXPLANATION], "2024-05-01 09:30")
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertEqual(pdf.count(b"/Subtype /Form"), 1)
+
+    def test_header_form_shared_by_pages(self):
+        pdf = render_report("es", ["fever"], [RESULT] * 20, [EXPLANATION, None] * 10, "2024-05-01 09:30")
+        self.assertGreater(pdf.count(b"/Type /Page\n"), 1)
+        self.assertEqual(pdf.count(b"/Subtype /Form"), 1)
+
+    def test_labels_cached_per_language(self):
+        self.assertIs(report_labels("es"), report_labels("es"))
+        self.assertNotEqual(report_labels("es").title, report_labels("en").title)
+
+
+if __name__ == "__main__":
+    unittest.main()
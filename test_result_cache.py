@@ -0,0 +1,69 @@
+import threading
+import unittest
+from diagnosis_engine import DiagnosisEngine
+from result_cache import DiagnosisCache
+
+
+class TestDiagnosisCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = DiagnosisEngine()
+        self.cache = DiagnosisCache(self.engine, maxsize=2)
+
+    def test_hits_on_canonical_symptom_set(self):
+        first = self.cache.run_diagnosis({"fever": True, "cough": True, "sore throat": True, "headache": False})
+        second = self.cache.run_diagnosis(["sore throat", "cough", "fever"])
+        self.assertEqual(first, second)
+        self.assertEqual(first, self.engine.run_diagnosis({"fever": True, "cough": True, "sore throat": True}))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_threshold_and_k_are_part_of_the_key(self):
+        symptoms = ["fever", "cough", "fatigue"]
+        self.assertNotEqual(self.cache.run_diagnosis(symptoms, min_confidence=0),
+                            self.cache.run_diagnosis(symptoms))
+        self.assertEqual(len(self.cache.run_diagnosis(symptoms, k=1, min_confidence=0)), 1)
+        self.assertEqual(self.cache.stats()["misses"], 3)
+
+    def test_eviction(self):
+        for symptoms in (["fever"], ["cough"], ["headache"]):
+            self.cache.run_diagnosis(symptoms)
+        self.cache.run_diagnosis(["fever"])
+        stats = self.cache.stats()
+        self.assertEqual(stats["evictions"], 2)
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["hits"], 0)
+
+    def test_invalidated_when_profiles_change(self):
+        symptoms = ["joint pain", "swelling"]
+        self.assertEqual(self.cache.run_diagnosis(symptoms)[0][0], "Arthritis")
+        self.engine.disease_profiles["Gout"] = {"symptoms": ["joint pain", "swelling"], "advice": "advice_gout"}
+        self.engine.build_index()
+        self.assertEqual(self.cache.run_diagnosis(symptoms)[0][0], "Gout")
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_returned_lists_are_private(self):
+        self.cache.run_diagnosis(["fever", "cough", "sore throat"]).clear()
+        self.assertTrue(self.cache.run_diagnosis(["fever", "cough", "sore throat"]))
+
+    def test_concurrent_lookups(self):
+        cache = DiagnosisCache(self.engine, maxsize=8)
+        expected = self.engine.run_diagnosis({"fever": True, "cough": True})
+        errors = []
+
+        def worker():
+            for _ in range(200):
+                if cache.run_diagnosis(["fever", "cough"]) != expected:
+                    errors.append("mismatch")
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 1600)
+
+
+if __name__ == "__main__":
+    unittest.main()
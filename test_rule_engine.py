@@ -0,0 +1,65 @@
+import random
+import unittest
+from rule_engine import DEFAULT_RULES, EXPERTA_AVAILABLE, RuleEngine
+
+
+def fired(engine, symptoms):
+    return [rule["name"] for rule in engine.evaluate(symptoms)]
+
+
+class TestRuleEngine(unittest.TestCase):
+    backend = "python"
+
+    def setUp(self):
+        self.engine = RuleEngine(backend=self.backend)
+
+    def test_conjunction(self):
+        self.assertEqual(fired(self.engine, ["fever", "night sweats", "unexplained weight loss"]),
+                         ["escalate_tuberculosis"])
+        self.assertEqual(fired(self.engine, ["fever", "night sweats"]), [])
+        self.assertEqual(fired(self.engine, []), [])
+
+    def test_negation(self):
+        symptoms = ["headache", "blurred vision", "chest pain"]
+        self.assertEqual(fired(self.engine, symptoms), ["escalate_hypertension"])
+        self.assertEqual(fired(self.engine, symptoms + ["nausea"]), [])
+
+    def test_definition_order(self):
+        symptoms = ["chest pain", "shortness of breath", "fever", "night sweats", "unexplained weight loss"]
+        self.assertEqual(fired(self.engine, symptoms), ["escalate_tuberculosis", "urgent_chest_pain"])
+
+    def test_reused_between_requests(self):
+        # Working memory from one evaluation must not leak into the next
+        self.assertEqual(fired(self.engine, ["fever", "confusion"]), ["urgent_fever_confusion"])
+        self.assertEqual(fired(self.engine, ["fever"]), [])
+
+    def test_stats(self):
+        for _ in range(3):
+            self.engine.evaluate(["fever"])
+        stats = self.engine.stats()
+        self.assertEqual(stats["evaluations"], 3)
+        self.assertEqual(stats["rules"], len(DEFAULT_RULES))
+        self.assertGreaterEqual(stats["max_ms"], stats["mean_ms"])
+
+    def test_rejects_bad_rules(self):
+        with self.assertRaises(ValueError):
+            RuleEngine([{"name": "empty", "all": []}], backend=self.backend)
+        with self.assertRaises(ValueError):
+            RuleEngine([DEFAULT_RULES[0], DEFAULT_RULES[0]], backend=self.backend)
+
+
+@unittest.skipUnless(EXPERTA_AVAILABLE, "experta not installed")
+class TestExpertaRuleEngine(TestRuleEngine):
+    backend = "experta"
+
+    def test_matches_python_backend(self):
+        reference = RuleEngine()
+        vocab = sorted({s for rule in DEFAULT_RULES for s in rule["all"] + rule.get("none", [])})
+        rng = random.Random(0)
+        for _ in range(100):
+            symptoms = rng.sample(vocab, rng.randint(0, len(vocab)))
+            self.assertEqual(fired(self.engine, symptoms), fired(reference, symptoms))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from diagnosis_engine import DiagnosisEngine, NUMPY_AVAILABLE
+from knowledge_base import compile_snapshot, load_snapshot
+from sharded_engine import ShardedDiagnosisEngine
+from synthetic_catalog import generate_catalog, generate_workload
+
+
+class TestShardedDiagnosisEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = generate_catalog(600, 80, seed=5)
+        cls.workload = generate_workload(cls.catalog, 60, seed=6)
+        cls.reference = DiagnosisEngine(disease_profiles=cls.catalog)
+        cls.engine = ShardedDiagnosisEngine(3, disease_profiles=cls.catalog)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.close()
+
+    def test_matches_single_engine(self):
+        for scoring in ("overlap", "bayes"):
+            for k in (None, 1, 5):
+                for min_confidence in (0, 1, 50):
+                    self.assertEqual(
+                        self.engine.run_diagnosis_batch(self.workload, k=k, min_confidence=min_confidence,
+                                                        scoring=scoring),
+                        self.reference.run_diagnosis_batch(self.workload, k=k, min_confidence=min_confidence,
+                                                           scoring=scoring))
+
+    def test_run_diagnosis(self):
+        symptoms = {s: True for s in self.workload[0]}
+        self.assertEqual(self.engine.run_diagnosis(symptoms, k=3), self.reference.run_diagnosis(symptoms, k=3))
+        self.assertEqual(self.engine.calculate_confidence(self.workload[0], "bayes"),
+                         self.reference.calculate_confidence(self.workload[0], "bayes"))
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_compact(self):
+        for scoring in ("overlap", "bayes"):
+            self.assertEqual(
+                self.engine.run_diagnosis_batch(self.workload, compact=True, scoring=scoring).tolist(),
+                self.reference.run_diagnosis_batch(self.workload, compact=True, scoring=scoring).tolist())
+
+    def test_more_shards_than_diseases(self):
+        reference = DiagnosisEngine()
+        with ShardedDiagnosisEngine(20) as engine:
+            symptoms = {"fever": True, "cough": True, "fatigue": True}
+            self.assertEqual(engine.run_diagnosis(symptoms), reference.run_diagnosis(symptoms))
+
+    def test_snapshot_shards(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "catalog.dxkb")
+            compile_snapshot(self.catalog, path)
+            with ShardedDiagnosisEngine(2, disease_profiles=load_snapshot(path)) as engine:
+                self.assertEqual(engine.run_diagnosis_batch(self.workload, k=5),
+                                 self.reference.run_diagnosis_batch(self.workload, k=5))
+
+    def test_build_index_bumps_version(self):
+        with ShardedDiagnosisEngine(2) as engine:
+            version = engine.version
+            del engine.disease_profiles["Flu"]
+            engine.build_index()
+            self.assertEqual(engine.version, version + 1)
+            self.assertNotIn("Flu", [d for d, _, _ in engine.run_diagnosis({"fever": True, "cough": True}, min_confidence=0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
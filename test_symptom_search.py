@@ -0,0 +1,59 @@
+import unittest
+from symptom_search import SearchIndexes, SymptomSearchIndex, fold
+
+SYMPTOMS = ["fever", "cough", "chest pain", "joint pain", "abdominal pain", "headache", "nausea",
+            "shortness of breath", "sore throat", "body aches"]
+
+
+class TestFold(unittest.TestCase):
+    def test_case_and_accents(self):
+        self.assertEqual(fold("Náuseas"), "nauseas")
+        self.assertEqual(fold("DOLOR DE CABEZA"), "dolor de cabeza")
+
+    def test_urdu_variants(self):
+        # Arabic yeh and kaf, harakat and tatweel fold to the Urdu spelling
+        self.assertEqual(fold("سينے"), fold("سینے"))
+        self.assertEqual(fold("كھانسی"), fold("کھانسی"))
+        self.assertEqual(fold("دَرد"), "درد")
+        self.assertEqual(fold("درـد"), "درد")
+
+
+class TestSymptomSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.indexes = SearchIndexes(SYMPTOMS)
+
+    def ids(self, lang, query, limit=10):
+        return [r["id"] for r in self.indexes.search(lang, query, limit)]
+
+    def test_prefix(self):
+        self.assertEqual(self.ids("en", "fev"), ["fever"])
+        self.assertEqual(set(self.ids("en", "pain")), {"chest pain", "joint pain", "abdominal pain"})
+        self.assertEqual(self.ids("en", "sh of br"), ["shortness of breath"])
+
+    def test_ranking(self):
+        index = SymptomSearchIndex([("a", "pain", ()), ("b", "chest pain", ()), ("c", "painful joints", ())])
+        self.assertEqual([r["id"] for r in index.search("pain")], ["a", "c", "b"])
+        self.assertEqual([r["id"] for r in index.search("pain", limit=1)], ["a"])
+
+    def test_translations_and_english(self):
+        self.assertEqual(self.ids("es", "dolor de ca"), ["headache"])
+        self.assertEqual(self.ids("es", "nausea"), ["nausea"])
+        self.assertEqual(self.ids("es", "fever"), ["fever"])
+        self.assertEqual(self.indexes.search("es", "fiebre")[0]["name"], "Fiebre")
+
+    def test_urdu(self):
+        self.assertIn("chest pain", self.ids("ur", "سينے"))
+        self.assertIn("headache", self.ids("ur", "درد"))
+
+    def test_misspellings(self):
+        self.assertEqual(self.ids("en", "feverr"), ["fever"])
+        self.assertEqual(self.ids("en", "chst pian"), ["chest pain"])
+        self.assertEqual(self.ids("en", "zzzz"), [])
+        self.assertEqual(self.ids("en", "  "), [])
+
+    def test_unlimited(self):
+        self.assertEqual(len(self.ids("en", "a", limit=None)), len(self.ids("en", "a", limit=100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from diagnosis_engine import DiagnosisEngine, DiagnosisSession
+from result_cache import DiagnosisCache
+from symptom_vocabulary import SymptomVocabulary, ids_from_mask, mask_from_ids
+
+
+class TestSymptomVocabulary(unittest.TestCase):
+    def test_intern(self):
+        vocabulary = SymptomVocabulary(["fever", "cough"])
+        self.assertEqual(vocabulary.intern("fever"), 0)
+        self.assertEqual(vocabulary.intern("headache"), 2)
+        self.assertEqual(vocabulary.name(2), "headache")
+        self.assertEqual(len(vocabulary), 3)
+        self.assertIsNone(vocabulary.get("nausea"))
+        self.assertEqual(vocabulary.ids(["headache", "nausea", "fever"]), [2, 0])
+
+    def test_masks(self):
+        vocabulary = SymptomVocabulary(["fever", "cough", "headache"])
+        mask = vocabulary.to_mask(["headache", "fever", "not a symptom"])
+        self.assertEqual(mask, 0b101)
+        self.assertEqual(vocabulary.names(mask), ["fever", "headache"])
+        ids = [0, 3, 64, 200]
+        self.assertEqual(ids_from_mask(mask_from_ids(ids)), ids)
+        self.assertEqual(ids_from_mask(0), [])
+
+
+class TestEngineSymptomIds(unittest.TestCase):
+    def setUp(self):
+        self.engine = DiagnosisEngine()
+        self.vocab = sorted(self.engine.symptom_index)
+
+    def test_records(self):
+        record = self.engine.compiled.records[self.engine.disease_order["Flu"]]
+        self.assertEqual(record.name, "Flu")
+        self.assertEqual(len(record), 5)
+        self.assertEqual(self.engine.vocabulary.names(record.mask),
+                         sorted(self.engine.disease_profiles["Flu"]["symptoms"],
+                                key=self.engine.vocabulary.get))
+
+    def test_mask_matches_names(self):
+        rng = random.Random(0)
+        for _ in range(100):
+            selected = rng.sample(self.vocab, rng.randint(0, 6))
+            mask = self.engine.vocabulary.to_mask(selected)
+            for min_confidence in (0, 50):
+                self.assertEqual(self.engine.run_diagnosis_mask(mask, min_confidence=min_confidence),
+                                 self.engine.run_diagnosis(dict.fromkeys(selected, True),
+                                                           min_confidence=min_confidence))
+        masks = [self.engine.vocabulary.to_mask(["fever", "cough"]), ["fever", "cough"]]
+        first, second = self.engine.run_diagnosis_batch(masks)
+        self.assertEqual(first, second)
+
+    def test_ids_survive_rebuild(self):
+        mask = self.engine.vocabulary.to_mask(["joint pain", "swelling"])
+        session = DiagnosisSession(self.engine)
+        session.set("joint pain")
+        session.set_id(self.engine.vocabulary.get("swelling"))
+        self.assertEqual(session.mask, mask)
+        self.engine.disease_profiles["Gout"] = {"symptoms": ["joint pain", "swelling", "gout tophi"],
+                                                "advice": "advice_gout"}
+        self.engine.build_index()
+        self.assertEqual(self.engine.vocabulary.to_mask(["joint pain", "swelling"]), mask)
+        self.assertEqual(session.results(), self.engine.run_diagnosis_mask(mask))
+        self.assertEqual(session.selected, {"joint pain", "swelling"})
+
+    def test_cache_keys_masks(self):
+        cache = DiagnosisCache(self.engine)
+        mask = self.engine.vocabulary.to_mask(["fever", "cough", "sore throat"])
+        self.assertEqual(cache.run_diagnosis(mask), cache.run_diagnosis(mask))
+        self.assertEqual(cache.run_diagnosis(mask), self.engine.run_diagnosis_mask(mask))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()